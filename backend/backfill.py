@@ -0,0 +1,48 @@
+import asyncio
+import sys
+
+from server import (
+    client, ensure_indexes, migrate_legacy_availability, backfill_handler_geo,
+    rebuild_handler_stats, reconcile_handler_ratings, rebuild_earnings_buckets,
+    migrate_wallet_ledger, reconcile_wallets, rebuild_category_review_stats,
+    rebuild_daily_rollups, backfill_booking_revenue, rebuild_activity_sketches,
+    rebuild_customer_stats, backfill_user_listing, backfill_booking_handlers,
+    drop_platform_counters,
+)
+
+# Backfill jobs for the derived collections, keyed by command name
+BACKFILLS = {
+    "booking_handlers": backfill_booking_handlers,
+    "availability": migrate_legacy_availability,
+    "handler_geo": backfill_handler_geo,
+    "handler_stats": rebuild_handler_stats,
+    "handler_ratings": reconcile_handler_ratings,
+    "customer_stats": rebuild_customer_stats,
+    "user_listing": backfill_user_listing,
+    "category_reviews": rebuild_category_review_stats,
+    "earnings": rebuild_earnings_buckets,
+    "wallet_ledger": migrate_wallet_ledger,
+    "wallet_reconcile": reconcile_wallets,
+    "booking_revenue": backfill_booking_revenue,
+    "daily_rollups": rebuild_daily_rollups,
+    "activity_sketches": rebuild_activity_sketches,
+    "drop_platform_counters": drop_platform_counters,
+}
+
+async def run_backfills(names):
+    await ensure_indexes()
+    for name in names:
+        print(f"🔄 Running backfill: {name}")
+        result = await BACKFILLS[name]()
+        print(f"✅ {name}: {result}")
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BACKFILLS)
+    unknown = [name for name in names if name not in BACKFILLS]
+    if unknown:
+        print(f"❌ Unknown backfill(s): {', '.join(unknown)}")
+        print(f"   Available: {', '.join(BACKFILLS)}")
+        sys.exit(1)
+
+    asyncio.run(run_backfills(names))
+    client.close()
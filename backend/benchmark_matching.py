@@ -0,0 +1,371 @@
+"""
+Matching benchmark and simulation harness
+
+Generates synthetic handlers and bookings, replays assignment runs through the
+server's matching code and reports latency percentiles, database round trips
+and assignment quality.
+
+    python benchmark_matching.py --handlers 500 --bookings 200
+    python benchmark_matching.py --backend memory --algorithms single,batch
+    python benchmark_matching.py --handlers 2000 --bookings 1000 --json results.json
+
+The mongo backend uses MONGO_URL and empties the benchmark collections (users,
+bookings, availability_intervals, scheduler_leases, presence) in the --db
+database before every run, so never point it at production data. The memory
+backend needs the optional mongomock-motor package and cannot run the
+dispatcher: its backoff is a pipeline update adding milliseconds to a date,
+which mongomock rejects, so benchmark the dispatcher against a real mongod.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+# Emptied before every algorithm run
+BENCHMARK_COLLECTIONS = ["users", "bookings", "availability_intervals", "scheduler_leases", "presence"]
+
+# Algorithms that need a real mongod (see the module docstring)
+MONGO_ONLY_ALGORITHMS = {"dispatcher"}
+
+CATEGORIES = [
+    "Cleaning", "Plumbing", "Electrical", "HVAC", "Appliances",
+    "Handyman", "Painting", "Landscaping", "Pest Control", "Locksmith",
+]
+
+# ==================== Round Trip Counting ====================
+
+class CountingCollection:
+    """Collection proxy counting one round trip per collection call"""
+
+    def __init__(self, collection, counter: Counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter[name] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+class CountingDatabase:
+    """Database proxy handing out counting collections"""
+
+    def __init__(self, database):
+        self._database = database
+        self.counter = Counter()
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._database, name), self.counter)
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self.counter)
+
+    def reset(self):
+        self.counter.clear()
+
+# ==================== Synthetic Data ====================
+
+def jitter_location(rng: random.Random, center_lat: float, center_lon: float, radius_miles: float):
+    """Random point within radius_miles of the center"""
+    distance = radius_miles * math.sqrt(rng.random())
+    bearing = rng.uniform(0, 2 * math.pi)
+    dlat = (distance / 69.0) * math.cos(bearing)
+    dlon = (distance / (69.0 * math.cos(math.radians(center_lat)))) * math.sin(bearing)
+    return {"latitude": center_lat + dlat, "longitude": center_lon + dlon}
+
+def generate_handlers(rng: random.Random, args, server):
+    handlers, intervals, presence = [], [], []
+    for i in range(args.handlers):
+        handler_id = ObjectId()
+        has_calendar = rng.random() < args.calendar_ratio
+        handlers.append({
+            "_id": handler_id,
+            "name": f"Bench Handler {i}",
+            "email": f"bench.handler.{i}@example.com",
+            "user_type": "handler",
+            "status": "active",
+            "available": True,
+            "skills": rng.sample(CATEGORIES, rng.randint(1, 3)),
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "location": jitter_location(rng, args.center_lat, args.center_lon, args.radius_miles),
+            "has_availability_calendar": has_calendar,
+            "created_at": datetime.utcnow(),
+        })
+        if has_calendar:
+            # Working days with a morning or full-day shift
+            slots = []
+            for day in rng.sample(range(7), rng.randint(3, 6)):
+                start_hour = rng.choice([7, 8, 9])
+                slots.append({
+                    "day_of_week": day,
+                    "start_time": f"{start_hour:02d}:00",
+                    "end_time": f"{start_hour + rng.choice([5, 8, 10]):02d}:00",
+                    "is_available": True,
+                })
+            for interval in server.weekly_slot_intervals(slots):
+                intervals.append({**interval, "handler_id": str(handler_id), "updated_at": datetime.utcnow()})
+        if rng.random() < args.online_ratio:
+            location = handlers[-1]["location"]
+            presence.append({
+                "_id": str(handler_id),
+                "last_seen_at": datetime.utcnow(),
+                "expires_at": datetime.utcnow() + timedelta(hours=1),
+                "geo": server.geo_point(location["latitude"], location["longitude"]),
+            })
+    return handlers, intervals, presence
+
+def generate_bookings(rng: random.Random, args):
+    bookings = []
+    today = datetime.utcnow().date()
+    for i in range(args.bookings):
+        start_hour = rng.randint(8, 17)
+        scheduled_date = today + timedelta(days=rng.randint(0, args.days - 1))
+        bookings.append({
+            "_id": ObjectId(),
+            "service_id": None,
+            "customer_id": str(ObjectId()),
+            "service_name": "Benchmark Service",
+            "service_price": float(rng.randint(40, 200)),
+            "service_category": rng.choice(CATEGORIES),
+            "status": "pending",
+            "scheduled_date": scheduled_date.isoformat(),
+            "time_range_start": f"{start_hour:02d}:00",
+            "time_range_end": f"{start_hour + rng.randint(1, 3):02d}:00",
+            "location": jitter_location(rng, args.center_lat, args.center_lon, args.radius_miles),
+            "booking_type": "one-off",
+            "payment_status": "paid",
+            "handler_id": None,
+            "created_at": datetime.utcnow() - timedelta(seconds=args.bookings - i),
+        })
+    return bookings
+
+async def seed_dataset(database, args, server):
+    """Reset the benchmark collections and insert a reproducible dataset"""
+    rng = random.Random(args.seed)
+    handlers, intervals, presence = generate_handlers(rng, args, server)
+    bookings = generate_bookings(rng, args)
+
+    for name in BENCHMARK_COLLECTIONS:
+        await database[name].delete_many({})
+    await database.users.insert_many(handlers)
+    if intervals:
+        await database.availability_intervals.insert_many(intervals)
+    if presence:
+        await database.presence.insert_many(presence)
+    await database.bookings.insert_many(bookings)
+    return handlers, bookings
+
+# ==================== Algorithms ====================
+
+async def run_single(server, bookings, args):
+    """One /auto-assign call per booking"""
+    latencies = []
+    for booking in bookings:
+        started = time.perf_counter()
+        await server.find_best_handler(str(booking["_id"]))
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+async def run_batch(server, bookings, args):
+    """A single /bookings/batch-auto-assign call"""
+    started = time.perf_counter()
+    await server.batch_auto_assign()
+    return [time.perf_counter() - started]
+
+async def run_dispatcher(server, bookings, args):
+    """Dispatcher ticks until a tick assigns nothing"""
+    # Production tick length, so lease renewals cost what they do in production
+    dispatcher = server.MatchingDispatcher(tick_seconds=server.MATCHING_TICK_SECONDS, batch_size=args.batch_size)
+    latencies = []
+    while True:
+        started = time.perf_counter()
+        assignments = await dispatcher.tick()
+        latencies.append(time.perf_counter() - started)
+        if not assignments:
+            break
+    return latencies
+
+ALGORITHMS = {
+    "single": run_single,
+    "batch": run_batch,
+    "dispatcher": run_dispatcher,
+}
+
+# ==================== Reporting ====================
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def gini(values):
+    """Gini coefficient of a load distribution (0 = perfectly even)"""
+    ordered = sorted(values)
+    total = sum(ordered)
+    if not ordered or total == 0:
+        return 0.0
+    weighted = sum((i + 1) * v for i, v in enumerate(ordered))
+    return (2 * weighted) / (len(ordered) * total) - (len(ordered) + 1) / len(ordered)
+
+async def assignment_quality(database, server, handlers, bookings):
+    by_handler = {str(h["_id"]): h for h in handlers}
+    by_booking = {b["_id"]: b for b in bookings}
+    assigned = await database.bookings.find(
+        {"_id": {"$in": list(by_booking)}, "handler_id": {"$ne": None}},
+        {"handler_id": 1}
+    ).to_list(None)
+
+    distances, skill_matches = [], 0
+    load = Counter()
+    for row in assigned:
+        booking = by_booking[row["_id"]]
+        handler = by_handler.get(row["handler_id"])
+        if not handler:
+            continue
+        load[row["handler_id"]] += 1
+        distances.append(server.calculate_distance(
+            booking["location"]["latitude"], booking["location"]["longitude"],
+            handler["location"]["latitude"], handler["location"]["longitude"]
+        ))
+        if booking["service_category"] in handler["skills"]:
+            skill_matches += 1
+
+    per_handler = [load.get(handler_id, 0) for handler_id in by_handler]
+    return {
+        "assigned": len(assigned),
+        "assignment_rate": round(len(assigned) / len(bookings), 4) if bookings else 0,
+        "avg_distance_miles": round(statistics.mean(distances), 3) if distances else None,
+        "p90_distance_miles": round(percentile(distances, 90), 3) if distances else None,
+        "skill_match_rate": round(skill_matches / len(assigned), 4) if assigned else None,
+        "max_jobs_per_handler": max(per_handler) if per_handler else 0,
+        "load_stddev": round(statistics.pstdev(per_handler), 4) if per_handler else 0,
+        "load_gini": round(gini(per_handler), 4),
+    }
+
+def print_report(results):
+    for result in results:
+        latency = result["latency_ms"]
+        quality = result["quality"]
+        print(f"\n📊 {result['algorithm']} ({result['operations']} operation(s), {result['wall_seconds']:.3f}s)")
+        print(f"   Latency ms: p50={latency['p50']:.2f} p90={latency['p90']:.2f} "
+              f"p99={latency['p99']:.2f} max={latency['max']:.2f}")
+        print(f"   Round trips: {result['round_trips']['total']} "
+              f"({result['round_trips']['per_booking']:.2f}/booking)")
+        print(f"   Assigned: {quality['assigned']}/{result['bookings']} ({quality['assignment_rate']:.1%})")
+        print(f"   Distance: avg={quality['avg_distance_miles']} p90={quality['p90_distance_miles']} miles")
+        print(f"   Load: max={quality['max_jobs_per_handler']} stddev={quality['load_stddev']} "
+              f"gini={quality['load_gini']} skill_match={quality['skill_match_rate']}")
+
+# ==================== Runner ====================
+
+def open_database(args):
+    if args.backend == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("❌ The memory backend needs mongomock-motor (pip install mongomock-motor)")
+            sys.exit(1)
+        return AsyncMongoMockClient()[args.db]
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(os.environ["MONGO_URL"])[args.db]
+
+async def run_benchmark(args):
+    # server.py reads its connection settings at import time
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", args.db)
+    os.environ["MATCHING_DISPATCHER_ENABLED"] = "false"
+    import server
+
+    counting_db = CountingDatabase(open_database(args))
+    server.db = counting_db
+
+    results = []
+    for name in args.algorithms:
+        handlers, bookings = await seed_dataset(counting_db, args, server)
+        counting_db.reset()
+
+        started = time.perf_counter()
+        latencies = await ALGORITHMS[name](server, bookings, args)
+        wall_seconds = time.perf_counter() - started
+        round_trips = dict(counting_db.counter)
+
+        quality = await assignment_quality(counting_db, server, handlers, bookings)
+        latencies_ms = [latency * 1000 for latency in latencies]
+        results.append({
+            "algorithm": name,
+            "handlers": args.handlers,
+            "bookings": args.bookings,
+            "operations": len(latencies),
+            "wall_seconds": round(wall_seconds, 4),
+            "latency_ms": {
+                "p50": percentile(latencies_ms, 50),
+                "p90": percentile(latencies_ms, 90),
+                "p99": percentile(latencies_ms, 99),
+                "max": max(latencies_ms) if latencies_ms else 0.0,
+            },
+            "round_trips": {
+                "total": sum(round_trips.values()),
+                "per_booking": sum(round_trips.values()) / args.bookings if args.bookings else 0,
+                "by_operation": round_trips,
+            },
+            "quality": quality,
+        })
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark handler matching at synthetic scale")
+    parser.add_argument("--backend", choices=["mongo", "memory"], default="mongo")
+    parser.add_argument("--db", default="expertrait_benchmark", help="Database name (its benchmark collections are emptied on every run)")
+    parser.add_argument("--handlers", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=100)
+    parser.add_argument("--days", type=int, default=7, help="Spread bookings over this many days")
+    parser.add_argument("--calendar-ratio", type=float, default=0.6, help="Share of handlers with a weekly calendar")
+    parser.add_argument("--online-ratio", type=float, default=0.7, help="Share of handlers online for same-day work")
+    parser.add_argument("--center-lat", type=float, default=51.5074)
+    parser.add_argument("--center-lon", type=float, default=-0.1278)
+    parser.add_argument("--radius-miles", type=float, default=15.0)
+    parser.add_argument("--batch-size", type=int, default=50, help="Dispatcher micro-batch size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--algorithms", default=",".join(ALGORITHMS),
+                        help=f"Comma-separated subset of: {', '.join(ALGORITHMS)}")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    args.algorithms = [a.strip() for a in args.algorithms.split(",") if a.strip()]
+    unknown = [a for a in args.algorithms if a not in ALGORITHMS]
+    if unknown:
+        parser.error(f"unknown algorithm(s): {', '.join(unknown)}")
+    mongo_only = [a for a in args.algorithms if a in MONGO_ONLY_ALGORITHMS]
+    if args.backend == "memory" and mongo_only:
+        parser.error(f"{', '.join(mongo_only)} needs a real mongod; use --backend mongo")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"🏁 Matching benchmark: {args.handlers} handlers, {args.bookings} bookings, "
+          f"backend={args.backend}, seed={args.seed}")
+    results = asyncio.run(run_benchmark(args))
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\n💾 Results written to {args.json_path}")
@@ -1,18 +1,30 @@
 from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Request, Header
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import socket
+import time
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta, timedelta
+from typing import List, Optional, Dict, Any, Callable, Awaitable
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from bson import ObjectId
+from bson.errors import InvalidId
 import bcrypt
 import json
+import re
+import base64
+import hashlib
+import math
+import csv
+import io
+import zlib
 import stripe
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -22,6 +34,8 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 from pymongo.server_api import ServerApi
+from pymongo import UpdateOne, ReplaceOne, DeleteOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url, server_api=ServerApi('1'))
@@ -212,6 +226,21 @@ class HandlerResponse(BaseModel):
     location: Optional[LocationModel] = None
     created_at: datetime
 
+class HandlerDirectoryEntry(BaseModel):
+    id: str
+    name: str = ""
+    skills: List[str] = []
+    bio: Optional[str] = None
+    profile_image_url: Optional[str] = None
+    rating: float = 5.0
+    total_jobs: int = 0
+    available: bool = True
+    distance_miles: Optional[float] = None
+
+class HandlerDirectoryPage(BaseModel):
+    handlers: List[HandlerDirectoryEntry]
+    next_cursor: Optional[str] = None
+
 class ServiceCreate(BaseModel):
     category: str
     name: str
@@ -350,6 +379,20 @@ class HandlerAvailabilityUpdate(BaseModel):
     handler_id: str
     availability_slots: List[AvailabilitySlot]
 
+class AvailabilitySlotKey(BaseModel):
+    date: Optional[str] = None  # YYYY-MM-DD for a dated slot
+    day_of_week: Optional[int] = None  # 0-6 (Monday-Sunday) for a recurring slot
+    start_time: str  # HH:MM format
+    end_time: str  # HH:MM format
+
+class AvailabilitySlotInput(AvailabilitySlotKey):
+    available: bool = True
+    category: Optional[str] = None  # Limit the slot to one service category
+
+class AvailabilitySlotBulkUpdate(BaseModel):
+    upsert: List[AvailabilitySlotInput] = []
+    delete: List[AvailabilitySlotKey] = []
+
 # ==================== Utility Functions ====================
 
 def hash_password(password: str) -> str:
@@ -364,6 +407,877 @@ def serialize_doc(doc: dict) -> dict:
         del doc["_id"]
     return doc
 
+def encode_cursor(values: dict) -> str:
+    """Build an opaque pagination cursor from the last item's sort keys"""
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def geo_point(latitude: float, longitude: float) -> dict:
+    """GeoJSON point for the 2dsphere-indexed geo field"""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+class BatchLoader:
+    """Batches and caches lookups of one collection by id, DataLoader-style.
+
+    Ids passed to load() in the same event-loop tick are fetched together with
+    one $in query, and every result (misses included) is kept for the life of
+    the loader. Create loaders per request so nothing outlives it.
+    """
+
+    def __init__(self, collection, projection: Optional[dict] = None):
+        self.collection = collection
+        self.projection = projection
+        self.cache: Dict[str, asyncio.Future] = {}
+        self.queue: Dict[str, asyncio.Future] = {}
+        # The loop only keeps weak references to tasks; hold dispatches until done
+        self.tasks: set = set()
+
+    def load(self, doc_id: Optional[str]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        key = str(doc_id) if doc_id else ""
+        future = self.cache.get(key)
+        if future is not None and not future.cancelled():
+            return future
+        
+        future = loop.create_future()
+        self.cache[key] = future
+        if not ObjectId.is_valid(key):
+            future.set_result(None)
+            return future
+        
+        self.queue[key] = future
+        if len(self.queue) == 1:
+            loop.call_soon(self.schedule_dispatch)
+        return future
+
+    def schedule_dispatch(self):
+        task = asyncio.ensure_future(self.dispatch())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def load_many(self, doc_ids: List[Optional[str]]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(doc_id) for doc_id in doc_ids)))
+
+    async def dispatch(self):
+        batch, self.queue = self.queue, {}
+        try:
+            docs = {}
+            async for doc in self.collection.find({"_id": {"$in": [ObjectId(key) for key in batch]}}, self.projection):
+                docs[str(doc["_id"])] = doc
+        except Exception as e:
+            for key, future in batch.items():
+                # Failures are not cached, so a later load() retries
+                if self.cache.get(key) is future:
+                    del self.cache[key]
+                if not future.done():
+                    future.set_exception(e)
+                    # Waiters still get the error; unawaited futures stay quiet
+                    future.exception()
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(docs.get(key))
+
+class RequestLoaders:
+    """The batch loaders one request enriches its rows with"""
+
+    def __init__(self):
+        self.users = BatchLoader(db.users, {"name": 1, "email": 1, "user_type": 1})
+        self.services = BatchLoader(db.services, {"name": 1, "fixed_price": 1})
+        self.bookings = BatchLoader(db.bookings)
+
+# ==================== Versioned Rebuilds ====================
+
+# Read models that live writes $inc are rebuilt under a per-document version:
+# every live write also does $inc {"version": 1}
+REBUILD_ATTEMPTS = 3
+MISSING = object()
+
+def stats_version_filter(version: Optional[int]):
+    # Matching with $exists keeps an upsert from storing a null version that $inc would reject
+    return {"$exists": False} if version is None else version
+
+async def read_versions(collection, query: dict) -> Dict[str, Optional[int]]:
+    return {doc["_id"]: doc.get("version") async for doc in collection.find(query, {"version": 1})}
+
+async def versioned_rebuild(
+    collection,
+    compute: Callable[[Optional[list]], Awaitable[Dict[str, dict]]],
+    scope_query: Callable[[Optional[list]], dict],
+    scope_of: Callable[[List[str]], list]
+) -> int:
+    """Replace a read model with recomputed documents without losing live updates.
+
+    compute(scope) returns the recomputed documents by _id (scope None means
+    everything) and scope_query(scope) selects the stored documents they
+    cover. Each replace, and each delete of a document no longer computed,
+    only applies where the version still matches the one read before
+    computing. Documents a live write touched mid-run are recomputed under
+    scope_of(their ids), up to REBUILD_ATTEMPTS times; past that they keep
+    their live values until the next run. Returns the number of documents
+    the full computation produced.
+    """
+    scope = None
+    rebuilt = 0
+    for _ in range(REBUILD_ATTEMPTS):
+        query = scope_query(scope)
+        versions = await read_versions(collection, query)
+        docs = await compute(scope)
+        if scope is None:
+            rebuilt = len(docs)
+        
+        ops = []
+        for doc_id, doc in docs.items():
+            replacement = {k: v for k, v in doc.items() if k != "_id"}
+            if versions.get(doc_id) is not None:
+                replacement["version"] = versions[doc_id]
+            ops.append(ReplaceOne(
+                {"_id": doc_id, "version": stats_version_filter(versions.get(doc_id))},
+                replacement,
+                upsert=doc_id not in versions
+            ))
+        ops += [
+            DeleteOne({"_id": doc_id, "version": stats_version_filter(version)})
+            for doc_id, version in versions.items() if doc_id not in docs
+        ]
+        if ops:
+            try:
+                await collection.bulk_write(ops, ordered=False)
+            except BulkWriteError:
+                # A live write created the document first; found as a conflict below
+                pass
+        
+        current = await read_versions(collection, query)
+        conflicts = [
+            doc_id for doc_id in set(docs) | set(versions) | set(current)
+            if current.get(doc_id, MISSING) != (versions.get(doc_id) if doc_id in docs else MISSING)
+        ]
+        if not conflicts:
+            return rebuilt
+        scope = scope_of(conflicts)
+    
+    logger.warning(f"{collection.name} rebuild left {len(conflicts)} documents with live values: {conflicts[:10]}")
+    return rebuilt
+
+# ==================== Daily Rollups ====================
+
+def rollup_day(moment: Optional[datetime]) -> str:
+    return (moment or datetime.utcnow()).strftime("%Y-%m-%d")
+
+def booking_category(booking: dict) -> Optional[str]:
+    # Bookings created with payment store their category under "category"
+    return booking.get("service_category") or booking.get("category")
+
+def booking_handler_id(booking: dict) -> Optional[str]:
+    # Bookings created with payment before handler_id was stored only have professional_id
+    return booking.get("handler_id") or booking.get("professional_id")
+
+# booking_handler_id as an aggregation expression
+BOOKING_HANDLER_EXPR = {"$ifNull": ["$handler_id", "$professional_id"]}
+
+def booking_handler_match(condition) -> dict:
+    """Bookings whose booking_handler_id meets a condition"""
+    return {"$or": [{"handler_id": condition}, {"handler_id": None, "professional_id": condition}]}
+
+async def backfill_booking_handlers():
+    """Copy professional_id to handler_id on bookings created with payment"""
+    result = await db.bookings.update_many(
+        {"handler_id": None, "professional_id": {"$type": "string"}},
+        [{"$set": {"handler_id": "$professional_id"}}]
+    )
+    return result.modified_count
+
+def booking_revenue(booking: dict) -> float:
+    """Amount a completed booking contributes to revenue.
+
+    Bookings snapshot this as revenue_amount when they are created; the
+    price fields are the fallback for documents written before that.
+    """
+    for field in ("revenue_amount", "service_price", "total_price"):
+        if booking.get(field) is not None:
+            return booking[field]
+    return 0
+
+# booking_revenue as an aggregation expression
+BOOKING_REVENUE_EXPR = {"$ifNull": ["$revenue_amount", {"$ifNull": ["$service_price", {"$ifNull": ["$total_price", 0]}]}]}
+
+REVENUE_BACKFILL_BATCH_SIZE = 500
+
+async def backfill_booking_revenue():
+    """Snapshot revenue_amount onto bookings created before it was stored"""
+    # Bookings with no price at all fall back to their services' current prices
+    priced = 0
+    unpriced = db.bookings.aggregate([
+        {"$match": {"revenue_amount": None, "service_price": None, "total_price": None}},
+        {"$project": {"service_oids": {"$map": {
+            "input": {"$ifNull": ["$service_ids", ["$service_id"]]},
+            "in": {"$convert": {"input": "$$this", "to": "objectId", "onError": None, "onNull": None}}
+        }}}},
+        {"$lookup": {"from": "services", "localField": "service_oids", "foreignField": "_id", "as": "services"}},
+        {"$project": {"amount": {"$sum": "$services.fixed_price"}}}
+    ])
+    batch = []
+    async for row in unpriced:
+        batch.append(UpdateOne({"_id": row["_id"], "revenue_amount": None}, {"$set": {"revenue_amount": row["amount"]}}))
+        if len(batch) >= REVENUE_BACKFILL_BATCH_SIZE:
+            priced += (await db.bookings.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        priced += (await db.bookings.bulk_write(batch, ordered=False)).modified_count
+    
+    result = await db.bookings.update_many(
+        {"revenue_amount": None},
+        [{"$set": {"revenue_amount": BOOKING_REVENUE_EXPR}}]
+    )
+    return priced + result.modified_count
+
+def rollup_keys(day: str, category: Optional[str] = None, handler_id: Optional[str] = None) -> List[tuple]:
+    """(day, dimension, key) rollups an event on day counts towards"""
+    keys = [(day, "all", "all")]
+    if category:
+        keys.append((day, "category", category))
+    if handler_id:
+        keys.append((day, "handler", handler_id))
+    return keys
+
+def booking_rollup_contribution(booking: Optional[dict]) -> Dict[tuple, Dict[str, float]]:
+    """Counters a booking adds to the rollups of the day it was created"""
+    if not booking:
+        return {}
+    status = booking.get("status") or "pending"
+    counters = {"bookings": 1, f"status.{status}": 1}
+    if status == "completed":
+        counters["revenue"] = booking_revenue(booking)
+    keys = rollup_keys(rollup_day(booking.get("created_at")), booking_category(booking), booking_handler_id(booking))
+    return {key: counters for key in keys}
+
+async def apply_rollup_deltas(deltas: Dict[tuple, Dict[str, float]]):
+    updates = []
+    for (day, dimension, key), counters in deltas.items():
+        inc = {field: value for field, value in counters.items() if value}
+        if not inc:
+            continue
+        updates.append(UpdateOne(
+            {"_id": f"{day}|{dimension}|{key}"},
+            {"$inc": {**inc, "version": 1}, "$setOnInsert": {"day": day, "dimension": dimension, "key": key}},
+            upsert=True
+        ))
+    if updates:
+        await db.daily_rollups.bulk_write(updates, ordered=False)
+
+async def record_booking_rollups(before: Optional[dict], after: Optional[dict]):
+    deltas: Dict[tuple, Dict[str, float]] = {}
+    for booking, sign in ((before, -1), (after, 1)):
+        for key, counters in booking_rollup_contribution(booking).items():
+            key_deltas = deltas.setdefault(key, {})
+            for field, value in counters.items():
+                key_deltas[field] = key_deltas.get(field, 0) + sign * value
+    await apply_rollup_deltas(deltas)
+
+async def record_signup(kind: str, created_at: datetime):
+    """Count a user (by user_type) or partner registration"""
+    counters = {f"signups.{kind}": 1}
+    if kind != "partner":
+        counters["signups.user"] = 1
+    await apply_rollup_deltas({key: counters for key in rollup_keys(rollup_day(created_at))})
+
+async def record_payout(payout: dict):
+    counters = {"payouts": 1, "payout_amount": payout["amount"]}
+    keys = rollup_keys(rollup_day(payout["created_at"]), handler_id=payout.get("handler_id"))
+    await apply_rollup_deltas({key: counters for key in keys})
+
+def nest_counters(counters: Dict[str, float]) -> dict:
+    """Turn dotted counter names into the nested fields $inc produces"""
+    doc = {}
+    for field, value in counters.items():
+        if "." in field:
+            parent, child = field.split(".", 1)
+            doc.setdefault(parent, {})[child] = value
+        else:
+            doc[field] = value
+    return doc
+
+def rollup_days_match(days: Optional[List[str]]) -> dict:
+    """Source documents created on any of the days (None means every day)"""
+    if days is None:
+        return {}
+    ranges = []
+    for day in days:
+        start = datetime.strptime(day, "%Y-%m-%d")
+        ranges.append({"created_at": {"$gte": start, "$lt": start + timedelta(days=1)}})
+    if rollup_day(None) in days:
+        # Documents without created_at count towards today
+        ranges.append({"created_at": None})
+    return {"$or": ranges}
+
+async def rebuild_daily_rollups():
+    """Recompute every daily rollup from bookings, users, partners and payouts"""
+    day = {"$dateToString": {"format": "%Y-%m-%d", "date": {"$ifNull": ["$created_at", "$$NOW"]}}}
+    
+    async def compute(days: Optional[List[str]]) -> Dict[str, dict]:
+        counters: Dict[tuple, Dict[str, float]] = {}
+        match = {"$match": rollup_days_match(days)}
+        
+        def add(keys: List[tuple], values: Dict[str, float]):
+            for key in keys:
+                key_counters = counters.setdefault(key, {})
+                for field, value in values.items():
+                    key_counters[field] = key_counters.get(field, 0) + value
+        
+        async for row in db.bookings.aggregate([
+            match,
+            {"$group": {
+                "_id": {
+                    "day": day,
+                    "category": {"$ifNull": ["$service_category", "$category"]},
+                    "handler_id": BOOKING_HANDLER_EXPR,
+                    "status": {"$ifNull": ["$status", "pending"]},
+                },
+                "count": {"$sum": 1},
+                "revenue": {"$sum": BOOKING_REVENUE_EXPR},
+            }}
+        ], allowDiskUse=True):
+            group = row["_id"]
+            values = {"bookings": row["count"], f"status.{group['status']}": row["count"]}
+            if group["status"] == "completed":
+                values["revenue"] = row["revenue"]
+            add(rollup_keys(group["day"], group.get("category"), group.get("handler_id")), values)
+        
+        async for row in db.users.aggregate([
+            match,
+            {"$group": {"_id": {"day": day, "user_type": "$user_type"}, "count": {"$sum": 1}}}
+        ]):
+            values = {"signups.user": row["count"]}
+            if row["_id"].get("user_type"):
+                values[f"signups.{row['_id']['user_type']}"] = row["count"]
+            add(rollup_keys(row["_id"]["day"]), values)
+        
+        async for row in db.partners.aggregate([
+            match,
+            {"$group": {"_id": day, "count": {"$sum": 1}}}
+        ]):
+            add(rollup_keys(row["_id"]), {"signups.partner": row["count"]})
+        
+        async for row in db.payouts.aggregate([
+            match,
+            {"$group": {
+                "_id": {"day": day, "handler_id": "$handler_id"},
+                "count": {"$sum": 1},
+                "amount": {"$sum": {"$ifNull": ["$amount", 0]}},
+            }}
+        ]):
+            add(rollup_keys(row["_id"]["day"], handler_id=row["_id"].get("handler_id")),
+                {"payouts": row["count"], "payout_amount": row["amount"]})
+        
+        return {
+            f"{rollup_date}|{dimension}|{key}": {
+                "day": rollup_date, "dimension": dimension, "key": key, **nest_counters(values)
+            }
+            for (rollup_date, dimension, key), values in counters.items()
+        }
+    
+    rebuilt = await versioned_rebuild(
+        db.daily_rollups,
+        compute,
+        scope_query=lambda days: {} if days is None else {"day": {"$in": days}},
+        scope_of=lambda rollup_ids: list({rollup_id.split("|", 1)[0] for rollup_id in rollup_ids})
+    )
+    await db.backfill_runs.update_one(
+        {"_id": "daily_rollups"}, {"$set": {"completed_at": datetime.utcnow()}}, upsert=True
+    )
+    return rebuilt
+
+async def rollups_ready() -> bool:
+    """Whether the rollups cover history, i.e. rebuild_daily_rollups has run.
+
+    Live writes only count events from deploy onwards, so until then readers
+    compute from the source collections instead.
+    """
+    return await db.backfill_runs.count_documents({"_id": "daily_rollups"}, limit=1) > 0
+
+# ==================== Activity Sketches ====================
+
+# Distinct active customers/handlers are estimated with one HyperLogLog
+# sketch per day: 2^precision registers, each the highest rank seen
+HLL_PRECISION = 10
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_HASH_BITS = 64
+
+def hll_register(member: str) -> tuple:
+    """(register index, rank) a member sets in a sketch"""
+    value = int.from_bytes(hashlib.sha1(member.encode("utf-8")).digest()[:8], "big")
+    index = value >> (HLL_HASH_BITS - HLL_PRECISION)
+    remaining = value & ((1 << (HLL_HASH_BITS - HLL_PRECISION)) - 1)
+    return index, HLL_HASH_BITS - HLL_PRECISION - remaining.bit_length() + 1
+
+def hll_estimate(registers: Dict[str, int]) -> int:
+    """Cardinality estimate from sketch registers, with the small-range correction"""
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    harmonic = sum(2.0 ** -registers.get(str(i), 0) for i in range(HLL_REGISTERS))
+    estimate = alpha * HLL_REGISTERS * HLL_REGISTERS / harmonic
+    empty = HLL_REGISTERS - len(registers)
+    if estimate <= 2.5 * HLL_REGISTERS and empty:
+        estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / empty)
+    return round(estimate)
+
+async def record_activity(day: str, members: Dict[str, Optional[str]]):
+    """Add members (kind -> user id) to that day's activity sketches"""
+    updates = []
+    for kind, member in members.items():
+        if not member:
+            continue
+        index, rank = hll_register(member)
+        updates.append(UpdateOne(
+            {"_id": f"{day}|{kind}"},
+            {"$max": {f"registers.{index}": rank}, "$setOnInsert": {"day": day, "kind": kind}},
+            upsert=True
+        ))
+    if updates:
+        await db.activity_sketches.bulk_write(updates, ordered=False)
+
+async def estimate_active(kind: str, since_day: str) -> int:
+    """Approximate distinct active users of a kind from since_day on, merging daily sketches"""
+    merged: Dict[str, int] = {}
+    async for sketch in db.activity_sketches.find({"kind": kind, "day": {"$gte": since_day}}, {"registers": 1}):
+        for index, rank in sketch.get("registers", {}).items():
+            if rank > merged.get(index, 0):
+                merged[index] = rank
+    return hll_estimate(merged)
+
+async def count_active_exact(field: str, since: datetime) -> int:
+    """Exact distinct users who created or updated a booking since a time"""
+    result = await aggregate_one(db.bookings, [
+        {"$match": {
+            "$or": [{"created_at": {"$gte": since}}, {"updated_at": {"$gte": since}}],
+            field: {"$ne": None}
+        }},
+        {"$group": {"_id": f"${field}"}},
+        {"$count": "count"}
+    ])
+    return result.get("count", 0)
+
+async def record_booking_activity(after: Optional[dict]):
+    if after:
+        await record_activity(rollup_day(None), {"customers": after.get("customer_id"), "handlers": booking_handler_id(after)})
+
+ACTIVITY_SKETCH_BACKFILL_DAYS = 90
+
+async def rebuild_activity_sketches():
+    """Recompute recent activity sketches from bookings"""
+    # Activity is approximated by the day each booking was last written
+    since = datetime.utcnow() - timedelta(days=ACTIVITY_SKETCH_BACKFILL_DAYS)
+    sketches: Dict[tuple, Dict[str, int]] = {}
+    async for row in db.bookings.aggregate([
+        {"$project": {
+            "customer_id": 1,
+            "handler_id": 1,
+            "written_at": {"$ifNull": ["$updated_at", "$created_at"]}
+        }},
+        {"$match": {"written_at": {"$gte": since}}},
+        {"$group": {"_id": {
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$written_at"}},
+            "customer_id": "$customer_id",
+            "handler_id": "$handler_id"
+        }}}
+    ], allowDiskUse=True):
+        for kind, member in (("customers", row["_id"].get("customer_id")), ("handlers", row["_id"].get("handler_id"))):
+            if not member:
+                continue
+            index, rank = hll_register(member)
+            registers = sketches.setdefault((row["_id"]["day"], kind), {})
+            registers[str(index)] = max(rank, registers.get(str(index), 0))
+    
+    if sketches:
+        await db.activity_sketches.bulk_write([
+            ReplaceOne(
+                {"_id": f"{day}|{kind}"},
+                {"day": day, "kind": kind, "registers": registers},
+                upsert=True
+            )
+            for (day, kind), registers in sketches.items()
+        ], ordered=False)
+    return len(sketches)
+
+async def drop_platform_counters():
+    """Drop the booking status counter collection; status counts now come from daily_rollups"""
+    if "platform_counters" not in await db.list_collection_names():
+        return 0
+    await db.drop_collection("platform_counters")
+    return 1
+
+# ==================== Handler Stats ====================
+
+REVIEW_SUB_SCORES = ["service_quality", "handlerism", "timeliness"]
+RECENT_REVIEW_WINDOW = 20  # Ratings kept for the recent-window average
+
+def booking_stats_contribution(booking: Optional[dict]) -> Dict[str, Dict[str, int]]:
+    """Job counters a booking adds to its handler's stats"""
+    if not booking or not booking_handler_id(booking):
+        return {}
+    return {booking_handler_id(booking): {
+        "total_jobs": 1,
+        "completed_jobs": 1 if booking.get("status") == "completed" else 0
+    }}
+
+# Booking fields the booking-derived read models depend on
+BOOKING_CHANGE_PROJECTION = {
+    "handler_id": 1, "professional_id": 1, "customer_id": 1, "status": 1, "created_at": 1,
+    "service_category": 1, "category": 1, "service_price": 1, "total_price": 1, "revenue_amount": 1,
+    "check_out_time": 1, "actual_end": 1,
+}
+
+async def record_booking_change(before: Optional[dict], after: Optional[dict]):
+    """Apply a booking write to the booking-derived read models.
+
+    before/after are the booking as it was and as it is now (None for an
+    insert or delete); only the BOOKING_CHANGE_PROJECTION fields are needed.
+    """
+    await asyncio.gather(
+        record_booking_rollups(before, after),
+        record_booking_activity(after),
+        record_booking_earnings(before, after)
+    )
+    
+    deltas: Dict[str, Dict[str, int]] = {}
+    for booking, sign in ((before, -1), (after, 1)):
+        for handler_id, counts in booking_stats_contribution(booking).items():
+            handler_deltas = deltas.setdefault(handler_id, {"total_jobs": 0, "completed_jobs": 0})
+            for field, value in counts.items():
+                handler_deltas[field] += sign * value
+    
+    customer_deltas: Dict[str, int] = {}
+    for booking, sign in ((before, -1), (after, 1)):
+        if booking and booking.get("customer_id"):
+            customer_deltas[booking["customer_id"]] = customer_deltas.get(booking["customer_id"], 0) + sign
+    
+    now = datetime.utcnow()
+    writes = []
+    if deltas:
+        writes.append(db.handler_stats.bulk_write([
+            UpdateOne(
+                {"_id": handler_id},
+                {"$inc": {**counts, "version": 1}, "$max": {"last_activity_at": now}},
+                upsert=True
+            )
+            for handler_id, counts in deltas.items()
+        ], ordered=False))
+    if customer_deltas:
+        writes.append(db.customer_stats.bulk_write([
+            UpdateOne(
+                {"_id": customer_id},
+                {"$inc": {"total_bookings": delta}, "$max": {"last_activity_at": now}},
+                upsert=True
+            )
+            for customer_id, delta in customer_deltas.items()
+        ], ordered=False))
+    
+    # The admin user listing sorts on activity, so it is mirrored onto the users
+    active_ids = [
+        ObjectId(user_id) for user_id in ((after or {}).get("customer_id"), booking_handler_id(after or {}))
+        if user_id and ObjectId.is_valid(user_id)
+    ]
+    if active_ids:
+        writes.append(db.users.update_many({"_id": {"$in": active_ids}}, {"$max": {"last_activity_at": now}}))
+    await asyncio.gather(*writes)
+
+def average_rating(review_count: int, rating_sum: float) -> float:
+    return round(rating_sum / review_count, 2) if review_count else 0
+
+# A review counts towards sub_score_count when it has any sub-score; the
+# expression below is the same rule for the rebuild
+REVIEW_HAS_SUB_SCORES_EXPR = {"$or": [{"$ne": [{"$ifNull": [f"${name}", None]}, None]} for name in REVIEW_SUB_SCORES]}
+
+def review_summary_update(review: dict) -> dict:
+    """Update folding one review into a review summary (handler or category)"""
+    stars = min(5, max(1, int(round(review["rating"]))))
+    inc = {"review_count": 1, "rating_sum": review["rating"], f"histogram.{stars}": 1}
+    sub_scores = {name: review[name] for name in REVIEW_SUB_SCORES if review.get(name) is not None}
+    if sub_scores:
+        inc["sub_score_count"] = 1
+        inc.update({f"sub_score_sums.{name}": value for name, value in sub_scores.items()})
+    return {
+        "$inc": inc,
+        "$push": {"recent_ratings": {"$each": [review["rating"]], "$slice": -RECENT_REVIEW_WINDOW}},
+        "$max": {"last_activity_at": review["created_at"]}
+    }
+
+async def record_review_stats(review: dict):
+    """Add a newly created review to its handler and category summaries and the handler's rating"""
+    update = review_summary_update(review)
+    versioned_update = {**update, "$inc": {**update["$inc"], "version": 1}}
+    category = booking_category(review)
+    stats, _ = await asyncio.gather(
+        db.handler_stats.find_one_and_update(
+            {"_id": review["handler_id"]},
+            versioned_update,
+            projection={"review_count": 1, "rating_sum": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        ),
+        db.category_review_stats.update_one({"_id": category}, versioned_update, upsert=True) if category else asyncio.sleep(0)
+    )
+    await sync_user_rating(review["handler_id"], stats)
+
+async def sync_user_rating(handler_id: str, stats: dict):
+    """Copy the derived average onto the handler's user document.
+
+    The rating_synced_count guard keeps a slower request from overwriting
+    the rating written for a newer review. It is a field only this sync
+    writes, so a legacy users.review_count larger than the stats count
+    cannot freeze the rating.
+    """
+    review_count = stats.get("review_count", 0)
+    if not review_count or not ObjectId.is_valid(handler_id):
+        return
+    
+    await db.users.update_one(
+        {
+            "_id": ObjectId(handler_id),
+            "$or": [{"rating_synced_count": {"$exists": False}}, {"rating_synced_count": {"$lt": review_count}}]
+        },
+        {"$set": {
+            "rating": average_rating(review_count, stats["rating_sum"]),
+            "review_count": review_count,
+            "rating_synced_count": review_count
+        }}
+    )
+
+def summarize_reviews(stats: Optional[dict]) -> dict:
+    """Derive averages, histogram and recent average from a review summary document"""
+    stats = stats or {}
+    review_count = stats.get("review_count", 0)
+    sub_score_count = stats.get("sub_score_count", 0)
+    sub_score_sums = stats.get("sub_score_sums", {})
+    histogram = stats.get("histogram", {})
+    recent = stats.get("recent_ratings", [])
+    return {
+        "rating": average_rating(review_count, stats.get("rating_sum", 0)),
+        "review_count": review_count,
+        "sub_scores": {
+            name: round(sub_score_sums.get(name, 0) / sub_score_count, 2) if sub_score_count else 0
+            for name in REVIEW_SUB_SCORES
+        },
+        "histogram": {str(stars): histogram.get(str(stars), 0) for stars in range(1, 6)},
+        "recent_rating": average_rating(len(recent), sum(recent)),
+        "recent_count": len(recent),
+    }
+
+def summarize_handler_stats(stats: Optional[dict]) -> dict:
+    """Derive averages from a handler_stats document"""
+    stats = stats or {}
+    return {
+        **summarize_reviews(stats),
+        "total_jobs": stats.get("total_jobs", 0),
+        "completed_jobs": stats.get("completed_jobs", 0),
+        "last_activity_at": stats.get("last_activity_at"),
+    }
+
+async def get_handler_stats(handler_id: str) -> dict:
+    return summarize_handler_stats(await db.handler_stats.find_one({"_id": handler_id}))
+
+def review_summary_stages(group_key) -> List[dict]:
+    """Aggregation stages producing review summary documents grouped by group_key"""
+    group = {
+        "_id": group_key,
+        "review_count": {"$sum": 1},
+        "rating_sum": {"$sum": "$rating"},
+        "sub_score_count": {"$sum": {"$cond": [REVIEW_HAS_SUB_SCORES_EXPR, 1, 0]}},
+        # Bounded per group, unlike $push: only the newest ratings are kept
+        "recent_ratings": {"$bottomN": {"n": RECENT_REVIEW_WINDOW, "sortBy": {"created_at": 1}, "output": "$rating"}},
+        "last_activity_at": {"$max": "$created_at"},
+    }
+    group.update({name: {"$sum": {"$ifNull": [f"${name}", 0]}} for name in REVIEW_SUB_SCORES})
+    group.update({
+        f"stars_{stars}": {"$sum": {"$cond": [{"$eq": [{"$min": [5, {"$max": [1, {"$round": ["$rating", 0]}]}]}, stars]}, 1, 0]}}
+        for stars in range(1, 6)
+    })
+    
+    project = {
+        "review_count": 1,
+        "rating_sum": 1,
+        "sub_score_count": 1,
+        "sub_score_sums": {name: f"${name}" for name in REVIEW_SUB_SCORES},
+        "histogram": {str(stars): f"$stars_{stars}" for stars in range(1, 6)},
+        "recent_ratings": 1,
+        "last_activity_at": 1,
+    }
+    return [{"$group": group}, {"$project": project}]
+
+async def rebuild_category_review_stats():
+    """Recompute category review summaries, taking the category from the booking for older reviews"""
+    async def compute(categories: Optional[List[str]]) -> Dict[str, dict]:
+        summaries = {}
+        async for row in db.reviews.aggregate([
+            {"$addFields": {"booking_oid": {"$convert": {"input": "$booking_id", "to": "objectId", "onError": None, "onNull": None}}}},
+            {"$lookup": {"from": "bookings", "localField": "booking_oid", "foreignField": "_id", "as": "booking"}},
+            # booking_category of the review, then of its booking
+            {"$addFields": {"category": {"$ifNull": ["$service_category", {"$ifNull": ["$category", {"$ifNull": [
+                {"$first": "$booking.service_category"}, {"$first": "$booking.category"}
+            ]}]}]}}},
+            {"$match": {"category": {"$ne": None} if categories is None else {"$in": categories}}},
+            *review_summary_stages("$category")
+        ], allowDiskUse=True):
+            summaries[row.pop("_id")] = row
+        return summaries
+    
+    return await versioned_rebuild(
+        db.category_review_stats,
+        compute,
+        scope_query=lambda categories: {} if categories is None else {"_id": {"$in": categories}},
+        scope_of=lambda doc_ids: doc_ids
+    )
+
+async def rebuild_handler_stats():
+    """Recompute every handler_stats document from reviews and bookings"""
+    async def compute(handler_ids: Optional[List[str]]) -> Dict[str, dict]:
+        match = {"$ne": None} if handler_ids is None else {"$in": handler_ids}
+        stats: Dict[str, dict] = {}
+        
+        async for row in db.reviews.aggregate([
+            {"$match": {"handler_id": match}},
+            *review_summary_stages("$handler_id")
+        ], allowDiskUse=True):
+            stats[row.pop("_id")] = row
+        
+        async for row in db.bookings.aggregate([
+            {"$match": booking_handler_match(match)},
+            {"$group": {
+                "_id": BOOKING_HANDLER_EXPR,
+                "total_jobs": {"$sum": 1},
+                "completed_jobs": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+                "last_booking_at": {"$max": {"$ifNull": ["$updated_at", "$created_at"]}},
+            }}
+        ]):
+            handler_stats = stats.setdefault(row["_id"], {})
+            handler_stats["total_jobs"] = row["total_jobs"]
+            handler_stats["completed_jobs"] = row["completed_jobs"]
+            activity = [t for t in (handler_stats.get("last_activity_at"), row["last_booking_at"]) if t]
+            handler_stats["last_activity_at"] = max(activity) if activity else None
+        return stats
+    
+    return await versioned_rebuild(
+        db.handler_stats,
+        compute,
+        scope_query=lambda handler_ids: {} if handler_ids is None else {"_id": {"$in": handler_ids}},
+        scope_of=lambda doc_ids: doc_ids
+    )
+
+async def rebuild_customer_stats():
+    """Recompute every customer_stats document from bookings"""
+    stats = await db.bookings.aggregate([
+        {"$match": {"customer_id": {"$ne": None}}},
+        {"$group": {
+            "_id": "$customer_id",
+            "total_bookings": {"$sum": 1},
+            "last_activity_at": {"$max": {"$ifNull": ["$updated_at", "$created_at"]}},
+        }}
+    ], allowDiskUse=True).to_list(None)
+    
+    if stats:
+        await db.customer_stats.bulk_write([
+            ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in stats
+        ], ordered=False)
+    await db.customer_stats.delete_many({"_id": {"$nin": [doc["_id"] for doc in stats]}})
+    return len(stats)
+
+def user_search_keys(name: Optional[str], email: Optional[str]) -> List[str]:
+    """Lower-cased values the admin user search prefix-matches against"""
+    return [value.strip().lower() for value in (name, email) if value]
+
+async def backfill_user_listing():
+    """Set search_keys and last_activity_at on users for the admin listing"""
+    searchable = await db.users.update_many({}, [{"$set": {"search_keys": {"$filter": {
+        "input": [{"$toLower": {"$trim": {"input": {"$ifNull": ["$name", ""]}}}}, {"$toLower": {"$trim": {"input": {"$ifNull": ["$email", ""]}}}}],
+        "cond": {"$ne": ["$$this", ""]}
+    }}}}])
+    
+    # Fold each stats collection's last activity into the matching user
+    for stats in (db.handler_stats, db.customer_stats):
+        await stats.aggregate([
+            {"$match": {"last_activity_at": {"$ne": None}}},
+            {"$project": {
+                "_id": {"$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}},
+                "last_activity_at": 1
+            }},
+            {"$match": {"_id": {"$ne": None}}},
+            {"$merge": {
+                "into": "users",
+                "whenMatched": [{"$set": {"last_activity_at": {"$max": ["$last_activity_at", "$$new.last_activity_at"]}}}],
+                "whenNotMatched": "discard"
+            }}
+        ]).to_list(None)
+    return searchable.modified_count
+
+RATING_RECONCILE_BATCH_SIZE = 500
+
+async def reconcile_handler_ratings(batch_size: int = RATING_RECONCILE_BATCH_SIZE):
+    """Repair rating drift between reviews, handler_stats and users, a batch of handlers at a time.
+
+    Fixes are compare-and-set against the values that were read, so a
+    review posted mid-run is never overwritten; the next run picks it up.
+    """
+    repaired = 0
+    last_id = None
+    while True:
+        query = {"user_type": "handler"}
+        if last_id:
+            query["_id"] = {"$gt": last_id}
+        handlers = await db.users.find(query, {"rating": 1, "review_count": 1}) \
+            .sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not handlers:
+            return repaired
+        last_id = handlers[-1]["_id"]
+        
+        handler_ids = [str(h["_id"]) for h in handlers]
+        actual = {}
+        async for row in db.reviews.aggregate([
+            {"$match": {"handler_id": {"$in": handler_ids}}},
+            {"$group": {"_id": "$handler_id", "review_count": {"$sum": 1}, "rating_sum": {"$sum": "$rating"}}}
+        ]):
+            actual[row["_id"]] = row
+        stored = {}
+        async for doc in db.handler_stats.find({"_id": {"$in": handler_ids}}, {"review_count": 1, "rating_sum": 1}):
+            stored[doc["_id"]] = doc
+        
+        stats_ops = []
+        user_ops = []
+        for handler in handlers:
+            handler_id = str(handler["_id"])
+            truth = actual.get(handler_id, {"review_count": 0, "rating_sum": 0})
+            current = stored.get(handler_id, {})
+            if (current.get("review_count", 0), current.get("rating_sum", 0)) != (truth["review_count"], truth["rating_sum"]):
+                stats_ops.append(UpdateOne(
+                    {"_id": handler_id, "review_count": current.get("review_count"), "rating_sum": current.get("rating_sum")},
+                    {"$set": {"review_count": truth["review_count"], "rating_sum": truth["rating_sum"]}, "$inc": {"version": 1}},
+                    upsert=handler_id not in stored
+                ))
+            
+            rating = average_rating(truth["review_count"], truth["rating_sum"])
+            if truth["review_count"] and (handler.get("rating"), handler.get("review_count")) != (rating, truth["review_count"]):
+                user_ops.append(UpdateOne(
+                    {"_id": handler["_id"], "review_count": handler.get("review_count")},
+                    {"$set": {"rating": rating, "review_count": truth["review_count"], "rating_synced_count": truth["review_count"]}}
+                ))
+        
+        try:
+            if stats_ops:
+                await db.handler_stats.bulk_write(stats_ops, ordered=False)
+            if user_ops:
+                await db.users.bulk_write(user_ops, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent review created the stats document first
+            logger.warning(f"Rating reconciliation skipped writes: {e.details.get('writeErrors')}")
+        repaired += len(stats_ops) + len(user_ops)
+
 # ==================== Auth Routes ====================
 
 @api_router.post("/auth/register", response_model=UserResponse)
@@ -389,7 +1303,9 @@ async def register_user(user: UserCreate):
         # Customers don't need skills
         user_dict.pop("skills", None)
     
+    user_dict["search_keys"] = user_search_keys(user_dict.get("name"), user_dict.get("email"))
     result = await db.users.insert_one(user_dict)
+    await record_signup(user.user_type, user_dict["created_at"])
     created_user = await db.users.find_one({"_id": result.inserted_id})
     return UserResponse(**serialize_doc(created_user))
 
@@ -463,6 +1379,7 @@ async def create_booking(booking: BookingCreate):
     booking_dict = booking.dict()
     booking_dict["service_name"] = service["name"]
     booking_dict["service_price"] = service["fixed_price"]
+    booking_dict["revenue_amount"] = service["fixed_price"]
     booking_dict["service_category"] = service.get("category", booking.service_category)
     booking_dict["status"] = "pending"
     booking_dict["payment_status"] = "pending"
@@ -472,6 +1389,7 @@ async def create_booking(booking: BookingCreate):
     booking_dict["actual_end"] = None
     
     result = await db.bookings.insert_one(booking_dict)
+    await record_booking_change(None, booking_dict)
     created_booking = await db.bookings.find_one({"_id": result.inserted_id})
     return BookingResponse(**serialize_doc(created_booking))
 
@@ -513,6 +1431,7 @@ async def create_bulk_bookings(bulk_booking: BulkBookingCreate):
             "customer_id": bulk_booking.customer_id,
             "service_name": service_names,
             "service_price": total_price,
+            "revenue_amount": total_price,
             "service_category": category,
             "status": "pending",
             "scheduled_date": bulk_booking.scheduled_date,
@@ -530,6 +1449,7 @@ async def create_bulk_bookings(bulk_booking: BulkBookingCreate):
         }
         
         result = await db.bookings.insert_one(booking_dict)
+        await record_booking_change(None, booking_dict)
         created_booking = await db.bookings.find_one({"_id": result.inserted_id})
         created_bookings.append(serialize_doc(created_booking))
     
@@ -608,8 +1528,12 @@ async def update_booking(booking_id: str, update: BookingUpdate):
             {"_id": ObjectId(booking_id)},
             {"$set": update_dict}
         )
+        location_ingestor.invalidate(booking.get("handler_id"))
+        location_ingestor.invalidate(update_dict.get("handler_id"))
     
     updated_booking = await db.bookings.find_one({"_id": ObjectId(booking_id)})
+    if update_dict:
+        await record_booking_change(booking, updated_booking)
     
     # Send WebSocket notification
     if update.status:
@@ -651,6 +1575,317 @@ async def get_handlers(skill: Optional[str] = None, available: Optional[bool] =
         result.append(HandlerResponse(**p_dict))
     return result
 
+# Public handler fields served by the directory
+HANDLER_DIRECTORY_PROJECTION = {
+    "name": 1, "skills": 1, "bio": 1, "profile_image_url": 1,
+    "rating": 1, "total_jobs": 1, "available": 1
+}
+DIRECTORY_MAX_PAGE_SIZE = 100
+
+def directory_entry(doc: dict, distance_meters: Optional[float] = None) -> HandlerDirectoryEntry:
+    entry = {k: v for k, v in doc.items() if k in HANDLER_DIRECTORY_PROJECTION and v is not None}
+    if distance_meters is not None:
+        entry["distance_miles"] = round(distance_meters / METERS_PER_MILE, 2)
+    return HandlerDirectoryEntry(id=str(doc["_id"]), **entry)
+
+def rating_cursor_filter(cursor: dict) -> dict:
+    """Match handlers after the cursor in (rating desc, _id desc) order"""
+    last_id = ObjectId(cursor["id"])
+    rating = cursor.get("rating")
+    if rating is None:
+        # Unrated handlers sort last
+        return {"rating": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"rating": {"$lt": rating}},
+        {"rating": rating, "_id": {"$lt": last_id}},
+        {"rating": None}
+    ]}
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def directory_cursor(cursor: str, sort: str) -> dict:
+    """Decode a directory cursor, checking it has the keys the sort pages on"""
+    last = decode_cursor(cursor)
+    if not isinstance(last.get("id"), str) or not ObjectId.is_valid(last["id"]):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if sort == "rating":
+        valid = "rating" in last and (last["rating"] is None or is_number(last["rating"]))
+    else:
+        valid = is_number(last.get("distance")) and last["distance"] >= 0
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last
+
+async def nearest_handlers(geo_near: dict, after: List[dict], online_stages: List[dict], limit: int) -> List[dict]:
+    """The first `limit` handlers in (distance, _id) order.
+    
+    $geoNear already streams in distance order, so only handlers tied at the
+    page's last distance need sorting by _id; they are re-read in _id order
+    when the tie runs past the end of the page.
+    """
+    def pipeline(near: dict, *stages: dict) -> List[dict]:
+        return [
+            {"$geoNear": near},
+            *([{"$match": {"$or": after}}] if after else []),
+            *online_stages,
+            *stages,
+            {"$project": {**HANDLER_DIRECTORY_PROJECTION, "distance_meters": 1}}
+        ]
+    
+    docs = await db.users.aggregate(pipeline(geo_near, {"$limit": limit + 1})).to_list(limit + 1)
+    docs.sort(key=lambda doc: (doc["distance_meters"], doc["_id"]))
+    if len(docs) <= limit or docs[limit - 1]["distance_meters"] != docs[limit]["distance_meters"]:
+        return docs[:limit]
+    
+    boundary = docs[limit - 1]["distance_meters"]
+    closer = [doc for doc in docs if doc["distance_meters"] < boundary]
+    tied = await db.users.aggregate(pipeline(
+        {**geo_near, "minDistance": boundary, "maxDistance": boundary},
+        {"$match": {"distance_meters": boundary}},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit - len(closer)}
+    )).to_list(limit - len(closer))
+    return closer + tied
+
+@api_router.get("/handlers/directory", response_model=HandlerDirectoryPage)
+async def get_handler_directory(
+    skill: Optional[str] = None,
+    available: Optional[bool] = None,
+    min_rating: Optional[float] = None,
+    sort: str = "rating",
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    max_distance_miles: Optional[float] = None,
+    online: bool = False,
+    limit: int = 20,
+    cursor: Optional[str] = None
+):
+    """Paginated public handler directory sorted by rating or distance"""
+    if sort not in ("rating", "distance"):
+        raise HTTPException(status_code=400, detail="Sort must be 'rating' or 'distance'")
+    if sort == "distance" and (latitude is None or longitude is None):
+        raise HTTPException(status_code=400, detail="Distance sort requires latitude and longitude")
+    
+    limit = max(1, min(limit, DIRECTORY_MAX_PAGE_SIZE))
+    last = directory_cursor(cursor, sort) if cursor else None
+    
+    query = {"user_type": "handler"}
+    if skill:
+        query["skills"] = skill
+    if available is not None:
+        query["available"] = available
+    if min_rating is not None:
+        query["rating"] = {"$gte": min_rating}
+    # Online handlers are joined through presence's _id index per candidate,
+    # rather than collecting every online user up front
+    online_stages = online_presence_stages() if online else []
+    
+    if sort == "rating":
+        if last:
+            query = {"$and": [query, rating_cursor_filter(last)]}
+        if online:
+            docs = await db.users.aggregate([
+                {"$match": query},
+                {"$sort": {"rating": -1, "_id": -1}},
+                *online_stages,
+                {"$limit": limit},
+                {"$project": HANDLER_DIRECTORY_PROJECTION}
+            ]).to_list(limit)
+        else:
+            docs = await db.users.find(query, HANDLER_DIRECTORY_PROJECTION) \
+                .sort([("rating", -1), ("_id", -1)]).limit(limit).to_list(limit)
+        handlers = [directory_entry(doc) for doc in docs]
+        next_cursor = None
+        if len(docs) == limit:
+            next_cursor = encode_cursor({"rating": docs[-1].get("rating"), "id": str(docs[-1]["_id"])})
+        return HandlerDirectoryPage(handlers=handlers, next_cursor=next_cursor)
+    
+    geo_near = {
+        "near": geo_point(latitude, longitude),
+        "distanceField": "distance_meters",
+        "spherical": True,
+        "query": query
+    }
+    if max_distance_miles is not None:
+        geo_near["maxDistance"] = max_distance_miles * METERS_PER_MILE
+    
+    after = []
+    if last:
+        geo_near["minDistance"] = last["distance"]
+        after = [
+            {"distance_meters": {"$gt": last["distance"]}},
+            {"distance_meters": last["distance"], "_id": {"$gt": ObjectId(last["id"])}}
+        ]
+    # (distance, _id) is a total order, so handlers at the same distance
+    # are neither skipped nor repeated across pages
+    docs = await nearest_handlers(geo_near, after, online_stages, limit)
+    handlers = [directory_entry(doc, doc["distance_meters"]) for doc in docs]
+    next_cursor = None
+    if len(docs) == limit:
+        next_cursor = encode_cursor({"distance": docs[-1]["distance_meters"], "id": str(docs[-1]["_id"])})
+    return HandlerDirectoryPage(handlers=handlers, next_cursor=next_cursor)
+
+async def backfill_handler_geo():
+    """Derive the GeoJSON geo field from each user's stored location"""
+    result = await db.users.update_many(
+        {"location.latitude": {"$type": "number"}, "location.longitude": {"$type": "number"}},
+        [{"$set": {"geo": {"type": "Point", "coordinates": ["$location.longitude", "$location.latitude"]}}}]
+    )
+    return result.modified_count
+
+# ==================== Presence ====================
+
+PRESENCE_TTL_SECONDS = int(os.environ.get("PRESENCE_TTL_SECONDS", "90"))
+PRESENCE_REFRESH_SECONDS = float(os.environ.get("PRESENCE_REFRESH_SECONDS", "15"))
+PRESENCE_DISCONNECT_GRACE_SECONDS = 30
+
+class PresenceRegistry:
+    """Tracks which users are online right now.
+
+    WebSocket connections and location heartbeats are recorded in memory and
+    written to the presence collection in one bulk_write per refresh. Each
+    presence document carries expires_at: a TTL index removes handlers whose
+    heartbeats stop, and reads also filter on it since the TTL monitor only
+    runs about once a minute.
+    """
+
+    def __init__(self, ttl_seconds: int, refresh_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.connected: set = set()
+        self.pending: Dict[str, dict] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def touch(self, user_id: str, location: Optional[dict] = None, ttl_seconds: Optional[int] = None):
+        """Record a heartbeat, optionally with a position and a longer expected gap"""
+        now = datetime.utcnow()
+        update = {
+            "last_seen_at": now,
+            "expires_at": now + timedelta(seconds=max(self.ttl_seconds, ttl_seconds or 0))
+        }
+        if location:
+            update["geo"] = geo_point(location["latitude"], location["longitude"])
+        self.pending.setdefault(user_id, {}).update(update)
+
+    def connect(self, user_id: str):
+        self.connected.add(user_id)
+        self.touch(user_id)
+
+    def disconnect(self, user_id: str, still_connected: bool):
+        if still_connected:
+            return
+        self.connected.discard(user_id)
+        # Short grace period so a reconnecting app does not flap offline
+        now = datetime.utcnow()
+        self.pending.setdefault(user_id, {}).update({
+            "last_seen_at": now,
+            "expires_at": now + timedelta(seconds=PRESENCE_DISCONNECT_GRACE_SECONDS)
+        })
+
+    async def flush(self) -> int:
+        for user_id in self.connected:
+            if user_id not in self.pending:
+                self.touch(user_id)
+        if not self.pending:
+            return 0
+        
+        pending, self.pending = self.pending, {}
+        await db.presence.bulk_write([
+            UpdateOne({"_id": user_id}, {"$set": update}, upsert=True)
+            for user_id, update in pending.items()
+        ], ordered=False)
+        return len(pending)
+
+    async def online_ids(self, user_ids: List[str]) -> set:
+        """Which of the given users are online"""
+        if not user_ids:
+            return set()
+        docs = await db.presence.find(
+            {"_id": {"$in": user_ids}, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}
+        ).to_list(None)
+        return {doc["_id"] for doc in docs}
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        for user_id in list(self.connected):
+            self.disconnect(user_id, still_connected=False)
+        await self.flush()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Presence flush failed: {e}")
+
+presence_registry = PresenceRegistry(PRESENCE_TTL_SECONDS, PRESENCE_REFRESH_SECONDS)
+
+def online_presence_stages() -> List[dict]:
+    """Pipeline stages keeping only users with a live presence document"""
+    return [
+        {"$lookup": {
+            "from": "presence",
+            "let": {"user_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}, "expires_at": {"$gt": datetime.utcnow()}}},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "presence"
+        }},
+        {"$match": {"presence": {"$ne": []}}}
+    ]
+
+@api_router.get("/handlers/online", response_model=HandlerDirectoryPage)
+async def get_online_handlers_near(
+    latitude: float,
+    longitude: float,
+    radius_miles: float = 10,
+    skill: Optional[str] = None,
+    limit: int = 20
+):
+    """Handlers online right now, nearest first"""
+    limit = max(1, min(limit, DIRECTORY_MAX_PAGE_SIZE))
+    
+    # Over-fetch from presence since some may be filtered out by skill or status
+    nearby = await db.presence.aggregate([
+        {"$geoNear": {
+            "near": geo_point(latitude, longitude),
+            "distanceField": "distance_meters",
+            "spherical": True,
+            "maxDistance": radius_miles * METERS_PER_MILE,
+            "query": {"expires_at": {"$gt": datetime.utcnow()}}
+        }},
+        {"$limit": limit * 3},
+        {"$project": {"distance_meters": 1}}
+    ]).to_list(limit * 3)
+    distances = {doc["_id"]: doc["distance_meters"] for doc in nearby}
+    
+    query = {
+        "_id": {"$in": [ObjectId(h) for h in distances if ObjectId.is_valid(h)]},
+        "user_type": "handler",
+        "status": {"$nin": ["suspended", "banned", "deleted"]}
+    }
+    if skill:
+        query["skills"] = skill
+    docs = await db.users.find(query, HANDLER_DIRECTORY_PROJECTION).to_list(None)
+    docs.sort(key=lambda doc: distances[str(doc["_id"])])
+    
+    return HandlerDirectoryPage(
+        handlers=[directory_entry(doc, distances[str(doc["_id"])]) for doc in docs[:limit]]
+    )
+
 @api_router.get("/handlers/{handler_id}", response_model=HandlerResponse)
 async def get_handler(handler_id: str):
     """Get handler details"""
@@ -659,60 +1894,656 @@ async def get_handler(handler_id: str):
         raise HTTPException(status_code=404, detail="Handler not found")
     return HandlerResponse(**serialize_doc(handler))
 
+# ==================== Location Ingestion ====================
+
+LOCATION_FLUSH_SECONDS = float(os.environ.get("LOCATION_FLUSH_SECONDS", "2"))
+LOCATION_PUSH_INTERVAL_SECONDS = float(os.environ.get("LOCATION_PUSH_INTERVAL_SECONDS", "3"))
+ACTIVE_BOOKING_CACHE_SECONDS = 30
+
+# Booking statuses during which the customer follows the handler's location
+TRACKED_BOOKING_STATUSES = ["accepted", "in_progress"]
+
+METERS_PER_MILE = 1609.344
+
+# Reporting cadence handed back to the handler app, keyed by handler state.
+# Pings that moved less than min_distance_meters are dropped unless the last
+# stored ping is older than keepalive_seconds.
+LOCATION_REPORTING_POLICIES = {
+    "idle": {"interval_seconds": 300, "min_distance_meters": 250, "keepalive_seconds": 900},
+    "en_route": {"interval_seconds": 10, "min_distance_meters": 20, "keepalive_seconds": 60},
+    "in_progress": {"interval_seconds": 120, "min_distance_meters": 100, "keepalive_seconds": 600},
+}
+
+def location_reporting_state(booking: Optional[dict]) -> str:
+    """Map a handler's active booking to a reporting policy key"""
+    if not booking:
+        return "idle"
+    return "in_progress" if booking.get("status") == "in_progress" else "en_route"
+
+class LocationIngestor:
+    """Buffers handler location pings and writes them in periodic bulk flushes.
+
+    Pings are coalesced per handler (last write wins), so a flush issues at most
+    one update per handler. Pings that moved less than the handler's current
+    reporting policy allows are dropped before buffering. Customers of an
+    active booking get throttled location_update pushes from a cached
+    handler -> booking mapping.
+    """
+
+    def __init__(self, flush_seconds: float, push_interval_seconds: float):
+        self.flush_seconds = flush_seconds
+        self.push_interval_seconds = push_interval_seconds
+        self.pending: Dict[str, dict] = {}
+        self.active_bookings: Dict[str, tuple] = {}  # handler_id -> (booking, expires_at)
+        self.last_push: Dict[str, float] = {}
+        self.last_stored: Dict[str, tuple] = {}  # handler_id -> (latitude, longitude, stored_at)
+        self.task: Optional[asyncio.Task] = None
+
+    async def ingest(self, handler_id: str, location: dict) -> dict:
+        """Buffer a ping unless it is redundant and return the reporting policy"""
+        booking = await self.get_active_booking(handler_id)
+        state = location_reporting_state(booking)
+        policy = LOCATION_REPORTING_POLICIES[state]
+        
+        # Every ping is a heartbeat, even one too close to the last to store
+        presence_registry.touch(handler_id, location, ttl_seconds=policy["interval_seconds"] * 2)
+        
+        accepted = self.should_store(handler_id, location, policy)
+        if accepted:
+            self.pending[handler_id] = {"location": location, "received_at": datetime.utcnow()}
+            if booking:
+                await self.push_to_customer(handler_id, booking, location)
+        
+        return {
+            "accepted": accepted,
+            "state": state,
+            "next_report_interval_seconds": policy["interval_seconds"],
+            "min_distance_meters": policy["min_distance_meters"]
+        }
+
+    def should_store(self, handler_id: str, location: dict, policy: dict) -> bool:
+        """Drop pings that barely moved since the last stored one"""
+        now = time.monotonic()
+        last = self.last_stored.get(handler_id)
+        if last and now - last[2] < policy["keepalive_seconds"]:
+            moved = calculate_distance(
+                last[0], last[1], location["latitude"], location["longitude"]
+            ) * METERS_PER_MILE
+            if moved < policy["min_distance_meters"]:
+                return False
+        
+        self.last_stored[handler_id] = (location["latitude"], location["longitude"], now)
+        return True
+
+    async def get_active_booking(self, handler_id: str) -> Optional[dict]:
+        """Cached lookup of the booking a handler is currently working on"""
+        now = time.monotonic()
+        cached = self.active_bookings.get(handler_id)
+        if cached and cached[1] > now:
+            return cached[0]
+        
+        booking = await db.bookings.find_one(
+            {"handler_id": handler_id, "status": {"$in": TRACKED_BOOKING_STATUSES}},
+            {"customer_id": 1, "status": 1}
+        )
+        self.active_bookings[handler_id] = (booking, now + ACTIVE_BOOKING_CACHE_SECONDS)
+        return booking
+
+    def invalidate(self, handler_id: Optional[str]):
+        """Forget a handler's cached active booking after its bookings change"""
+        if handler_id:
+            self.active_bookings.pop(handler_id, None)
+
+    async def push_to_customer(self, handler_id: str, booking: dict, location: dict):
+        now = time.monotonic()
+        if now - self.last_push.get(handler_id, 0) < self.push_interval_seconds:
+            return
+        
+        self.last_push[handler_id] = now
+        await manager.send_personal_message(
+            {
+                "type": "location_update",
+                "handler_id": handler_id,
+                "booking_id": str(booking["_id"]),
+                "location": location
+            },
+            booking["customer_id"]
+        )
+
+    async def flush(self) -> int:
+        """Write all buffered locations with one bulk_write"""
+        if not self.pending:
+            return 0
+        
+        pending, self.pending = self.pending, {}
+        operations = [
+            UpdateOne(
+                # Skip pings older than what another worker already wrote
+                {
+                    "_id": ObjectId(handler_id),
+                    "$or": [
+                        {"location_updated_at": None},
+                        {"location_updated_at": {"$lt": ping["received_at"]}}
+                    ]
+                },
+                {"$set": {
+                    "location": ping["location"],
+                    "geo": geo_point(ping["location"]["latitude"], ping["location"]["longitude"]),
+                    "location_updated_at": ping["received_at"]
+                }}
+            )
+            for handler_id, ping in pending.items()
+        ]
+        try:
+            await db.users.bulk_write(operations, ordered=False)
+        except Exception:
+            # Requeue unless a newer ping arrived meanwhile
+            for handler_id, ping in pending.items():
+                self.pending.setdefault(handler_id, ping)
+            raise
+        return len(operations)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Location flush failed: {e}")
+
+location_ingestor = LocationIngestor(LOCATION_FLUSH_SECONDS, LOCATION_PUSH_INTERVAL_SECONDS)
+
 @api_router.patch("/handlers/{handler_id}/location")
 async def update_handler_location(handler_id: str, location: LocationUpdate):
     """Update handler's real-time location"""
-    await db.users.update_one(
-        {"_id": ObjectId(handler_id)},
-        {"$set": {"location": location.dict()}}
+    if not ObjectId.is_valid(handler_id):
+        raise HTTPException(status_code=400, detail="Invalid handler ID")
+    
+    reporting = await location_ingestor.ingest(handler_id, location.dict())
+    return {"message": "Location updated successfully", **reporting}
+
+# ==================== Auto-Assignment Algorithm ====================
+
+from math import radians, cos, sin, asin, sqrt
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points in miles using Haversine formula"""
+    # Convert to radians
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    
+    # Haversine formula
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    miles = 3959 * c  # Earth radius in miles
+    
+    return miles
+
+# ==================== Availability Index ====================
+
+# availability_intervals holds one document per calendar slot, recurring
+# (day_key "weekly:N") or dated (day_key "YYYY-MM-DD"). It is the source of
+# truth for handler calendars; the legacy calendar endpoints read and write it.
+
+# Booking statuses that occupy a handler's time slot
+SCHEDULED_BOOKING_STATUSES = ["confirmed", "accepted", "in_progress"]
+
+def time_to_minutes(value: Optional[str]) -> Optional[int]:
+    """Convert an HH:MM string to minutes since midnight"""
+    if not value:
+        return None
+    try:
+        hours, minutes = value.strip().split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except (ValueError, AttributeError):
+        return None
+
+def weekly_day_key(day_of_week: int) -> str:
+    """Day key for recurring slots (0-6, Monday-Sunday)"""
+    return f"weekly:{day_of_week}"
+
+def booking_day_keys(scheduled_date: str):
+    """Return the (dated, weekly) day keys that apply to a YYYY-MM-DD date"""
+    day = datetime.strptime(scheduled_date, "%Y-%m-%d")
+    return scheduled_date, weekly_day_key(day.weekday())
+
+def minutes_to_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def parse_time_slot(slot: str):
+    """Parse a "HH:MM-HH:MM" (or single "HH:MM" hour) time slot into minutes"""
+    if "-" in slot:
+        start, end = slot.split("-", 1)
+        return time_to_minutes(start), time_to_minutes(end)
+    start = time_to_minutes(slot)
+    return start, start + 60 if start is not None else None
+
+def weekly_slot_intervals(slots: List[dict]) -> List[dict]:
+    """Expand weekly availability slots into interval documents"""
+    intervals = []
+    for slot in slots:
+        start = time_to_minutes(slot.get("start_time"))
+        end = time_to_minutes(slot.get("end_time"))
+        if start is None or end is None or end <= start:
+            continue
+        intervals.append({
+            "day_key": weekly_day_key(slot["day_of_week"]),
+            "kind": "weekly",
+            "start": start,
+            "end": end,
+            "available": slot.get("is_available", True),
+        })
+    return intervals
+
+def dated_slot_windows(slot: dict) -> List[tuple]:
+    """(start, end) minute windows of a dated slot; empty if it lists only unparseable times"""
+    time_slots = slot.get("time_slots") or []
+    if not time_slots:
+        # No explicit time slots means the whole day
+        return [(0, 24 * 60)]
+    windows = [parse_time_slot(t) for t in time_slots]
+    return [(s, e) for s, e in windows if s is not None and e is not None and e > s]
+
+def invalid_dated_slots(slots: List[dict]) -> List[dict]:
+    """Dated slots whose time_slots list has no parseable window"""
+    return [slot for slot in slots if not dated_slot_windows(slot)]
+
+def dated_slot_intervals(slots: List[dict]) -> List[dict]:
+    """Expand dated availability slots into interval documents"""
+    intervals = []
+    for slot in slots:
+        for start, end in dated_slot_windows(slot):
+            intervals.append({
+                "day_key": slot["date"],
+                "kind": "dated",
+                "start": start,
+                "end": end,
+                "available": slot.get("available", True),
+            })
+    return intervals
+
+def availability_slot_id(handler_id: str, day_key: str, start: int, end: int) -> str:
+    return f"{handler_id}:{day_key}:{start}-{end}"
+
+def availability_slot_doc(handler_id: str, interval: dict, skills: List[str], now: datetime) -> dict:
+    """Build the stored slot document; categories falls back to the handler's skills"""
+    category = interval.get("category")
+    return {
+        "_id": availability_slot_id(handler_id, interval["day_key"], interval["start"], interval["end"]),
+        "handler_id": handler_id,
+        "kind": interval["kind"],
+        "day_key": interval["day_key"],
+        "start": interval["start"],
+        "end": interval["end"],
+        "available": interval["available"],
+        "category": category,
+        "categories": [category] if category else skills,
+        "updated_at": now,
+    }
+
+def slot_input_interval(slot: AvailabilitySlotKey) -> dict:
+    """Validate a slot from the bulk endpoint and convert it to an interval"""
+    if (slot.date is None) == (slot.day_of_week is None):
+        raise HTTPException(status_code=400, detail="Each slot needs exactly one of date or day_of_week")
+    if slot.date is not None:
+        try:
+            datetime.strptime(slot.date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid date {slot.date}")
+        kind, day_key = "dated", slot.date
+    else:
+        if not (0 <= slot.day_of_week <= 6):
+            raise HTTPException(status_code=400, detail="day_of_week must be between 0-6")
+        kind, day_key = "weekly", weekly_day_key(slot.day_of_week)
+    
+    start = time_to_minutes(slot.start_time)
+    end = time_to_minutes(slot.end_time)
+    if start is None or end is None or not (0 <= start < end <= 24 * 60):
+        raise HTTPException(status_code=400, detail=f"Invalid time window {slot.start_time}-{slot.end_time}")
+    
+    return {
+        "kind": kind,
+        "day_key": day_key,
+        "start": start,
+        "end": end,
+        "available": getattr(slot, "available", True),
+        "category": getattr(slot, "category", None),
+    }
+
+def format_availability_slot(doc: dict) -> dict:
+    slot = {
+        "start_time": minutes_to_time(doc["start"]),
+        "end_time": minutes_to_time(doc["end"]),
+        "available": doc["available"],
+        "category": doc.get("category"),
+    }
+    if doc["kind"] == "weekly":
+        slot["day_of_week"] = int(doc["day_key"].split(":")[1])
+    else:
+        slot["date"] = doc["day_key"]
+    return slot
+
+async def get_handler_skills(handler_id: str) -> Optional[List[str]]:
+    """Return a handler's skills, or None when the handler does not exist"""
+    if not ObjectId.is_valid(handler_id):
+        return None
+    handler = await db.users.find_one({"_id": ObjectId(handler_id)}, {"skills": 1})
+    return handler.get("skills", []) if handler else None
+
+async def refresh_availability_calendar_flag(handler_id: str):
+    # Handlers without any calendar are treated as unconstrained by matching
+    has_calendar = await db.availability_intervals.count_documents({"handler_id": handler_id}, limit=1) > 0
+    if ObjectId.is_valid(handler_id):
+        await db.users.update_one(
+            {"_id": ObjectId(handler_id)},
+            {"$set": {"has_availability_calendar": has_calendar}}
+        )
+
+async def replace_availability_slots(handler_id: str, kind: str, intervals: List[dict]):
+    """Replace all of a handler's weekly or dated slots"""
+    skills = await get_handler_skills(handler_id) or []
+    now = datetime.utcnow()
+    docs = {}
+    for interval in intervals:
+        doc = availability_slot_doc(handler_id, interval, skills, now)
+        docs[doc["_id"]] = doc
+    
+    await db.availability_intervals.delete_many(
+        {"handler_id": handler_id, "kind": kind, "_id": {"$nin": list(docs)}}
     )
+    if docs:
+        await db.availability_intervals.bulk_write(
+            [ReplaceOne({"_id": slot_id}, doc, upsert=True) for slot_id, doc in docs.items()],
+            ordered=False
+        )
+    await refresh_availability_calendar_flag(handler_id)
+
+async def load_availability_slots(handler_id: str, kind: str, day_range: Optional[dict] = None) -> List[dict]:
+    query = {"handler_id": handler_id, "kind": kind}
+    if day_range:
+        query["day_key"] = day_range
+    return await db.availability_intervals.find(query).sort([("day_key", 1), ("start", 1)]).to_list(None)
+
+def weekly_slots_payload(docs: List[dict]) -> List[dict]:
+    """Legacy weekly schedule format: day_of_week, start_time, end_time, is_available"""
+    slots = [
+        {
+            "day_of_week": int(doc["day_key"].split(":")[1]),
+            "start_time": minutes_to_time(doc["start"]),
+            "end_time": minutes_to_time(doc["end"]),
+            "is_available": doc["available"],
+        }
+        for doc in docs
+    ]
+    return sorted(slots, key=lambda slot: (slot["day_of_week"], slot["start_time"]))
+
+def dated_slots_payload(docs: List[dict]) -> List[dict]:
+    """Legacy calendar format: one entry per date with its time slots"""
+    by_date: Dict[str, List[dict]] = {}
+    for doc in docs:
+        by_date.setdefault(doc["day_key"], []).append(doc)
+    
+    days = []
+    for day_key, day_docs in by_date.items():
+        # A date is available when any of its slots is; list the slots that agree
+        available = any(doc["available"] for doc in day_docs)
+        time_slots = [
+            f"{minutes_to_time(doc['start'])}-{minutes_to_time(doc['end'])}"
+            for doc in day_docs
+            if doc["available"] == available and (doc["start"], doc["end"]) != (0, 24 * 60)
+        ]
+        days.append({"date": day_key, "available": available, "time_slots": time_slots})
+    return days
+
+def is_window_available(intervals: List[dict], date_key: str, weekly_key: str, start: int, end: int) -> Optional[bool]:
+    """Resolve one handler's intervals for a window; None when the day has no entries.
+    
+    Dated entries override the recurring weekly schedule for that date.
+    """
+    day_intervals = [i for i in intervals if i["day_key"] == date_key]
+    if not day_intervals:
+        day_intervals = [i for i in intervals if i["day_key"] == weekly_key]
+    if not day_intervals:
+        return None
+    
+    if any(not i["available"] and i["start"] < end and start < i["end"] for i in day_intervals):
+        return False
+    return any(i["available"] and i["start"] <= start and i["end"] >= end for i in day_intervals)
+
+async def find_available_handler_ids(
+    handlers: List[dict],
+    scheduled_date: str,
+    time_range_start: str,
+    time_range_end: str,
+    exclude_booking_id: Optional[ObjectId] = None
+) -> set:
+    """Return the ids of handlers free for a window, checking calendars and confirmed bookings"""
+    handler_ids = [str(h["_id"]) for h in handlers]
+    start = time_to_minutes(time_range_start)
+    end = time_to_minutes(time_range_end)
+    if not handler_ids or not scheduled_date or start is None or end is None:
+        return set(handler_ids)
+    
+    try:
+        date_key, weekly_key = booking_day_keys(scheduled_date)
+    except ValueError:
+        return set(handler_ids)
+    
+    # One query for every candidate's intervals on that day
+    intervals_by_handler: Dict[str, List[dict]] = {}
+    async for interval in db.availability_intervals.find(
+        {"handler_id": {"$in": handler_ids}, "day_key": {"$in": [date_key, weekly_key]}},
+        {"_id": 0, "handler_id": 1, "day_key": 1, "start": 1, "end": 1, "available": 1}
+    ):
+        intervals_by_handler.setdefault(interval["handler_id"], []).append(interval)
+    
+    free = set()
+    for handler in handlers:
+        handler_id = str(handler["_id"])
+        available = is_window_available(
+            intervals_by_handler.get(handler_id, []), date_key, weekly_key, start, end
+        )
+        if available is None:
+            available = not handler.get("has_availability_calendar", False)
+        if available:
+            free.add(handler_id)
+    
+    if not free:
+        return free
+    
+    # One query for already scheduled bookings overlapping the window
+    conflict_query = {
+        "handler_id": {"$in": list(free)},
+        "scheduled_date": scheduled_date,
+        "status": {"$in": SCHEDULED_BOOKING_STATUSES}
+    }
+    if exclude_booking_id:
+        conflict_query["_id"] = {"$ne": exclude_booking_id}
+    
+    async for booking in db.bookings.find(
+        conflict_query, {"handler_id": 1, "time_range_start": 1, "time_range_end": 1}
+    ):
+        booked_start = time_to_minutes(booking.get("time_range_start"))
+        booked_end = time_to_minutes(booking.get("time_range_end"))
+        if booked_start is None or booked_end is None or (booked_start < end and start < booked_end):
+            free.discard(booking["handler_id"])
+    
+    return free
+
+@api_router.get("/availability/handlers")
+async def get_available_handlers(
+    scheduled_date: str,
+    time_range_start: str,
+    time_range_end: str,
+    skill: Optional[str] = None
+):
+    """Get handlers free for a date and time window"""
+    start = time_to_minutes(time_range_start)
+    end = time_to_minutes(time_range_end)
+    try:
+        date_key, weekly_key = booking_day_keys(scheduled_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="scheduled_date must be YYYY-MM-DD")
+    if start is None or end is None or end <= start:
+        raise HTTPException(status_code=400, detail="Invalid time range")
+    
+    # Handlers with a slot covering the window, straight off the compound index
+    slot_query = {
+        "day_key": {"$in": [date_key, weekly_key]},
+        "start": {"$lte": start},
+        "end": {"$gte": end},
+        "available": True
+    }
+    if skill:
+        slot_query["categories"] = skill
+    slot_handler_ids = await db.availability_intervals.distinct("handler_id", slot_query)
     
-
-
-# ==================== Auto-Assignment Algorithm ====================
-
-from math import radians, cos, sin, asin, sqrt
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points in miles using Haversine formula"""
-    # Convert to radians
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    query = {
+        "user_type": "handler",
+        "status": "active",
+        "$or": [
+            {"_id": {"$in": [ObjectId(h) for h in slot_handler_ids if ObjectId.is_valid(h)]}},
+            {"has_availability_calendar": {"$ne": True}}
+        ]
+    }
+    if skill:
+        query["skills"] = skill
     
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    miles = 3959 * c  # Earth radius in miles
+    handlers = await db.users.find(
+        query, {"name": 1, "skills": 1, "rating": 1, "has_availability_calendar": 1}
+    ).to_list(1000)
+    free = await find_available_handler_ids(handlers, scheduled_date, time_range_start, time_range_end)
     
-    return miles
+    return {
+        "handlers": [
+            {
+                "id": str(h["_id"]),
+                "name": h.get("name"),
+                "skills": h.get("skills", []),
+                "rating": h.get("rating", 0),
+            }
+            for h in handlers if str(h["_id"]) in free
+        ],
+        "total": len(free)
+    }
 
-async def find_best_handler(booking_id: str):
-    """Find and assign the best handler for a booking"""
-    booking = await db.bookings.find_one({"_id": ObjectId(booking_id)})
-    if not booking:
-        return None
+async def insert_legacy_availability_slots(handler_id: str, kind: str, intervals: List[dict]):
+    """Add legacy slots for the days that have no slots written by the new endpoints"""
+    current_days = set(await db.availability_intervals.distinct("day_key", {"handler_id": handler_id, "kind": kind}))
+    intervals = [interval for interval in intervals if interval["day_key"] not in current_days]
+    if intervals:
+        skills = await get_handler_skills(handler_id) or []
+        now = datetime.utcnow()
+        # $setOnInsert keeps a slot an endpoint wrote after the check above
+        await db.availability_intervals.bulk_write(
+            [
+                UpdateOne({"_id": doc["_id"]}, {"$setOnInsert": doc}, upsert=True)
+                for doc in (availability_slot_doc(handler_id, interval, skills, now) for interval in intervals)
+            ],
+            ordered=False
+        )
+    await refresh_availability_calendar_flag(handler_id)
+
+async def migrate_legacy_availability():
+    """Move the embedded calendar arrays into availability slot documents.
     
-    # Get service details
-    service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-    if not service:
-        return None
+    Days that already have slots from the new endpoints are left untouched.
+    """
+    migrated = 0
+    async for availability in db.availability.find({"migrated_at": None}):
+        await insert_legacy_availability_slots(
+            availability["handler_id"], "weekly", weekly_slot_intervals(availability.get("slots", []))
+        )
+        await db.availability.update_one({"_id": availability["_id"]}, {"$set": {"migrated_at": datetime.utcnow()}})
+        migrated += 1
+    async for availability in db.handler_availability.find({"migrated_at": None}):
+        slots = availability.get("availability_slots", [])
+        invalid = invalid_dated_slots(slots)
+        if invalid:
+            logger.warning(
+                f"Skipping availability days with unparseable time slots for handler {availability['handler_id']}: "
+                f"{[(slot.get('date'), slot.get('time_slots')) for slot in invalid]}"
+            )
+        await insert_legacy_availability_slots(availability["handler_id"], "dated", dated_slot_intervals(slots))
+        await db.handler_availability.update_one({"_id": availability["_id"]}, {"$set": {"migrated_at": datetime.utcnow()}})
+        migrated += 1
+    return migrated
+
+# Statuses counted as a handler's current workload
+MATCHING_WORKLOAD_STATUSES = ["pending", "confirmed", "in_progress"]
+MATCH_SCORE_THRESHOLD = 20  # Minimum score to auto-assign
+
+async def load_matching_candidates():
+    """Load the active handlers considered for matching"""
+    return await db.users.find({"user_type": "handler", "status": "active"}).to_list(None)
+
+async def count_active_jobs(handler_ids: List[str]) -> Dict[str, int]:
+    """Count each handler's current jobs in a single aggregation"""
+    counts = {}
+    async for row in db.bookings.aggregate([
+        {"$match": {"handler_id": {"$in": handler_ids}, "status": {"$in": MATCHING_WORKLOAD_STATUSES}}},
+        {"$group": {"_id": "$handler_id", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+async def booking_service_category(booking: dict) -> Optional[str]:
+    """Get the category of a booking, falling back to its service document"""
+    if booking.get("service_category"):
+        return booking["service_category"]
+    
+    service_id = booking.get("service_id")
+    if service_id and ObjectId.is_valid(service_id):
+        service = await db.services.find_one({"_id": ObjectId(service_id)}, {"category": 1})
+        if service:
+            return service.get("category", "")
+    return None
+
+async def rank_handlers_for_booking(booking: dict, candidates: List[dict], active_jobs: Dict[str, int]):
+    """Score the candidates free for a booking, best match first"""
+    service_category = await booking_service_category(booking)
+    if service_category is None:
+        return []
     
-    booking_location = booking.get("location", {})
+    booking_location = booking.get("location") or {}
     booking_lat = booking_location.get("latitude", 0)
     booking_lon = booking_location.get("longitude", 0)
     
-    # Find all active handlers
+    # Only handlers free for the booking window are considered
+    free_handler_ids = await find_available_handler_ids(
+        candidates,
+        booking.get("scheduled_date"),
+        booking.get("time_range_start"),
+        booking.get("time_range_end"),
+        exclude_booking_id=booking["_id"]
+    )
+    
     handlers = []
-    async for handler in db.users.find({"user_type": "handler", "status": "active"}):
+    for handler in candidates:
         handler_id = str(handler["_id"])
+        if handler_id not in free_handler_ids:
+            continue
         
         # Check skills match
         handler_skills = handler.get("skills", [])
-        service_category = service.get("category", "")
         
         # Calculate distance
-        handler_location = handler.get("location", {})
+        handler_location = handler.get("location") or {}
         handler_lat = handler_location.get("latitude", 0)
         handler_lon = handler_location.get("longitude", 0)
         
@@ -721,18 +2552,11 @@ async def find_best_handler(booking_id: str):
         else:
             distance = 999  # Default large distance
         
-        # Check availability
-        availability = await db.availability.find_one({"handler_id": handler_id})
-        is_available = availability is not None if availability else True
-        
         # Get handler rating
         handler_rating = handler.get("rating", 0)
         
         # Get current workload
-        active_jobs = await db.bookings.count_documents({
-            "handler_id": handler_id,
-            "status": {"$in": ["pending", "confirmed", "in_progress"]}
-        })
+        handler_active_jobs = active_jobs.get(handler_id, 0)
         
         # Calculate score
         score = 0
@@ -752,12 +2576,8 @@ async def find_best_handler(booking_id: str):
         # Rating (20 points)
         score += (handler_rating / 5.0) * 20
         
-        # Availability (10 points)
-        if is_available:
-            score += 10
-        
         # Workload penalty
-        score -= (active_jobs * 5)
+        score -= (handler_active_jobs * 5)
         
         handlers.append({
             "handler_id": handler_id,
@@ -765,27 +2585,199 @@ async def find_best_handler(booking_id: str):
             "score": score,
             "distance": distance,
             "rating": handler_rating,
-            "active_jobs": active_jobs,
+            "active_jobs": handler_active_jobs,
             "skills_match": service_category in handler_skills
         })
     
     # Sort by score
     handlers.sort(key=lambda x: x["score"], reverse=True)
-    
-    # Assign to best handler
-    if handlers and handlers[0]["score"] > 20:  # Minimum score threshold
-        best_handler = handlers[0]
-        await db.bookings.update_one(
-            {"_id": ObjectId(booking_id)},
-            {"$set": {
-                "handler_id": best_handler["handler_id"],
+    return handlers
+
+async def assign_matched_handler(booking: dict, match: dict) -> bool:
+    """Assign a booking to its match if it is still pending and unassigned"""
+    result = await db.bookings.update_one(
+        {"_id": booking["_id"], "status": "pending", "handler_id": None},
+        {
+            "$set": {
+                "handler_id": match["handler_id"],
                 "status": "confirmed",
                 "assigned_at": datetime.utcnow()
-            }}
-        )
-        return best_handler
+            },
+            "$unset": {"next_match_at": ""}
+        }
+    )
+    if result.modified_count == 0:
+        # Another trigger assigned it first
+        return False
     
-    return None
+    await record_booking_change(booking, {**booking, "handler_id": match["handler_id"], "status": "confirmed"})
+    booking_id = str(booking["_id"])
+    await manager.send_personal_message(
+        {"type": "booking_update", "booking_id": booking_id, "status": "confirmed", "handler_id": match["handler_id"]},
+        booking["customer_id"]
+    )
+    await manager.send_personal_message(
+        {"type": "new_assignment", "booking_id": booking_id, "match_score": match["score"]},
+        match["handler_id"]
+    )
+    return True
+
+async def match_pending_bookings(
+    bookings: List[dict],
+    still_leader: Optional[Callable[[], Awaitable[bool]]] = None
+) -> List[dict]:
+    """Match a batch of bookings against a single snapshot of candidates.
+
+    still_leader, when given, is awaited before each assignment; the batch
+    stops as soon as it returns False.
+    """
+    if not bookings:
+        return []
+    
+    candidates = await load_matching_candidates()
+    candidate_ids = [str(h["_id"]) for h in candidates]
+    active_jobs = await count_active_jobs(candidate_ids)
+    
+    # Same-day work only goes to handlers who are online right now
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    online_candidates = None
+    if any(b.get("scheduled_date") == today for b in bookings):
+        online_ids = await presence_registry.online_ids(candidate_ids)
+        online_candidates = [h for h in candidates if str(h["_id"]) in online_ids]
+    
+    assignments = []
+    for booking in bookings:
+        booking_candidates = online_candidates if booking.get("scheduled_date") == today else candidates
+        handlers = await rank_handlers_for_booking(booking, booking_candidates, active_jobs)
+        if not handlers or handlers[0]["score"] <= MATCH_SCORE_THRESHOLD:
+            continue
+        if still_leader and not await still_leader():
+            break
+        
+        best_handler = handlers[0]
+        if await assign_matched_handler(booking, best_handler):
+            # Later bookings in the batch see the new workload
+            active_jobs[best_handler["handler_id"]] = best_handler["active_jobs"] + 1
+            assignments.append({"booking": booking, "match": best_handler})
+    
+    return assignments
+
+async def find_best_handler(booking_id: str):
+    """Find and assign the best handler for a pending, unassigned booking"""
+    booking = await db.bookings.find_one({"_id": ObjectId(booking_id)})
+    if not booking:
+        return None
+    
+    assignments = await match_pending_bookings([booking])
+    return assignments[0]["match"] if assignments else None
+
+# ==================== Matching Dispatcher ====================
+
+# Off by default: when on, paid pending bookings are assigned automatically
+# instead of waiting on the /bookings/pending job board
+MATCHING_DISPATCHER_ENABLED = os.environ.get("MATCHING_DISPATCHER_ENABLED", "false").lower() == "true"
+MATCHING_TICK_SECONDS = float(os.environ.get("MATCHING_TICK_SECONDS", "5"))
+MATCHING_BATCH_SIZE = int(os.environ.get("MATCHING_BATCH_SIZE", "50"))
+MATCHING_MAX_BACKOFF_SECONDS = 300
+
+class MatchingDispatcher:
+    """Background loop that assigns pending bookings in micro-batches.
+    
+    Every worker runs the loop, but a lease document in scheduler_leases lets
+    only one of them dispatch at a time. The lease is renewed between
+    assignments, so a slow tick stops writing once another worker takes over.
+    """
+    lease_name = "matching_dispatcher"
+
+    def __init__(self, tick_seconds: float, batch_size: int):
+        self.tick_seconds = tick_seconds
+        self.batch_size = batch_size
+        self.lease_seconds = tick_seconds * 3
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.renewed_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"Matching dispatcher started ({self.tick_seconds}s tick)")
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await db.scheduler_leases.delete_one({"_id": self.lease_name, "owner": self.worker_id})
+
+    async def acquire_lease(self) -> bool:
+        """Take or renew the dispatcher lease; False while another worker holds it"""
+        now = datetime.utcnow()
+        try:
+            await db.scheduler_leases.update_one(
+                {"_id": self.lease_name, "$or": [{"owner": self.worker_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.worker_id, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        self.renewed_at = time.monotonic()
+        return True
+
+    async def still_leader(self) -> bool:
+        """Renew the lease once a tick has passed since the last renewal"""
+        if time.monotonic() - self.renewed_at < self.tick_seconds:
+            return True
+        return await self.acquire_lease()
+
+    async def tick(self) -> List[dict]:
+        """Match one micro-batch of pending bookings"""
+        now = datetime.utcnow()
+        # Unpaid bookings stay on the job board
+        bookings = await db.bookings.find({
+            "status": "pending",
+            "handler_id": None,
+            "payment_status": "paid",
+            "$or": [{"next_match_at": None}, {"next_match_at": {"$lte": now}}]
+        }).sort("created_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        
+        assignments = await match_pending_bookings(bookings, self.still_leader)
+        if not await self.still_leader():
+            return assignments
+        
+        # Back off bookings nobody could take instead of rescoring them every tick
+        assigned_ids = {a["booking"]["_id"] for a in assignments}
+        unmatched_ids = [b["_id"] for b in bookings if b["_id"] not in assigned_ids]
+        if unmatched_ids:
+            await db.bookings.update_many(
+                {"_id": {"$in": unmatched_ids}},
+                [
+                    {"$set": {"match_attempts": {"$add": [{"$ifNull": ["$match_attempts", 0]}, 1]}}},
+                    {"$set": {"next_match_at": {"$add": [now, {"$min": [
+                        MATCHING_MAX_BACKOFF_SECONDS * 1000,
+                        {"$multiply": [self.tick_seconds * 1000, {"$pow": [2, {"$min": ["$match_attempts", 10]}]}]}
+                    ]}]}}}
+                ]
+            )
+        
+        return assignments
+
+    async def run(self):
+        while True:
+            try:
+                if await self.acquire_lease():
+                    assignments = await self.tick()
+                    if assignments:
+                        logger.info(f"Matching dispatcher assigned {len(assignments)} booking(s)")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Matching dispatcher error: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+matching_dispatcher = MatchingDispatcher(MATCHING_TICK_SECONDS, MATCHING_BATCH_SIZE)
 
 @api_router.post("/bookings/{booking_id}/auto-assign")
 async def auto_assign_handler(booking_id: str):
@@ -793,6 +2785,11 @@ async def auto_assign_handler(booking_id: str):
     if not ObjectId.is_valid(booking_id):
         raise HTTPException(status_code=400, detail="Invalid booking ID")
     
+    # Matching never reassigns a booking; say so instead of "no handler found"
+    booking = await db.bookings.find_one({"_id": ObjectId(booking_id)}, {"status": 1, "handler_id": 1})
+    if booking and (booking.get("status") != "pending" or booking.get("handler_id")):
+        raise HTTPException(status_code=409, detail="Booking is already assigned or no longer pending")
+    
     result = await find_best_handler(booking_id)
     
     if result:
@@ -812,41 +2809,25 @@ async def auto_assign_handler(booking_id: str):
 @api_router.post("/bookings/batch-auto-assign")
 async def batch_auto_assign():
     """Auto-assign all pending bookings"""
-    pending_bookings = []
-    async for booking in db.bookings.find({"status": "pending", "handler_id": {"$exists": False}}):
-        booking_id = str(booking["_id"])
-        result = await find_best_handler(booking_id)
-        if result:
-            pending_bookings.append({
-                "booking_id": booking_id,
-                "assigned_to": result["handler_name"],
-                "score": result["score"]
-            })
+    bookings = await db.bookings.find(
+        {"status": "pending", "handler_id": None}
+    ).sort("created_at", 1).to_list(None)
+    assignments = await match_pending_bookings(bookings)
+    
+    pending_bookings = [
+        {
+            "booking_id": str(a["booking"]["_id"]),
+            "assigned_to": a["match"]["handler_name"],
+            "score": a["match"]["score"]
+        }
+        for a in assignments
+    ]
     
     return {
         "message": f"Assigned {len(pending_bookings)} bookings",
         "assignments": pending_bookings
     }
 
-    # Find active booking for this handler
-    active_booking = await db.bookings.find_one({
-        "handler_id": handler_id,
-        "status": {"$in": ["accepted", "in_progress"]}
-    })
-    
-    # Send location update to customer if there's an active booking
-    if active_booking:
-        await manager.send_personal_message(
-            {
-                "type": "location_update",
-                "handler_id": handler_id,
-                "location": location.dict()
-            },
-            active_booking["customer_id"]
-        )
-    
-    return {"message": "Location updated successfully"}
-
 @api_router.patch("/handlers/{handler_id}/availability")
 async def update_availability(handler_id: str, available: bool = None):
     """Toggle handler availability"""
@@ -879,26 +2860,176 @@ async def create_review(review: ReviewCreate):
     
     review_dict = review.dict()
     review_dict["customer_name"] = customer["name"] if customer else "Anonymous"
+    review_dict["service_name"] = booking.get("service_name")
+    review_dict["service_category"] = booking_category(booking)
     review_dict["created_at"] = datetime.utcnow()
     
     result = await db.reviews.insert_one(review_dict)
-    
-    # Update handler rating
-    reviews = await db.reviews.find({"handler_id": review.handler_id}).to_list(1000)
-    avg_rating = sum(r["rating"] for r in reviews) / len(reviews)
-    await db.users.update_one(
-        {"_id": ObjectId(review.handler_id)},
-        {"$set": {"rating": round(avg_rating, 1)}}
-    )
+    await record_review_stats(review_dict)
     
     created_review = await db.reviews.find_one({"_id": result.inserted_id})
     return ReviewResponse(**serialize_doc(created_review))
 
-@api_router.get("/reviews/handler/{handler_id}", response_model=List[ReviewResponse])
-async def get_handler_reviews(handler_id: str):
-    """Get all reviews for a handler"""
-    reviews = await db.reviews.find({"handler_id": handler_id}).sort("created_at", -1).to_list(1000)
-    return [ReviewResponse(**serialize_doc(r)) for r in reviews]
+# ==================== Wallet Ledger ====================
+
+# A balance snapshot is written every WALLET_SNAPSHOT_INTERVAL entries so
+# reconciliation only replays the entries after the latest snapshot
+WALLET_SNAPSHOT_INTERVAL = 100
+WALLET_PAGE_SIZE = 50
+
+class InsufficientBalance(Exception):
+    pass
+
+async def post_wallet_entry(
+    handler_id: str,
+    amount: float,
+    entry_type: str,
+    description: str,
+    booking_id: Optional[str] = None,
+    reference: Optional[str] = None
+) -> Optional[dict]:
+    """Apply a credit (amount > 0) or debit (amount < 0) and append it to the ledger.
+
+    The balance and sequence number move in one atomic $inc, so concurrent
+    entries can neither lose money nor share a sequence number. Debits fail
+    with InsufficientBalance instead of overdrawing. Returns None when the
+    handler does not exist.
+    """
+    query = {"_id": ObjectId(handler_id)}
+    if amount < 0:
+        query["wallet_balance"] = {"$gte": -amount}
+    
+    account = await db.users.find_one_and_update(
+        query,
+        {"$inc": {"wallet_balance": amount, "wallet_seq": 1}},
+        projection={"wallet_balance": 1, "wallet_seq": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not account:
+        if amount < 0 and await db.users.count_documents({"_id": ObjectId(handler_id)}, limit=1):
+            raise InsufficientBalance()
+        return None
+    
+    now = datetime.utcnow()
+    entry = {
+        "handler_id": handler_id,
+        "seq": account["wallet_seq"],
+        "amount": amount,
+        "type": entry_type,
+        "description": description,
+        "booking_id": booking_id,
+        "reference": reference,
+        "balance_after": account["wallet_balance"],
+        "created_at": now
+    }
+    await db.wallet_transactions.insert_one(entry)
+    
+    if entry["seq"] % WALLET_SNAPSHOT_INTERVAL == 0:
+        await db.wallet_snapshots.insert_one({
+            "handler_id": handler_id,
+            "seq": entry["seq"],
+            "balance": entry["balance_after"],
+            "created_at": now
+        })
+    return entry
+
+async def reconcile_wallet(handler_id: str, balance: float, seq: int) -> Optional[dict]:
+    """Replay ledger entries after the latest snapshot; returns a discrepancy or None"""
+    snapshot = await db.wallet_snapshots.find_one({"handler_id": handler_id}, sort=[("seq", -1)])
+    snapshot = snapshot or {"seq": 0, "balance": 0}
+    
+    totals = await db.wallet_transactions.aggregate([
+        {"$match": {"handler_id": handler_id, "seq": {"$gt": snapshot["seq"], "$lte": seq}}},
+        {"$group": {"_id": None, "amount": {"$sum": "$amount"}, "entries": {"$sum": 1}}}
+    ]).to_list(1)
+    replayed = snapshot["balance"] + (totals[0]["amount"] if totals else 0)
+    entries = totals[0]["entries"] if totals else 0
+    
+    if abs(replayed - balance) < 0.005 and entries == seq - snapshot["seq"]:
+        return None
+    return {
+        "handler_id": handler_id,
+        "balance": balance,
+        "replayed_balance": round(replayed, 2),
+        "missing_entries": seq - snapshot["seq"] - entries,
+        "snapshot_seq": snapshot["seq"]
+    }
+
+async def reconcile_wallets():
+    """Check every wallet against its ledger and record discrepancies"""
+    checked = 0
+    discrepancies = 0
+    async for user in db.users.find({"wallet_seq": {"$gt": 0}}, {"wallet_balance": 1, "wallet_seq": 1}):
+        checked += 1
+        discrepancy = await reconcile_wallet(str(user["_id"]), user.get("wallet_balance", 0), user["wallet_seq"])
+        if discrepancy:
+            discrepancies += 1
+            logger.warning(f"Wallet discrepancy: {discrepancy}")
+            await db.wallet_discrepancies.insert_one({**discrepancy, "detected_at": datetime.utcnow()})
+    return {"checked": checked, "discrepancies": discrepancies}
+
+async def fold_legacy_payouts() -> int:
+    """Post payouts made before the ledger existed as unnumbered debit entries.
+
+    Those payouts never reduced wallet_balance, so each one is debited here
+    exactly once, keyed on the payout id. Payouts made through the ledger
+    carry ledger_seq and are skipped.
+    """
+    folded = 0
+    async for payout in db.payouts.find({"ledger_seq": {"$exists": False}}):
+        handler_id = payout.get("handler_id")
+        amount = payout.get("amount") or 0
+        if not handler_id or not ObjectId.is_valid(handler_id) or amount <= 0:
+            continue
+        result = await db.wallet_transactions.update_one(
+            {"handler_id": handler_id, "type": "payout", "reference": f"payout:{payout['_id']}"},
+            {"$setOnInsert": {
+                "amount": -amount,
+                "description": payout.get("description") or "Payout to bank account",
+                "booking_id": payout.get("booking_id"),
+                "created_at": payout.get("created_at") or datetime.utcnow()
+            }},
+            upsert=True
+        )
+        if result.upserted_id:
+            await db.users.update_one({"_id": ObjectId(handler_id)}, {"$inc": {"wallet_balance": -amount}})
+            folded += 1
+    return folded
+
+async def migrate_wallet_ledger():
+    """Number legacy wallet transactions and seed each wallet's sequence and snapshot.
+
+    Legacy payouts are folded in first so the opening balance excludes money
+    already paid out. Run once before the ledger takes traffic; entries
+    posted meanwhile would compete for the same sequence numbers.
+    """
+    await fold_legacy_payouts()
+    migrated = 0
+    for handler_id in await db.wallet_transactions.distinct("handler_id", {"seq": {"$exists": False}}):
+        if not ObjectId.is_valid(handler_id):
+            continue
+        last = await db.wallet_transactions.find_one(
+            {"handler_id": handler_id, "seq": {"$exists": True}}, sort=[("seq", -1)]
+        )
+        seq = last["seq"] if last else 0
+        balance = last["balance_after"] if last else 0
+        operations = []
+        legacy = db.wallet_transactions.find({"handler_id": handler_id, "seq": {"$exists": False}})
+        async for entry in legacy.sort("created_at", 1):
+            seq += 1
+            balance += entry.get("amount", 0)
+            operations.append(UpdateOne({"_id": entry["_id"]}, {"$set": {"seq": seq, "balance_after": balance}}))
+        if operations:
+            await db.wallet_transactions.bulk_write(operations)
+        
+        await db.users.update_one({"_id": ObjectId(handler_id)}, {"$max": {"wallet_seq": seq}})
+        await db.wallet_snapshots.update_one(
+            {"handler_id": handler_id, "seq": seq},
+            {"$setOnInsert": {"balance": balance, "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        migrated += 1
+    return migrated
 
 # ==================== Handler Operations Routes ====================
 
@@ -932,6 +3063,8 @@ async def handler_check_in(check_in: CheckInRequest):
         {"_id": ObjectId(check_in.booking_id)},
         {"$set": update_data}
     )
+    await record_booking_change(booking, {**booking, **update_data})
+    location_ingestor.invalidate(check_in.handler_id)
     
     return {"message": "Check-in successful", "check_in_time": update_data["check_in_time"]}
 
@@ -968,8 +3101,10 @@ async def handler_check_out(check_out: CheckOutRequest):
     if check_out.completion_notes:
         update_data["completion_notes"] = check_out.completion_notes
     
-    await db.bookings.update_one(
-        {"_id": ObjectId(check_out.booking_id)},
+    # Only the check-out that completes the booking pays the handler, so a
+    # repeated or concurrent check-out cannot credit the wallet twice
+    result = await db.bookings.update_one(
+        {"_id": ObjectId(check_out.booking_id), "status": {"$ne": "completed"}},
         {"$set": update_data}
     )
     
@@ -977,53 +3112,81 @@ async def handler_check_out(check_out: CheckOutRequest):
     service_price = booking.get("service_price", 0)
     handler_id = check_out.handler_id
     
-    # Get or create handler wallet
-    handler = await db.users.find_one({"_id": ObjectId(handler_id)})
-    if handler:
-        current_wallet_balance = handler.get("wallet_balance", 0)
-        new_balance = current_wallet_balance + service_price
-        
-        await db.users.update_one(
-            {"_id": ObjectId(handler_id)},
-            {"$set": {"wallet_balance": new_balance}}
+    entry = None
+    if result.modified_count == 1:
+        await record_booking_change(booking, {**booking, **update_data})
+        location_ingestor.invalidate(handler_id)
+        entry = await post_wallet_entry(
+            handler_id, service_price, "credit",
+            f"Payment for booking {check_out.booking_id}", booking_id=check_out.booking_id
         )
-        
-        # Create wallet transaction record
-        await db.wallet_transactions.insert_one({
-            "handler_id": handler_id,
-            "booking_id": check_out.booking_id,
-            "amount": service_price,
-            "type": "credit",
-            "description": f"Payment for booking {check_out.booking_id}",
-            "balance_after": new_balance,
-            "created_at": datetime.utcnow()
-        })
     
     return {
         "message": "Check-out successful",
         "check_out_time": update_data["check_out_time"],
-        "payment_added": service_price,
-        "new_wallet_balance": new_balance if handler else 0
+        "payment_added": service_price if entry else 0,
+        "new_wallet_balance": entry["balance_after"] if entry else 0
     }
 
 @api_router.get("/handler/{handler_id}/wallet")
-async def get_handler_wallet(handler_id: str):
-    """Get handler's wallet balance and transaction history"""
-    handler = await db.users.find_one({"_id": ObjectId(handler_id)})
+async def get_handler_wallet(handler_id: str, limit: int = WALLET_PAGE_SIZE, cursor: Optional[str] = None):
+    """Get handler's wallet balance and a page of ledger entries, newest first"""
+    if not ObjectId.is_valid(handler_id):
+        raise HTTPException(status_code=400, detail="Invalid handler ID")
+    
+    limit = max(1, min(limit, 200))
+    query = {"handler_id": handler_id, "seq": {"$exists": True}}
+    if cursor:
+        query["seq"] = {"$lt": decode_cursor(cursor).get("seq", 0)}
+    
+    handler, transactions = await asyncio.gather(
+        db.users.find_one({"_id": ObjectId(handler_id)}, {"wallet_balance": 1}),
+        db.wallet_transactions.find(query).sort("seq", -1).limit(limit).to_list(limit)
+    )
     if not handler:
         raise HTTPException(status_code=404, detail="Handler not found")
     
     wallet_balance = handler.get("wallet_balance", 0)
-    
-    # Get transaction history
-    transactions = await db.wallet_transactions.find(
-        {"handler_id": handler_id}
-    ).sort("created_at", -1).to_list(100)
+    next_cursor = encode_cursor({"seq": transactions[-1]["seq"]}) if len(transactions) == limit else None
     
     return {
         "handler_id": handler_id,
         "wallet_balance": wallet_balance,
-        "transactions": [serialize_doc(t) for t in transactions]
+        "balance": wallet_balance,
+        "transactions": [serialize_doc(t) for t in transactions],
+        "next_cursor": next_cursor
+    }
+
+@api_router.get("/handler/{handler_id}/wallet/statement")
+async def get_wallet_statement(handler_id: str, start_date: str, end_date: str):
+    """Opening balance, entries and closing balance for a date range"""
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    
+    # Each entry carries balance_after, so the opening balance is one lookup
+    opening_entry, entries = await asyncio.gather(
+        db.wallet_transactions.find_one(
+            {"handler_id": handler_id, "seq": {"$exists": True}, "created_at": {"$lt": start}},
+            sort=[("seq", -1)]
+        ),
+        db.wallet_transactions.find(
+            {"handler_id": handler_id, "seq": {"$exists": True}, "created_at": {"$gte": start, "$lt": end}}
+        ).sort("seq", 1).to_list(None)
+    )
+    opening_balance = opening_entry["balance_after"] if opening_entry else 0
+    
+    return {
+        "handler_id": handler_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "opening_balance": opening_balance,
+        "credits": sum(e["amount"] for e in entries if e["amount"] > 0),
+        "debits": -sum(e["amount"] for e in entries if e["amount"] < 0),
+        "closing_balance": entries[-1]["balance_after"] if entries else opening_balance,
+        "transactions": [serialize_doc(e) for e in entries]
     }
 
 @api_router.post("/handler/bank-account")
@@ -1143,19 +3306,14 @@ async def update_handler_availability(request: HandlerAvailabilityUpdate):
                 status_code=400, 
                 detail=f"Date {slot.date} is outside the allowed range (today to 30 days ahead)"
             )
+        if not dated_slot_windows(slot.dict()):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Time slots for {slot.date} must be \"HH:MM-HH:MM\" or \"HH:MM\": {slot.time_slots}"
+            )
     
-    # Store availability
-    availability_data = {
-        "handler_id": request.handler_id,
-        "availability_slots": [slot.dict() for slot in request.availability_slots],
-        "updated_at": datetime.utcnow()
-    }
-    
-    # Upsert availability
-    await db.handler_availability.update_one(
-        {"handler_id": request.handler_id},
-        {"$set": availability_data},
-        upsert=True
+    await replace_availability_slots(
+        request.handler_id, "dated", dated_slot_intervals([slot.dict() for slot in request.availability_slots])
     )
     
     return {
@@ -1166,15 +3324,15 @@ async def update_handler_availability(request: HandlerAvailabilityUpdate):
 @api_router.get("/handler/{handler_id}/availability")
 async def get_handler_availability(handler_id: str):
     """Get handler's availability calendar"""
-    availability = await db.handler_availability.find_one({"handler_id": handler_id})
+    docs = await load_availability_slots(handler_id, "dated")
     
-    if not availability:
+    if not docs:
         return {"handler_id": handler_id, "availability_slots": []}
     
     return {
         "handler_id": handler_id,
-        "availability_slots": availability.get("availability_slots", []),
-        "updated_at": availability.get("updated_at")
+        "availability_slots": dated_slots_payload(docs),
+        "updated_at": max(doc["updated_at"] for doc in docs)
     }
 
 # ==================== Payment Routes ====================
@@ -1347,15 +3505,22 @@ async def get_recommendations(customer_id: str):
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for real-time updates"""
     await manager.connect(websocket, user_id)
+    presence_registry.connect(user_id)
     try:
         while True:
             data = await websocket.receive_text()
             message = json.loads(data)
+            presence_registry.touch(user_id)
             logger.info(f"Received WebSocket message: {message}")
             # Echo back for now
             await websocket.send_json({"type": "ack", "data": message})
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Bad payloads and send errors end the socket too; never leave the
+        # user marked online
         manager.disconnect(user_id, websocket)
+        presence_registry.disconnect(user_id, still_connected=bool(manager.active_connections.get(user_id)))
 
 # ==================== Seed Data ====================
 
@@ -1429,6 +3594,105 @@ async def seed_services():
     return {"message": f"Successfully seeded {len(services)} services"}
 
 
+# ==================== Admin List Protocol ====================
+
+# Every admin table pages the same way: ?sort= picks one of the endpoint's
+# allow-listed sorts (each ending in _id and backed by an index), ?cursor=
+# continues after the last row, ?fields= trims each row to the named fields.
+# The first page also reports total_estimate; later pages skip the count.
+ADMIN_LIST_MAX_LIMIT = 200
+ADMIN_LIST_COUNT_LIMIT = 10000  # Filtered totals stop counting here
+
+def cursor_value(value):
+    """JSON-safe form of a sort key value, restored by restore_cursor_value"""
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+def restore_cursor_value(value):
+    if not isinstance(value, dict):
+        return value
+    try:
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    except (TypeError, ValueError, InvalidId):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_after(sort_keys: List[tuple], values: list) -> dict:
+    """Filter for documents that sort after values; nulls sort last descending and first ascending"""
+    clauses = []
+    equal = {}
+    for (field, direction), value in zip(sort_keys, values):
+        if direction < 0:
+            after = {"$or": [{field: {"$lt": value}}, {field: None}]} if value is not None else None
+        else:
+            after = {field: {"$gt": value}} if value is not None else {field: {"$ne": None}}
+        if after is not None:
+            clauses.append({**equal, **after})
+        equal[field] = value
+    return {"$or": clauses} if clauses else {"_id": {"$exists": False}}
+
+def admin_list_sort(sorts: Dict[str, List[tuple]], sort: str) -> List[tuple]:
+    if sort not in sorts:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Must be one of: {list(sorts)}")
+    return sorts[sort]
+
+def admin_list_limit(limit: int) -> int:
+    return max(1, min(limit, ADMIN_LIST_MAX_LIMIT))
+
+def admin_list_filter(query: dict, sort: str, sort_keys: List[tuple], cursor: Optional[str]) -> dict:
+    """query narrowed to the rows after cursor"""
+    if not cursor:
+        return query
+    last = decode_cursor(cursor)
+    values = last.get("values")
+    if last.get("sort") != sort or not isinstance(values, list) or len(values) != len(sort_keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    after = keyset_after(sort_keys, [restore_cursor_value(value) for value in values])
+    return {"$and": [query, after]} if query else after
+
+def admin_list_cursor(docs: List[dict], sort: str, sort_keys: List[tuple], limit: int) -> tuple:
+    """(page, next_cursor) from up to limit + 1 fetched rows.
+
+    Pages fetch one row more than they return, so a cursor is only handed out
+    when another row exists and the last page is never an empty one.
+    """
+    if len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    return page, encode_cursor({"sort": sort, "values": [cursor_value(page[-1].get(field)) for field, _ in sort_keys]})
+
+async def admin_list_total(collection, query: dict, cursor: Optional[str]) -> Optional[int]:
+    """Total for the first page: collection metadata when unfiltered, a capped count otherwise"""
+    if cursor:
+        return None
+    if not query:
+        return await collection.estimated_document_count()
+    return await collection.count_documents(query, limit=ADMIN_LIST_COUNT_LIMIT)
+
+async def admin_list_page(collection, query: dict, sorts: Dict[str, List[tuple]], sort: str, limit: int, cursor: Optional[str]):
+    """(docs, next_cursor, total_estimate) for one page of a find-backed admin table"""
+    sort_keys = admin_list_sort(sorts, sort)
+    limit = admin_list_limit(limit)
+    docs, total = await asyncio.gather(
+        collection.find(admin_list_filter(query, sort, sort_keys, cursor)).sort(sort_keys).limit(limit + 1).to_list(limit + 1),
+        admin_list_total(collection, query, cursor)
+    )
+    page, next_cursor = admin_list_cursor(docs, sort, sort_keys, limit)
+    return page, next_cursor, total
+
+def select_fields(rows: List[dict], fields: Optional[str]) -> List[dict]:
+    """Trim rows to a comma-separated field list (id is always kept)"""
+    if not fields:
+        return rows
+    wanted = {"id"} | {field.strip() for field in fields.split(",") if field.strip()}
+    return [{key: value for key, value in row.items() if key in wanted} for row in rows]
+
 # ==================== Admin APIs ====================
 
 class BannerModel(BaseModel):
@@ -1564,183 +3828,279 @@ async def get_category_icons():
         icons.append(icon)
     return {"icons": icons}
 
+ADMIN_CACHE_FRESH_SECONDS = float(os.environ.get("ADMIN_CACHE_FRESH_SECONDS", "30"))
+ADMIN_CACHE_MAX_STALE_SECONDS = float(os.environ.get("ADMIN_CACHE_MAX_STALE_SECONDS", "600"))
+
+class AggregateCache:
+    """Stale-while-revalidate cache shared by the admin aggregate endpoints.
+
+    A fresh result is served as-is. A stale one is still served, while a
+    single background task recomputes it; past max_stale_seconds callers
+    wait for the recomputation instead. Callers missing the same key share
+    one in-flight computation, so each key has at most one query running no
+    matter how many dashboards are polling.
+    """
+
+    def __init__(self, fresh_seconds: float, max_stale_seconds: float):
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.entries: Dict[Any, tuple] = {}
+        self.inflight: Dict[Any, asyncio.Task] = {}
+
+    async def compute(self, key, compute_fn) -> dict:
+        try:
+            value = {**await compute_fn(), "generated_at": datetime.utcnow()}
+            now = time.monotonic()
+            self.entries = {
+                k: entry for k, entry in self.entries.items()
+                if now - entry[1] < self.max_stale_seconds
+            }
+            self.entries[key] = (value, now)
+            return value
+        finally:
+            self.inflight.pop(key, None)
+
+    def refresh(self, key, compute_fn) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.compute(key, compute_fn))
+            task.add_done_callback(self.log_failure)
+            self.inflight[key] = task
+        return task
+
+    @staticmethod
+    def log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Admin aggregate refresh failed: {task.exception()}")
+
+    async def get(self, key, compute_fn) -> dict:
+        entry = self.entries.get(key)
+        if entry:
+            value, computed_at = entry
+            age = time.monotonic() - computed_at
+            if age < self.fresh_seconds:
+                return value
+            if age < self.max_stale_seconds:
+                self.refresh(key, compute_fn)
+                return value
+        # Shielded so a client disconnect does not cancel the shared computation
+        return await asyncio.shield(self.refresh(key, compute_fn))
+
+admin_cache = AggregateCache(ADMIN_CACHE_FRESH_SECONDS, ADMIN_CACHE_MAX_STALE_SECONDS)
+
+def rollup_sum(field: str, since_day: Optional[str] = None) -> dict:
+    """$sum of a rollup counter, optionally only over days from since_day on"""
+    value = {"$ifNull": [f"${field}", 0]}
+    if since_day is None:
+        return {"$sum": value}
+    return {"$sum": {"$cond": [{"$gte": ["$day", since_day]}, value, 0]}}
+
+async def aggregate_one(collection, pipeline: List[dict]) -> dict:
+    """Run a pipeline that yields at most one document, defaulting to an empty dict"""
+    result = await collection.aggregate(pipeline).to_list(1)
+    return result[0] if result else {}
+
 @api_router.get("/admin/stats")
-async def get_admin_stats():
-    """Get comprehensive platform statistics"""
-    from datetime import timedelta
-    
-    now = datetime.utcnow()
-    today_start = datetime(now.year, now.month, now.day)
-    week_start = now - timedelta(days=7)
-    month_start = now - timedelta(days=30)
-    year_start = datetime(now.year, 1, 1)
-    
-    # Users Statistics
-    total_users = await db.users.count_documents({})
-    total_customers = await db.users.count_documents({"user_type": "customer"})
-    total_handlers = await db.users.count_documents({"user_type": "handler"})
-    new_users_7days = await db.users.count_documents({"created_at": {"$gte": week_start}})
-    new_users_30days = await db.users.count_documents({"created_at": {"$gte": month_start}})
-    
-    # Handlers Statistics
-    new_handlers_7days = await db.users.count_documents({
-        "user_type": "handler", 
-        "created_at": {"$gte": week_start}
-    })
-    new_handlers_30days = await db.users.count_documents({
-        "user_type": "handler",
-        "created_at": {"$gte": month_start}
-    })
-    
-    # Partners Statistics
-    total_partners = await db.partners.count_documents({})
-    new_partners_7days = await db.partners.count_documents({"created_at": {"$gte": week_start}})
-    new_partners_30days = await db.partners.count_documents({"created_at": {"$gte": month_start}})
-    approved_partners = await db.partners.count_documents({"status": "approved"})
-    pending_partners = await db.partners.count_documents({"status": "pending"})
-    
-    # Bookings Statistics
-    total_bookings = await db.bookings.count_documents({})
-    bookings_yearly = await db.bookings.count_documents({"created_at": {"$gte": year_start}})
-    bookings_monthly = await db.bookings.count_documents({"created_at": {"$gte": month_start}})
-    bookings_weekly = await db.bookings.count_documents({"created_at": {"$gte": week_start}})
-    bookings_today = await db.bookings.count_documents({"created_at": {"$gte": today_start}})
-    
-    pending_bookings = await db.bookings.count_documents({"status": "pending"})
-    active_bookings = await db.bookings.count_documents({"status": "active"})
-    completed_bookings = await db.bookings.count_documents({"status": "completed"})
-    
-    # Revenue Statistics (from completed bookings)
-    revenue_pipeline = [
-        {"$match": {"status": "completed"}},
-        {"$lookup": {
-            "from": "services",
-            "localField": "service_id",
-            "foreignField": "_id",
-            "as": "service"
-        }},
-        {"$unwind": "$service"},
-        {"$group": {
-            "_id": None,
-            "total": {"$sum": "$service.fixed_price"}
-        }}
-    ]
-    
-    revenue_result = await db.bookings.aggregate(revenue_pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
-    
-    # Daily earnings (today)
-    daily_revenue_pipeline = [
-        {"$match": {"status": "completed", "created_at": {"$gte": today_start}}},
-        {"$lookup": {
-            "from": "services",
-            "localField": "service_id",
-            "foreignField": "_id",
-            "as": "service"
-        }},
-        {"$unwind": "$service"},
-        {"$group": {
+async def get_admin_stats(exact: bool = False):
+    """Get comprehensive platform statistics.
+
+    Headline totals are approximate by default (collection metadata, maintained
+    counters and activity sketches); pass exact=true to count the collections.
+    """
+    return await admin_cache.get(("stats", exact), lambda: compute_admin_stats(exact))
+
+# Booking statuses broken out in the admin stats
+ADMIN_STATS_STATUSES = ["pending", "active", "completed"]
+
+def window_sum(value, since: Optional[datetime] = None) -> dict:
+    """$sum of value over documents created at or after since"""
+    if since is None:
+        return {"$sum": value}
+    return {"$sum": {"$cond": [{"$gte": ["$created_at", since]}, value, 0]}}
+
+async def count_admin_counters(today: str, week_start: str, month_start: str, year_start: str) -> dict:
+    """The counters compute_admin_stats reads from the rollups, counted from the source collections"""
+    today, week_start, month_start, year_start = (
+        datetime.strptime(day, "%Y-%m-%d") for day in (today, week_start, month_start, year_start)
+    )
+    is_handler = {"$cond": [{"$eq": ["$user_type", "handler"]}, 1, 0]}
+    completed_revenue = {"$cond": [{"$eq": ["$status", "completed"]}, BOOKING_REVENUE_EXPR, 0]}
+    users, partners, bookings, payouts = await asyncio.gather(
+        aggregate_one(db.users, [
+            {"$match": {"created_at": {"$gte": month_start}}},
+            {"$group": {
+                "_id": None,
+                "users_7days": window_sum(1, week_start),
+                "users_30days": window_sum(1),
+                "handlers_7days": window_sum(is_handler, week_start),
+                "handlers_30days": window_sum(is_handler),
+            }}
+        ]),
+        aggregate_one(db.partners, [
+            {"$match": {"created_at": {"$gte": month_start}}},
+            {"$group": {"_id": None, "partners_7days": window_sum(1, week_start), "partners_30days": window_sum(1)}}
+        ]),
+        aggregate_one(db.bookings, [{"$group": {
             "_id": None,
-            "total": {"$sum": "$service.fixed_price"}
-        }}
-    ]
-    
-    daily_revenue_result = await db.bookings.aggregate(daily_revenue_pipeline).to_list(1)
-    daily_earnings = daily_revenue_result[0]["total"] if daily_revenue_result else 0
-    
-    # Weekly earnings
-    weekly_revenue_pipeline = [
-        {"$match": {"status": "completed", "created_at": {"$gte": week_start}}},
-        {"$lookup": {
-            "from": "services",
-            "localField": "service_id",
-            "foreignField": "_id",
-            "as": "service"
-        }},
-        {"$unwind": "$service"},
+            "bookings_yearly": window_sum(1, year_start),
+            "bookings_monthly": window_sum(1, month_start),
+            "bookings_weekly": window_sum(1, week_start),
+            "bookings_today": window_sum(1, today),
+            "revenue": window_sum(completed_revenue),
+            "revenue_daily": window_sum(completed_revenue, today),
+            "revenue_weekly": window_sum(completed_revenue, week_start),
+            **{
+                f"status_{status}": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$status", "pending"]}, status]}, 1, 0]}}
+                for status in ADMIN_STATS_STATUSES
+            },
+        }}]),
+        aggregate_one(db.payouts, [
+            {"$match": {"created_at": {"$gte": min(year_start, month_start)}}},
+            {"$group": {
+                "_id": None,
+                "payouts_yearly": window_sum(1, year_start),
+                "payouts_monthly": window_sum(1, month_start),
+                "payouts_today": window_sum(1, today),
+                "payout_amount_yearly": window_sum({"$ifNull": ["$amount", 0]}, year_start),
+                "payout_amount_monthly": window_sum({"$ifNull": ["$amount", 0]}, month_start),
+                "payout_amount_today": window_sum({"$ifNull": ["$amount", 0]}, today),
+            }}
+        ]),
+    )
+    return {**users, **partners, **bookings, **payouts}
+
+async def compute_admin_stats(exact: bool = False) -> dict:
+    """Admin stats from the rollups and estimates, or counted from the collections when exact"""
+    now = datetime.utcnow()
+    today = rollup_day(now)
+    week_start = rollup_day(now - timedelta(days=7))
+    month_start = rollup_day(now - timedelta(days=30))
+    year_start = f"{now.year}-01-01"
+    
+    # Event metrics come from the platform-wide daily rollups, so the cost
+    # grows with the number of days rather than the number of documents
+    rollups_pipeline = [
+        {"$match": {"dimension": "all"}},
         {"$group": {
             "_id": None,
-            "total": {"$sum": "$service.fixed_price"}
+            "users_7days": rollup_sum("signups.user", week_start),
+            "users_30days": rollup_sum("signups.user", month_start),
+            "handlers_7days": rollup_sum("signups.handler", week_start),
+            "handlers_30days": rollup_sum("signups.handler", month_start),
+            "partners_7days": rollup_sum("signups.partner", week_start),
+            "partners_30days": rollup_sum("signups.partner", month_start),
+            "bookings_yearly": rollup_sum("bookings", year_start),
+            "bookings_monthly": rollup_sum("bookings", month_start),
+            "bookings_weekly": rollup_sum("bookings", week_start),
+            "bookings_today": rollup_sum("bookings", today),
+            "revenue": rollup_sum("revenue"),
+            "revenue_daily": rollup_sum("revenue", today),
+            "revenue_weekly": rollup_sum("revenue", week_start),
+            # Each booking counts under its current status on the day it was created
+            **{f"status_{status}": rollup_sum(f"status.{status}") for status in ADMIN_STATS_STATUSES},
+            "payouts_yearly": rollup_sum("payouts", year_start),
+            "payouts_monthly": rollup_sum("payouts", month_start),
+            "payouts_today": rollup_sum("payouts", today),
+            "payout_amount_yearly": rollup_sum("payout_amount", year_start),
+            "payout_amount_monthly": rollup_sum("payout_amount", month_start),
+            "payout_amount_today": rollup_sum("payout_amount", today),
         }}
     ]
     
-    weekly_revenue_result = await db.bookings.aggregate(weekly_revenue_pipeline).to_list(1)
-    weekly_earnings = weekly_revenue_result[0]["total"] if weekly_revenue_result else 0
-    
-    # Payout Statistics
-    total_payouts_yearly = await db.payouts.count_documents({"created_at": {"$gte": year_start}})
-    total_payouts_monthly = await db.payouts.count_documents({"created_at": {"$gte": month_start}})
-    total_payouts_today = await db.payouts.count_documents({"created_at": {"$gte": today_start}})
-    
-    # Calculate total payout amounts
-    payout_yearly_pipeline = [
-        {"$match": {"created_at": {"$gte": year_start}}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]
-    payout_yearly_result = await db.payouts.aggregate(payout_yearly_pipeline).to_list(1)
-    payout_amount_yearly = payout_yearly_result[0]["total"] if payout_yearly_result else 0
-    
-    payout_monthly_pipeline = [
-        {"$match": {"created_at": {"$gte": month_start}}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]
-    payout_monthly_result = await db.payouts.aggregate(payout_monthly_pipeline).to_list(1)
-    payout_amount_monthly = payout_monthly_result[0]["total"] if payout_monthly_result else 0
-    
-    payout_today_pipeline = [
-        {"$match": {"created_at": {"$gte": today_start}}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]
-    payout_today_result = await db.payouts.aggregate(payout_today_pipeline).to_list(1)
-    payout_amount_today = payout_today_result[0]["total"] if payout_today_result else 0
+    # Approval state is not an event, so partner status counts read the (small) partners collection
+    partners_pipeline = [{"$group": {
+        "_id": None,
+        "total": {"$sum": 1},
+        "approved": {"$sum": {"$cond": [{"$eq": ["$status", "approved"]}, 1, 0]}},
+        "pending": {"$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}},
+    }}]
+    
+    def total(collection):
+        return collection.count_documents({}) if exact else collection.estimated_document_count()
+    
+    counters = (
+        count_admin_counters(today, week_start, month_start, year_start)
+        if exact or not await rollups_ready()
+        else aggregate_one(db.daily_rollups, rollups_pipeline)
+    )
+    if exact:
+        active = [
+            count_active_exact("customer_id", now - timedelta(days=7)),
+            count_active_exact("customer_id", now - timedelta(days=30)),
+            count_active_exact("handler_id", now - timedelta(days=7)),
+            count_active_exact("handler_id", now - timedelta(days=30)),
+        ]
+    else:
+        active = [
+            estimate_active("customers", week_start),
+            estimate_active("customers", month_start),
+            estimate_active("handlers", week_start),
+            estimate_active("handlers", month_start),
+        ]
     
-    total_services = await db.services.count_documents({})
+    # Per-type user totals are index-only counts, exact in either mode
+    (counters, partners, total_users, total_customers, total_handlers, total_bookings, total_services,
+     customers_7days, customers_30days, handlers_7days, handlers_30days) = await asyncio.gather(
+        counters,
+        aggregate_one(db.partners, partners_pipeline),
+        total(db.users),
+        db.users.count_documents({"user_type": "customer"}),
+        db.users.count_documents({"user_type": "handler"}),
+        total(db.bookings),
+        total(db.services),
+        *active
+    )
     
     return {
         "users": {
             "total": total_users,
             "total_customers": total_customers,
-            "new_7days": new_users_7days,
-            "new_30days": new_users_30days
+            "new_7days": counters.get("users_7days", 0),
+            "new_30days": counters.get("users_30days", 0)
         },
         "handlers": {
             "total": total_handlers,
-            "new_7days": new_handlers_7days,
-            "new_30days": new_handlers_30days
+            "new_7days": counters.get("handlers_7days", 0),
+            "new_30days": counters.get("handlers_30days", 0)
         },
         "partners": {
-            "total": total_partners,
-            "approved": approved_partners,
-            "pending": pending_partners,
-            "new_7days": new_partners_7days,
-            "new_30days": new_partners_30days
+            "total": partners.get("total", 0),
+            "approved": partners.get("approved", 0),
+            "pending": partners.get("pending", 0),
+            "new_7days": counters.get("partners_7days", 0),
+            "new_30days": counters.get("partners_30days", 0)
         },
         "bookings": {
             "total": total_bookings,
-            "yearly": bookings_yearly,
-            "monthly": bookings_monthly,
-            "weekly": bookings_weekly,
-            "today": bookings_today,
-            "pending": pending_bookings,
-            "active": active_bookings,
-            "completed": completed_bookings
+            "yearly": counters.get("bookings_yearly", 0),
+            "monthly": counters.get("bookings_monthly", 0),
+            "weekly": counters.get("bookings_weekly", 0),
+            "today": counters.get("bookings_today", 0),
+            **{status: counters.get(f"status_{status}", 0) for status in ADMIN_STATS_STATUSES}
+        },
+        "active": {
+            "customers_7days": customers_7days,
+            "customers_30days": customers_30days,
+            "handlers_7days": handlers_7days,
+            "handlers_30days": handlers_30days
         },
         "revenue": {
-            "total": total_revenue,
-            "daily": daily_earnings,
-            "weekly": weekly_earnings
+            "total": counters.get("revenue", 0),
+            "daily": counters.get("revenue_daily", 0),
+            "weekly": counters.get("revenue_weekly", 0)
         },
         "payouts": {
-            "count_yearly": total_payouts_yearly,
-            "count_monthly": total_payouts_monthly,
-            "count_today": total_payouts_today,
-            "amount_yearly": payout_amount_yearly,
-            "amount_monthly": payout_amount_monthly,
-            "amount_today": payout_amount_today
+            "count_yearly": counters.get("payouts_yearly", 0),
+            "count_monthly": counters.get("payouts_monthly", 0),
+            "count_today": counters.get("payouts_today", 0),
+            "amount_yearly": counters.get("payout_amount_yearly", 0),
+            "amount_monthly": counters.get("payout_amount_monthly", 0),
+            "amount_today": counters.get("payout_amount_today", 0)
         },
         "services": {
             "total": total_services
-        }
+        },
+        "exact": exact
     }
 
 # ==================== Admin Service Management ====================
@@ -1885,19 +4245,10 @@ async def get_handler_profile(handler_id: str):
     if not handler:
         raise HTTPException(status_code=404, detail="Handler not found")
     
-    # Get statistics
-    total_bookings = await db.bookings.count_documents({"handler_id": handler_id})
-    completed_bookings = await db.bookings.count_documents({
-        "handler_id": handler_id,
-        "status": "completed"
-    })
-    
-    # Calculate average rating
-    reviews = await db.reviews.find({"handler_id": handler_id}).to_list(None)
-    avg_rating = sum(r.get("rating", 0) for r in reviews) / len(reviews) if reviews else 0
+    stats = await get_handler_stats(handler_id)
     
     # Get availability
-    availability = await db.availability.find_one({"handler_id": handler_id})
+    weekly_slots = await load_availability_slots(handler_id, "weekly")
     
     profile = {
         "id": str(handler["_id"]),
@@ -1910,11 +4261,11 @@ async def get_handler_profile(handler_id: str):
         "certifications": handler.get("certifications", []),
         "service_area": handler.get("service_area", []),
         "profile_image_url": handler.get("profile_image_url"),
-        "rating": round(avg_rating, 2),
-        "review_count": len(reviews),
-        "total_jobs": total_bookings,
-        "completed_jobs": completed_bookings,
-        "availability": availability.get("slots", []) if availability else [],
+        "rating": stats["rating"],
+        "review_count": stats["review_count"],
+        "total_jobs": stats["total_jobs"],
+        "completed_jobs": stats["completed_jobs"],
+        "availability": weekly_slots_payload(weekly_slots),
         "joined_date": handler.get("created_at"),
     }
     
@@ -1939,6 +4290,13 @@ async def update_handler_profile(handler_id: str, update: HandlerProfileUpdate):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Handler not found")
     
+    if "skills" in update_data:
+        # Slots without an explicit category follow the handler's skills
+        await db.availability_intervals.update_many(
+            {"handler_id": handler_id, "category": None},
+            {"$set": {"categories": update_data["skills"]}}
+        )
+    
     return {"message": "Profile updated successfully"}
 
 # Job Management
@@ -1954,15 +4312,15 @@ async def get_handler_jobs(
     if status:
         query["status"] = status
     
-    jobs = []
-    async for booking in db.bookings.find(query).sort("scheduled_time", -1).limit(limit):
-        # Get service details
-        service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-        
-        # Get customer details
-        customer = await db.users.find_one({"_id": ObjectId(booking["customer_id"])})
-        
-        job = {
+    page = await db.bookings.find(query).sort("scheduled_time", -1).limit(limit).to_list(limit)
+    loaders = RequestLoaders()
+    
+    async def job_row(booking: dict) -> dict:
+        service, customer = await asyncio.gather(
+            loaders.services.load(booking.get("service_id")),
+            loaders.users.load(booking.get("customer_id"))
+        )
+        return {
             "id": str(booking["_id"]),
             "service_id": booking["service_id"],
             "service_name": service.get("name") if service else "Unknown",
@@ -1975,8 +4333,8 @@ async def get_handler_jobs(
             "notes": booking.get("notes", ""),
             "created_at": booking.get("created_at"),
         }
-        jobs.append(job)
     
+    jobs = await asyncio.gather(*(job_row(booking) for booking in page))
     return {"jobs": jobs, "total": len(jobs)}
 
 @api_router.put("/handlers/{handler_id}/jobs/{job_id}/status")
@@ -1990,89 +4348,250 @@ async def update_job_status(handler_id: str, job_id: str, status: str):
     if not ObjectId.is_valid(job_id):
         raise HTTPException(status_code=400, detail="Invalid job ID")
     
-    result = await db.bookings.update_one(
+    now = datetime.utcnow()
+    before = await db.bookings.find_one_and_update(
         {"_id": ObjectId(job_id), "handler_id": handler_id},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        booking_status_update(status, now),
+        projection=BOOKING_CHANGE_PROJECTION,
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    await record_booking_change(before, booking_with_status(before, status, now))
+    location_ingestor.invalidate(handler_id)
     return {"message": "Job status updated successfully", "new_status": status}
 
 # Earnings Tracking
+
+# Bucket key formats, shared by strftime and $dateToString
+EARNINGS_BUCKET_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+def earnings_bucket_id(handler_id: str, period: str, bucket: str) -> str:
+    return f"{handler_id}:{period}:{bucket}"
+
+def booking_completed_at(booking: dict) -> datetime:
+    """When a completed booking's earnings are booked"""
+    return booking.get("check_out_time") or booking.get("actual_end") or booking.get("created_at") or datetime.utcnow()
+
+# booking_completed_at as an aggregation expression
+BOOKING_COMPLETED_AT_EXPR = {"$ifNull": ["$check_out_time", {"$ifNull": ["$actual_end", {"$ifNull": ["$created_at", "$$NOW"]}]}]}
+
+def booking_status_update(status: str, now: datetime) -> List[dict]:
+    """Pipeline update setting a booking's status; completing stamps actual_end once"""
+    fields = {"status": status, "updated_at": now}
+    if status == "completed":
+        fields["actual_end"] = {"$ifNull": ["$actual_end", now]}
+    return [{"$set": fields}]
+
+def booking_with_status(before: dict, status: str, now: datetime) -> dict:
+    """The booking as booking_status_update leaves it"""
+    after = {**before, "status": status}
+    if status == "completed":
+        after["actual_end"] = before.get("actual_end") or now
+    return after
+
+def booking_earnings_contribution(booking: Optional[dict]) -> Dict[str, dict]:
+    """Earnings buckets a completed booking counts towards, by bucket id"""
+    if not booking or booking.get("status") != "completed" or not booking_handler_id(booking):
+        return {}
+    handler_id = booking_handler_id(booking)
+    completed_at = booking_completed_at(booking)
+    buckets = {}
+    for period, fmt in EARNINGS_BUCKET_FORMATS.items():
+        bucket = completed_at.strftime(fmt)
+        buckets[earnings_bucket_id(handler_id, period, bucket)] = {
+            "handler_id": handler_id, "period": period, "bucket": bucket, "amount": booking_revenue(booking)
+        }
+    return buckets
+
+async def record_booking_earnings(before: Optional[dict], after: Optional[dict]):
+    """Move a booking's earnings in or out of the buckets as it enters or leaves completed"""
+    deltas: Dict[str, dict] = {}
+    for booking, sign in ((before, -1), (after, 1)):
+        for bucket_id, bucket in booking_earnings_contribution(booking).items():
+            delta = deltas.setdefault(bucket_id, {**bucket, "amount": 0, "jobs": 0})
+            delta["amount"] += sign * bucket["amount"]
+            delta["jobs"] += sign
+    
+    now = datetime.utcnow()
+    updates = [
+        UpdateOne(
+            {"_id": bucket_id},
+            {
+                "$inc": {"amount": delta["amount"], "jobs": delta["jobs"], "version": 1},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"handler_id": delta["handler_id"], "period": delta["period"], "bucket": delta["bucket"]}
+            },
+            upsert=True
+        )
+        for bucket_id, delta in deltas.items() if delta["amount"] or delta["jobs"]
+    ]
+    if updates:
+        await db.earnings_buckets.bulk_write(updates, ordered=False)
+
+async def rebuild_earnings_buckets():
+    """Rebuild earnings buckets from completed bookings"""
+    async def compute(handler_ids: Optional[List[str]]) -> Dict[str, dict]:
+        match = {"status": "completed", **booking_handler_match({"$ne": None} if handler_ids is None else {"$in": handler_ids})}
+        now = datetime.utcnow()
+        buckets = {}
+        for period, fmt in EARNINGS_BUCKET_FORMATS.items():
+            async for row in db.bookings.aggregate([
+                {"$match": match},
+                {"$group": {
+                    "_id": {
+                        "handler_id": BOOKING_HANDLER_EXPR,
+                        "bucket": {"$dateToString": {"format": fmt, "date": BOOKING_COMPLETED_AT_EXPR}}
+                    },
+                    "amount": {"$sum": BOOKING_REVENUE_EXPR},
+                    "jobs": {"$sum": 1}
+                }}
+            ], allowDiskUse=True):
+                handler_id, bucket = row["_id"]["handler_id"], row["_id"]["bucket"]
+                buckets[earnings_bucket_id(handler_id, period, bucket)] = {
+                    "handler_id": handler_id, "period": period, "bucket": bucket,
+                    "amount": row["amount"], "jobs": row["jobs"], "updated_at": now
+                }
+        return buckets
+    
+    return await versioned_rebuild(
+        db.earnings_buckets,
+        compute,
+        scope_query=lambda handler_ids: {} if handler_ids is None else {"handler_id": {"$in": handler_ids}},
+        scope_of=lambda bucket_ids: list({bucket_id.rsplit(":", 2)[0] for bucket_id in bucket_ids})
+    )
+
 @api_router.get("/handlers/{handler_id}/earnings")
 async def get_handler_earnings(
     handler_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None
 ):
-    """Get earnings summary for a handler"""
-    query = {
-        "handler_id": handler_id,
-        "status": "completed"
-    }
-    
-    # Add date filters if provided
+    """Get earnings summary for a handler from the earnings buckets"""
+    # Whole history sums the monthly buckets; a date range needs daily ones
+    totals_match = {"handler_id": handler_id, "period": "month"}
+    day_match = {"handler_id": handler_id, "period": "day"}
     if start_date or end_date:
-        query["scheduled_time"] = {}
+        day_range = {}
         if start_date:
-            query["scheduled_time"]["$gte"] = start_date
+            day_range["$gte"] = start_date[:10]
         if end_date:
-            query["scheduled_time"]["$lte"] = end_date
-    
-    # Get all completed bookings
-    completed_bookings = []
-    async for booking in db.bookings.find(query):
-        service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-        completed_bookings.append({
-            "booking_id": str(booking["_id"]),
-            "service_name": service.get("name") if service else "Unknown",
-            "amount": service.get("fixed_price", 0) if service else 0,
-            "completed_date": booking.get("scheduled_time"),
-        })
+            day_range["$lte"] = end_date[:10]
+        day_match["bucket"] = day_range
+        totals_match = day_match
+    
+    current_month = datetime.utcnow().strftime(EARNINGS_BUCKET_FORMATS["month"])
+    totals, month_bucket, daily, monthly = await asyncio.gather(
+        db.earnings_buckets.aggregate([
+            {"$match": totals_match},
+            {"$group": {"_id": None, "amount": {"$sum": "$amount"}, "jobs": {"$sum": "$jobs"}}}
+        ]).to_list(1),
+        db.earnings_buckets.find_one({"_id": earnings_bucket_id(handler_id, "month", current_month)}),
+        db.earnings_buckets.find(day_match).sort("bucket", -1).limit(30).to_list(30),
+        db.earnings_buckets.find({"handler_id": handler_id, "period": "month"}).sort("bucket", -1).limit(12).to_list(12),
+    )
     
-    # Calculate totals
-    total_earnings = sum(b["amount"] for b in completed_bookings)
-    total_jobs = len(completed_bookings)
+    total_earnings = totals[0]["amount"] if totals else 0
+    total_jobs = totals[0]["jobs"] if totals else 0
     average_per_job = total_earnings / total_jobs if total_jobs > 0 else 0
     
-    # Get this month's earnings
-    now = datetime.utcnow()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_earnings_cursor = db.bookings.find({
-        "handler_id": handler_id,
-        "status": "completed",
-        "scheduled_time": {"$gte": month_start.isoformat()}
-    })
-    
-    month_earnings = 0
-    async for booking in month_earnings_cursor:
-        service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-        if service:
-            month_earnings += service.get("fixed_price", 0)
-    
     return {
         "total_earnings": total_earnings,
         "total_jobs": total_jobs,
         "average_per_job": round(average_per_job, 2),
-        "month_earnings": month_earnings,
-        "earnings_history": completed_bookings[-20:],  # Last 20 transactions
+        "month_earnings": month_bucket["amount"] if month_bucket else 0,
+        "earnings_history": [
+            {"date": b["bucket"], "amount": b["amount"], "jobs": b["jobs"]} for b in daily
+        ],
+        "monthly_history": [
+            {"month": b["bucket"], "amount": b["amount"], "jobs": b["jobs"]} for b in monthly
+        ],
+    }
+
+# Handler Dashboard
+DASHBOARD_ACTIVE_STATUSES = ["confirmed", "accepted", "in_progress"]
+DASHBOARD_BOOKING_FIELDS = {
+    "service_name": 1, "service_category": 1, "status": 1, "scheduled_date": 1,
+    "time_range_start": 1, "time_range_end": 1, "location": 1, "service_price": 1
+}
+
+def with_string_id(doc: dict) -> dict:
+    item = {k: v for k, v in doc.items() if k != "_id"}
+    item["id"] = str(doc["_id"])
+    return item
+
+@api_router.get("/handlers/{handler_id}/dashboard")
+async def get_handler_dashboard(handler_id: str):
+    """Everything the professional dashboard shows, fetched concurrently"""
+    if not ObjectId.is_valid(handler_id):
+        raise HTTPException(status_code=400, detail="Invalid handler ID")
+    
+    now = datetime.utcnow()
+    bucket_ids = [
+        earnings_bucket_id(handler_id, "day", now.strftime(EARNINGS_BUCKET_FORMATS["day"])),
+        earnings_bucket_id(handler_id, "month", now.strftime(EARNINGS_BUCKET_FORMATS["month"])),
+    ]
+    handler, stats, buckets, active_jobs, pending, reviews, weekly_slots = await asyncio.gather(
+        db.users.find_one(
+            {"_id": ObjectId(handler_id), "user_type": "handler"},
+            {"name": 1, "available": 1, "wallet_balance": 1, "profile_image_url": 1}
+        ),
+        get_handler_stats(handler_id),
+        db.earnings_buckets.find({"_id": {"$in": bucket_ids}}, {"period": 1, "amount": 1, "jobs": 1}).to_list(2),
+        db.bookings.find(
+            {"handler_id": handler_id, "status": {"$in": DASHBOARD_ACTIVE_STATUSES}}, DASHBOARD_BOOKING_FIELDS
+        ).sort("scheduled_date", 1).limit(10).to_list(10),
+        db.bookings.find(
+            {"status": "pending", "handler_id": None}, DASHBOARD_BOOKING_FIELDS
+        ).sort("created_at", -1).limit(10).to_list(10),
+        db.reviews.find(
+            {"handler_id": handler_id}, {"rating": 1, "comment": 1, "customer_name": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(3).to_list(3),
+        load_availability_slots(handler_id, "weekly"),
+    )
+    
+    if not handler:
+        raise HTTPException(status_code=404, detail="Handler not found")
+    
+    earnings = {b["period"]: b for b in buckets}
+    return {
+        "handler": {
+            "id": handler_id,
+            "name": handler.get("name"),
+            "available": handler.get("available", True),
+            "profile_image_url": handler.get("profile_image_url"),
+        },
+        "stats": stats,
+        "wallet_balance": handler.get("wallet_balance", 0),
+        "earnings": {
+            "today": earnings.get("day", {}).get("amount", 0),
+            "today_jobs": earnings.get("day", {}).get("jobs", 0),
+            "month": earnings.get("month", {}).get("amount", 0),
+            "month_jobs": earnings.get("month", {}).get("jobs", 0),
+        },
+        "active_jobs": [with_string_id(b) for b in active_jobs],
+        "pending_bookings": [with_string_id(b) for b in pending],
+        "recent_reviews": [with_string_id(r) for r in reviews],
+        "availability": weekly_slots_payload(weekly_slots),
     }
 
 # Availability Management
 @api_router.get("/handlers/{handler_id}/availability")
 async def get_handler_availability(handler_id: str):
     """Get handler's availability schedule"""
-    availability = await db.availability.find_one({"handler_id": handler_id})
+    docs = await load_availability_slots(handler_id, "weekly")
     
-    if not availability:
+    if not docs:
         # Return default empty availability
         return {"handler_id": handler_id, "slots": []}
     
-    availability["id"] = str(availability["_id"])
-    del availability["_id"]
-    return availability
+    return {
+        "handler_id": handler_id,
+        "slots": weekly_slots_payload(docs),
+        "updated_at": max(doc["updated_at"] for doc in docs)
+    }
 
 @api_router.post("/handlers/{handler_id}/availability")
 async def set_handler_availability(handler_id: str, slots: List[AvailabilitySlot]):
@@ -2083,19 +4602,62 @@ async def set_handler_availability(handler_id: str, slots: List[AvailabilitySlot
             raise HTTPException(status_code=400, detail="day_of_week must be between 0-6")
     
     slots_dict = [slot.dict() for slot in slots]
+    await replace_availability_slots(handler_id, "weekly", weekly_slot_intervals(slots_dict))
     
-    # Upsert availability
-    result = await db.availability.update_one(
-        {"handler_id": handler_id},
-        {"$set": {
-            "handler_id": handler_id,
-            "slots": slots_dict,
-            "updated_at": datetime.utcnow()
-        }},
-        upsert=True
+    return {"message": "Availability updated successfully", "slots_count": len(slots)}
+
+@api_router.get("/handlers/{handler_id}/availability/slots")
+async def get_handler_availability_slots(
+    handler_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """Get a handler's recurring slots and dated slots within a date range"""
+    day_range = {}
+    if start_date:
+        day_range["$gte"] = start_date
+    if end_date:
+        day_range["$lte"] = end_date
+    
+    weekly, dated = await asyncio.gather(
+        load_availability_slots(handler_id, "weekly"),
+        load_availability_slots(handler_id, "dated", day_range or None)
     )
+    return {
+        "handler_id": handler_id,
+        "weekly": [format_availability_slot(doc) for doc in weekly],
+        "dated": [format_availability_slot(doc) for doc in dated]
+    }
+
+@api_router.patch("/handlers/{handler_id}/availability/slots")
+async def bulk_update_availability_slots(handler_id: str, update: AvailabilitySlotBulkUpdate):
+    """Upsert and delete individual availability slots in one bulk write"""
+    skills = await get_handler_skills(handler_id)
+    if skills is None:
+        raise HTTPException(status_code=404, detail="Handler not found")
     
-    return {"message": "Availability updated successfully", "slots_count": len(slots)}
+    now = datetime.utcnow()
+    operations = []
+    for slot in update.delete:
+        interval = slot_input_interval(slot)
+        operations.append(DeleteOne({
+            "_id": availability_slot_id(handler_id, interval["day_key"], interval["start"], interval["end"])
+        }))
+    for slot in update.upsert:
+        doc = availability_slot_doc(handler_id, slot_input_interval(slot), skills, now)
+        operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+    
+    if not operations:
+        raise HTTPException(status_code=400, detail="No slots provided")
+    
+    result = await db.availability_intervals.bulk_write(operations)
+    await refresh_availability_calendar_flag(handler_id)
+    
+    return {
+        "message": "Availability slots updated",
+        "upserted": len(update.upsert),
+        "deleted": result.deleted_count
+    }
 
 # Review System
 @api_router.post("/reviews")
@@ -2124,45 +4686,76 @@ async def create_review(review: ReviewModel):
     if not (1 <= review.rating <= 5):
         raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
     
+    # Snapshot display names so listing reviews needs no joins
+    customer = await db.users.find_one({"_id": ObjectId(review.customer_id)}, {"name": 1}) \
+        if ObjectId.is_valid(review.customer_id) else None
+    
     review_dict = review.dict()
+    review_dict["customer_name"] = customer["name"] if customer else "Anonymous"
+    review_dict["service_name"] = booking.get("service_name")
+    review_dict["service_category"] = booking_category(booking)
     review_dict["created_at"] = datetime.utcnow()
     
     result = await db.reviews.insert_one(review_dict)
-    
-    # Update handler's overall rating
-    await update_handler_rating(review.handler_id)
+    await record_review_stats(review_dict)
     
     return {"message": "Review created successfully", "review_id": str(result.inserted_id)}
 
+@api_router.get("/reviews/summary")
+async def get_review_summary(handler_id: Optional[str] = None, category: Optional[str] = None):
+    """Get the rating histogram, sub-score averages and recent average for a handler or a service category"""
+    if bool(handler_id) == bool(category):
+        raise HTTPException(status_code=400, detail="Provide either handler_id or category")
+    
+    if handler_id:
+        stats = await db.handler_stats.find_one({"_id": handler_id})
+    else:
+        stats = await db.category_review_stats.find_one({"_id": category})
+    
+    return {"handler_id": handler_id, "category": category, **summarize_reviews(stats)}
+
+HANDLER_REVIEW_SORT = [("created_at", -1), ("_id", -1)]
+
 @api_router.get("/reviews/handler/{handler_id}")
-async def get_handler_reviews(handler_id: str, limit: int = 50):
-    """Get all reviews for a handler"""
-    reviews = []
-    async for review in db.reviews.find({"handler_id": handler_id}).sort("created_at", -1).limit(limit):
-        # Get customer info
-        customer = await db.users.find_one({"_id": ObjectId(review["customer_id"])})
+async def get_handler_reviews(handler_id: str, limit: int = 50, cursor: Optional[str] = None):
+    """Get a page of a handler's reviews, newest first"""
+    limit = max(1, min(limit, 100))
+    # Same keyset cursors as the admin tables: malformed ones are a 400 and
+    # reviews without created_at page after the dated ones
+    query = admin_list_filter({"handler_id": handler_id}, "recent", HANDLER_REVIEW_SORT, cursor)
+    docs = await db.reviews.find(query).sort(HANDLER_REVIEW_SORT).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = admin_list_cursor(docs, "recent", HANDLER_REVIEW_SORT, limit)
+    loaders = RequestLoaders()
+    
+    async def review_row(review: dict) -> dict:
+        # Reviews written before names were snapshotted look them up instead
+        customer_name = review.get("customer_name")
+        if not customer_name:
+            customer = await loaders.users.load(review.get("customer_id"))
+            customer_name = customer.get("name") if customer else None
+        service_name = review.get("service_name")
+        if not service_name:
+            booking = await loaders.bookings.load(review.get("booking_id"))
+            service_name = booking.get("service_name") if booking else None
+            if booking and not service_name:
+                service = await loaders.services.load(booking.get("service_id"))
+                service_name = service.get("name") if service else None
         
-        # Get booking/service info
-        booking = await db.bookings.find_one({"_id": ObjectId(review["booking_id"])})
-        service_name = "Unknown"
-        if booking:
-            service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-            if service:
-                service_name = service.get("name")
-        
-        reviews.append({
+        return {
             "id": str(review["_id"]),
             "rating": review["rating"],
             "comment": review.get("comment", ""),
             "service_quality": review.get("service_quality", 5),
             "handlerism": review.get("handlerism", 5),
             "timeliness": review.get("timeliness", 5),
-            "customer_name": customer.get("name") if customer else "Anonymous",
-            "service_name": service_name,
+            "customer_name": customer_name or "Anonymous",
+            "service_name": service_name or "Unknown",
             "created_at": review.get("created_at"),
-        })
+        }
     
-    return {"reviews": reviews, "total": len(reviews)}
+    reviews = await asyncio.gather(*(review_row(review) for review in page))
+    
+    return {"reviews": reviews, "total": len(reviews), "next_cursor": next_cursor}
 
 @api_router.get("/reviews/booking/{booking_id}")
 async def get_booking_review(booking_id: str):
@@ -2315,6 +4908,9 @@ async def admin_assign_booking(booking_id: str, assignment: ManualBookingAssignm
             "assigned_at": datetime.utcnow()
         }}
     )
+    await record_booking_change(booking, {**booking, "handler_id": assignment.handler_id, "status": "accepted"})
+    location_ingestor.invalidate(booking.get("handler_id"))
+    location_ingestor.invalidate(assignment.handler_id)
     
     return {
         "message": "Booking assigned successfully",
@@ -2423,6 +5019,7 @@ async def delete_user_account(user_id: str, password: str):
         {"$set": {
             "name": "Deleted User",
             "email": f"deleted_{user_id}@deleted.com",
+            "search_keys": user_search_keys("Deleted User", f"deleted_{user_id}@deleted.com"),
             "password": "",
             "phone": "",
             "status": "deleted",
@@ -2444,13 +5041,24 @@ async def delete_user_account(user_id: str, password: str):
     return {"message": "Account deleted successfully"}
 
 # User Management
+ADMIN_USER_SORTS = {
+    "recent": [("_id", -1)],
+    "activity": [("last_activity_at", -1), ("_id", -1)],
+}
+
 @api_router.get("/admin/users")
 async def admin_get_users(
     user_type: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 100
+    q: Optional[str] = None,
+    sort: str = "recent",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    """Get all users with optional filters"""
+    """Get a page of users with optional filters, name/email prefix search and sort"""
+    sort_keys = admin_list_sort(ADMIN_USER_SORTS, sort)
+    limit = admin_list_limit(limit)
     query = {}
     
     if user_type:
@@ -2459,15 +5067,43 @@ async def admin_get_users(
     if status:
         query["status"] = status
     
+    if q and q.strip():
+        # Anchored, case-sensitive regex on lower-cased keys stays an index range scan.
+        # Users without search_keys (not yet backfilled) match on name and email;
+        # that branch reads them through the index's missing-key entries.
+        prefix = re.escape(q.strip().lower())
+        query["$or"] = [
+            {"search_keys": {"$regex": f"^{prefix}"}},
+            {"search_keys": {"$exists": False}, "$or": [
+                {"name": {"$regex": f"^\\s*{prefix}", "$options": "i"}},
+                {"email": {"$regex": f"^\\s*{prefix}", "$options": "i"}},
+            ]},
+        ]
+    
+    # One round trip: the page and both materialized stats it is shown with
+    docs, total_estimate = await asyncio.gather(db.users.aggregate([
+        {"$match": admin_list_filter(query, sort, sort_keys, cursor)},
+        {"$sort": dict(sort_keys)},
+        {"$limit": limit + 1},
+        {"$addFields": {"user_id": {"$toString": "$_id"}}},
+        {"$lookup": {"from": "handler_stats", "localField": "user_id", "foreignField": "_id", "as": "handler_stats"}},
+        {"$lookup": {"from": "customer_stats", "localField": "user_id", "foreignField": "_id", "as": "customer_stats"}},
+        {"$project": {
+            "name": 1, "email": 1, "user_type": 1, "status": 1, "created_at": 1, "last_activity_at": 1,
+            "handler_stats": {"$first": "$handler_stats"},
+            "customer_stats": {"$first": "$customer_stats"},
+        }}
+    ]).to_list(limit + 1), admin_list_total(db.users, query, cursor))
+    docs, next_cursor = admin_list_cursor(docs, sort, sort_keys, limit)
+    
     users = []
-    async for user in db.users.find(query).limit(limit):
-        # Get additional stats
+    for user in docs:
         if user.get("user_type") == "handler":
-            total_jobs = await db.bookings.count_documents({"handler_id": str(user["_id"])})
-            reviews = await db.reviews.find({"handler_id": str(user["_id"])}).to_list(None)
-            avg_rating = sum(r.get("rating", 0) for r in reviews) / len(reviews) if reviews else 0
+            stats = summarize_handler_stats(user.get("handler_stats"))
+            total_jobs = stats["total_jobs"]
+            avg_rating = stats["rating"]
         else:
-            total_jobs = await db.bookings.count_documents({"customer_id": str(user["_id"])})
+            total_jobs = (user.get("customer_stats") or {}).get("total_bookings", 0)
             avg_rating = 0
         
         users.append({
@@ -2477,11 +5113,17 @@ async def admin_get_users(
             "user_type": user.get("user_type"),
             "status": user.get("status", "active"),
             "created_at": user.get("created_at"),
+            "last_activity_at": user.get("last_activity_at"),
             "total_jobs": total_jobs,
             "rating": round(avg_rating, 2) if avg_rating else None,
         })
     
-    return {"users": users, "total": len(users)}
+    return {
+        "users": select_fields(users, fields),
+        "total": len(users),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
 
 @api_router.get("/admin/users/{user_id}")
 async def admin_get_user(user_id: str):
@@ -2502,10 +5144,10 @@ async def admin_get_user(user_id: str):
         ]
     }).to_list(20)
     
-    # Get reviews if handler
-    reviews = []
+    # Get review count if handler
+    review_count = 0
     if user.get("user_type") == "handler":
-        reviews = await db.reviews.find({"handler_id": user_id}).to_list(10)
+        review_count = (await get_handler_stats(user_id))["review_count"]
     
     user_detail = {
         "id": str(user["_id"]),
@@ -2518,7 +5160,7 @@ async def admin_get_user(user_id: str):
         "skills": user.get("skills", []),
         "rating": user.get("rating"),
         "recent_bookings": len(bookings),
-        "review_count": len(reviews),
+        "review_count": review_count,
     }
     
     return user_detail
@@ -2576,12 +5218,20 @@ async def admin_delete_user(user_id: str):
     return {"message": "User deleted successfully"}
 
 # Booking Management
+ADMIN_BOOKING_SORTS = {
+    "recent": [("created_at", -1), ("_id", -1)],
+    "scheduled": [("scheduled_time", -1), ("_id", -1)],
+}
+
 @api_router.get("/admin/bookings")
 async def admin_get_bookings(
     status: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: int = 100
+    sort: str = "recent",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """Get all bookings with filters"""
     query = {}
@@ -2596,14 +5246,16 @@ async def admin_get_bookings(
         if end_date:
             query["scheduled_time"]["$lte"] = end_date
     
-    bookings = []
-    async for booking in db.bookings.find(query).sort("created_at", -1).limit(limit):
-        # Get service, customer, and handler info
-        service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-        customer = await db.users.find_one({"_id": ObjectId(booking["customer_id"])})
-        handler = await db.users.find_one({"_id": ObjectId(booking.get("handler_id", "000000000000000000000000"))})
-        
-        bookings.append({
+    page, next_cursor, total_estimate = await admin_list_page(db.bookings, query, ADMIN_BOOKING_SORTS, sort, limit, cursor)
+    loaders = RequestLoaders()
+    
+    async def booking_row(booking: dict) -> dict:
+        service, customer, handler = await asyncio.gather(
+            loaders.services.load(booking.get("service_id")),
+            loaders.users.load(booking.get("customer_id")),
+            loaders.users.load(booking.get("handler_id"))
+        )
+        return {
             "id": str(booking["_id"]),
             "service_name": service.get("name") if service else "Unknown",
             "service_price": service.get("fixed_price") if service else 0,
@@ -2612,9 +5264,15 @@ async def admin_get_bookings(
             "status": booking["status"],
             "scheduled_time": booking["scheduled_time"],
             "created_at": booking.get("created_at"),
-        })
+        }
     
-    return {"bookings": bookings, "total": len(bookings)}
+    bookings = await asyncio.gather(*(booking_row(booking) for booking in page))
+    return {
+        "bookings": select_fields(bookings, fields),
+        "total": len(bookings),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
 
 @api_router.put("/admin/bookings/{booking_id}/status")
 async def admin_update_booking_status(booking_id: str, status: str):
@@ -2627,14 +5285,19 @@ async def admin_update_booking_status(booking_id: str, status: str):
     if not ObjectId.is_valid(booking_id):
         raise HTTPException(status_code=400, detail="Invalid booking ID")
     
-    result = await db.bookings.update_one(
+    now = datetime.utcnow()
+    before = await db.bookings.find_one_and_update(
         {"_id": ObjectId(booking_id)},
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        booking_status_update(status, now),
+        projection=BOOKING_CHANGE_PROJECTION,
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="Booking not found")
     
+    await record_booking_change(before, booking_with_status(before, status, now))
+    location_ingestor.invalidate(before.get("handler_id"))
     return {"message": "Booking status updated", "new_status": status}
 
 @api_router.delete("/admin/bookings/{booking_id}")
@@ -2643,11 +5306,13 @@ async def admin_delete_booking(booking_id: str):
     if not ObjectId.is_valid(booking_id):
         raise HTTPException(status_code=400, detail="Invalid booking ID")
     
-    result = await db.bookings.delete_one({"_id": ObjectId(booking_id)})
+    deleted = await db.bookings.find_one_and_delete({"_id": ObjectId(booking_id)})
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Booking not found")
     
+    await record_booking_change(deleted, None)
+    
     return {"message": "Booking deleted successfully"}
 
 # Analytics
@@ -2657,57 +5322,209 @@ async def get_admin_analytics(
     end_date: Optional[str] = None
 ):
     """Get comprehensive platform analytics"""
-    # Date range for bookings
-    booking_query = {}
-    if start_date or end_date:
-        booking_query["created_at"] = {}
-        if start_date:
-            booking_query["created_at"]["$gte"] = datetime.fromisoformat(start_date)
-        if end_date:
-            booking_query["created_at"]["$lte"] = datetime.fromisoformat(end_date)
-    
-    # Booking statistics
-    total_bookings = await db.bookings.count_documents(booking_query)
-    pending = await db.bookings.count_documents({**booking_query, "status": "pending"})
-    confirmed = await db.bookings.count_documents({**booking_query, "status": "confirmed"})
-    in_progress = await db.bookings.count_documents({**booking_query, "status": "in_progress"})
-    completed = await db.bookings.count_documents({**booking_query, "status": "completed"})
-    cancelled = await db.bookings.count_documents({**booking_query, "status": "cancelled"})
-    
-    # Revenue calculation
-    revenue_pipeline = [
-        {"$match": {**booking_query, "status": "completed"}},
-        {"$lookup": {
-            "from": "services",
-            "localField": "service_id",
-            "foreignField": "_id",
-            "as": "service"
-        }},
-        {"$unwind": "$service"},
-        {"$group": {
-            "_id": None,
-            "total": {"$sum": "$service.fixed_price"}
-        }}
-    ]
+    return await admin_cache.get(
+        ("analytics", start_date, end_date),
+        lambda: compute_admin_analytics(start_date, end_date)
+    )
+
+async def compute_admin_analytics(start_date: Optional[str], end_date: Optional[str]) -> dict:
+    # Date range over whole days, by the day bookings were created
+    first_day = rollup_day(datetime.fromisoformat(start_date)) if start_date else None
+    last_day = rollup_day(datetime.fromisoformat(end_date)) if end_date else None
+    
+    statuses = ["pending", "confirmed", "in_progress", "completed", "cancelled"]
+    if await rollups_ready():
+        rollup_query = {"dimension": "all"}
+        if first_day or last_day:
+            rollup_query["day"] = {}
+            if first_day:
+                rollup_query["day"]["$gte"] = first_day
+            if last_day:
+                rollup_query["day"]["$lte"] = last_day
+        totals = await aggregate_one(db.daily_rollups, [
+            {"$match": rollup_query},
+            {"$group": {
+                "_id": None,
+                "total": rollup_sum("bookings"),
+                "revenue": rollup_sum("revenue"),
+                **{status: rollup_sum(f"status.{status}") for status in statuses},
+            }}
+        ])
+    else:
+        booking_query = {}
+        if first_day or last_day:
+            booking_query["created_at"] = {}
+            if first_day:
+                booking_query["created_at"]["$gte"] = datetime.strptime(first_day, "%Y-%m-%d")
+            if last_day:
+                booking_query["created_at"]["$lt"] = datetime.strptime(last_day, "%Y-%m-%d") + timedelta(days=1)
+        totals = await aggregate_one(db.bookings, [
+            {"$match": booking_query},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "revenue": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, BOOKING_REVENUE_EXPR, 0]}},
+                **{status: {"$sum": {"$cond": [{"$eq": ["$status", status]}, 1, 0]}} for status in statuses},
+            }}
+        ])
     
-    revenue_result = await db.bookings.aggregate(revenue_pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
+    bookings = {"total": totals.get("total", 0)}
+    bookings.update({status: totals.get(status, 0) for status in statuses})
+    total_revenue = totals.get("revenue", 0)
+    completed = bookings["completed"]
     
     return {
-        "bookings": {
-            "total": total_bookings,
-            "pending": pending,
-            "confirmed": confirmed,
-            "in_progress": in_progress,
-            "completed": completed,
-            "cancelled": cancelled,
-        },
+        "bookings": bookings,
         "revenue": {
             "total": total_revenue,
             "average_per_booking": total_revenue / completed if completed > 0 else 0,
         }
     }
 
+# Metrics charted by /admin/analytics/timeseries: the daily rollup counter
+# holding each one, and how to compute it from the source collection
+TIMESERIES_METRICS = {
+    "bookings": {"rollup": "bookings", "collection": "bookings", "match": {}, "value": 1},
+    "completed_bookings": {"rollup": "status.completed", "collection": "bookings", "match": {"status": "completed"}, "value": 1},
+    "cancelled_bookings": {"rollup": "status.cancelled", "collection": "bookings", "match": {"status": "cancelled"}, "value": 1},
+    "revenue": {"rollup": "revenue", "collection": "bookings", "match": {"status": "completed"}, "value": BOOKING_REVENUE_EXPR},
+    "signups": {"rollup": "signups.user", "collection": "users", "match": {}, "value": 1},
+    "payouts": {"rollup": "payout_amount", "collection": "payouts", "match": {}, "value": {"$ifNull": ["$amount", 0]}},
+}
+# Shortest length of each bucket, used to bound the number of buckets returned
+TIMESERIES_GRANULARITIES = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 28 * 86400}
+TIMESERIES_MAX_BUCKETS = 1000
+
+def parse_utc(value: str) -> datetime:
+    """Parse an ISO date(time) to naive UTC, the form stored in the database"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def timeseries_bucket_start(moment: datetime, granularity: str, tz: str) -> datetime:
+    """Start of the bucket holding a naive UTC moment, truncated like $dateTrunc"""
+    local = moment.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(tz))
+    if granularity == "hour":
+        local = local.replace(minute=0, second=0, microsecond=0)
+    else:
+        local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        if granularity == "week":
+            # $dateTrunc weeks start on Sunday
+            local -= timedelta(days=(local.weekday() + 1) % 7)
+        elif granularity == "month":
+            local = local.replace(day=1)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+def timeseries_next_bucket(bucket_start: datetime, granularity: str, tz: str) -> datetime:
+    """Start of the bucket following bucket_start"""
+    if granularity == "hour":
+        return bucket_start + timedelta(hours=1)
+    local = bucket_start.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(tz))
+    if granularity == "month":
+        local = local.replace(year=local.year + local.month // 12, month=local.month % 12 + 1)
+    else:
+        local += timedelta(days=7 if granularity == "week" else 1)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+@api_router.get("/admin/analytics/timeseries")
+async def get_admin_timeseries(
+    metric: str = "bookings",
+    granularity: str = "day",
+    tz: str = "UTC",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    handler_id: Optional[str] = None
+):
+    """Get one metric bucketed by hour, day, week or month, for charting"""
+    if metric not in TIMESERIES_METRICS:
+        raise HTTPException(status_code=400, detail=f"Invalid metric. Must be one of: {list(TIMESERIES_METRICS)}")
+    if granularity not in TIMESERIES_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Invalid granularity. Must be one of: {list(TIMESERIES_GRANULARITIES)}")
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid timezone")
+    if category and handler_id:
+        raise HTTPException(status_code=400, detail="Filter by category or handler_id, not both")
+    collection = TIMESERIES_METRICS[metric]["collection"]
+    if (category and collection != "bookings") or (handler_id and collection == "users"):
+        raise HTTPException(status_code=400, detail=f"Metric {metric} does not support that filter")
+    
+    try:
+        end = parse_utc(end_date) if end_date else datetime.utcnow()
+        start = parse_utc(start_date) if start_date else end - timedelta(days=30)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    
+    # Widen the range to whole buckets: rollups and raw collections then count
+    # the same rows, and the default "now" end maps to a stable cache key
+    start = timeseries_bucket_start(start, granularity, tz)
+    end = timeseries_next_bucket(timeseries_bucket_start(end, granularity, tz), granularity, tz)
+    if (end - start).total_seconds() / TIMESERIES_GRANULARITIES[granularity] > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Date range spans more than {TIMESERIES_MAX_BUCKETS} {granularity} buckets")
+    
+    return await admin_cache.get(
+        ("timeseries", metric, granularity, tz, start, end, category, handler_id),
+        lambda: compute_admin_timeseries(metric, granularity, tz, start, end, category, handler_id)
+    )
+
+async def compute_admin_timeseries(
+    metric: str, granularity: str, tz: str, start: datetime, end: datetime,
+    category: Optional[str], handler_id: Optional[str]
+) -> dict:
+    """Bucketed metric over [start, end), both already on bucket boundaries, one row per bucket"""
+    spec = TIMESERIES_METRICS[metric]
+    
+    # Daily rollups are UTC days, so they can serve any UTC series of a day or longer
+    if tz == "UTC" and granularity != "hour" and await rollups_ready():
+        source = "rollups"
+        dimension, key = ("category", category) if category else ("handler", handler_id) if handler_id else ("all", "all")
+        collection = db.daily_rollups
+        pipeline = [
+            {"$match": {"dimension": dimension, "key": key, "day": {"$gte": rollup_day(start), "$lt": rollup_day(end)}}},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": {"$dateFromString": {"dateString": "$day"}}, "unit": granularity}},
+                "value": rollup_sum(spec["rollup"])
+            }}
+        ]
+    else:
+        source = spec["collection"]
+        collection = db[spec["collection"]]
+        query = {**spec["match"], "created_at": {"$gte": start, "$lt": end}}
+        if category:
+            query["$or"] = [{"service_category": category}, {"category": category}]
+        if handler_id:
+            query["handler_id"] = handler_id
+        pipeline = [
+            {"$match": query},
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$created_at", "unit": granularity, "timezone": tz}},
+                "value": {"$sum": spec["value"]}
+            }}
+        ]
+    
+    rows = await collection.aggregate(pipeline).to_list(TIMESERIES_MAX_BUCKETS + 1)
+    values = {row["_id"]: row["value"] for row in rows}
+    # Dense series: every bucket in [start, end), 0 where nothing was recorded
+    series = []
+    bucket = start
+    while bucket < end:
+        series.append({"bucket": bucket, "value": values.get(bucket, 0)})
+        bucket = timeseries_next_bucket(bucket, granularity, tz)
+    return {
+        "metric": metric,
+        "granularity": granularity,
+        "timezone": tz,
+        "start_date": start,
+        "end_date": end,
+        "source": source,
+        "series": series,
+    }
+
 # ==================== Chat System ====================
 
 class ChatMessage(BaseModel):
@@ -2867,29 +5684,52 @@ async def get_support_messages(ticket_id: str, limit: int = 100):
     return {"messages": messages, "total": len(messages)}
 
 # Admin Chat Management
+ADMIN_TICKET_SORTS = {
+    "updated": [("updated_at", -1), ("_id", -1)],
+    "created": [("created_at", -1), ("_id", -1)],
+}
+
 @api_router.get("/admin/support/tickets")
-async def get_all_support_tickets(status: Optional[str] = None, limit: int = 100):
+async def get_all_support_tickets(
+    status: Optional[str] = None,
+    sort: str = "updated",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """Get all support tickets (admin)"""
     query = {}
     if status:
         query["status"] = status
     
-    tickets = []
-    async for ticket in db.support_tickets.find(query).sort("updated_at", -1).limit(limit):
-        # Get user info
-        user = await db.users.find_one({"_id": ObjectId(ticket["user_id"])})
-        
-        # Get message count
-        msg_count = await db.support_messages.count_documents({"ticket_id": str(ticket["_id"])})
-        
+    tickets, next_cursor, total_estimate = await admin_list_page(
+        db.support_tickets, query, ADMIN_TICKET_SORTS, sort, limit, cursor
+    )
+    loaders = RequestLoaders()
+    
+    # Message counts for the whole page in one aggregation
+    ticket_ids = [str(ticket["_id"]) for ticket in tickets]
+    msg_counts = {}
+    async for row in db.support_messages.aggregate([
+        {"$match": {"ticket_id": {"$in": ticket_ids}}},
+        {"$group": {"_id": "$ticket_id", "count": {"$sum": 1}}}
+    ]):
+        msg_counts[row["_id"]] = row["count"]
+    
+    users = await loaders.users.load_many([ticket.get("user_id") for ticket in tickets])
+    for ticket, user in zip(tickets, users):
         ticket["id"] = str(ticket["_id"])
         del ticket["_id"]
         ticket["user_name"] = user.get("name") if user else "Unknown"
         ticket["user_email"] = user.get("email") if user else "Unknown"
-        ticket["message_count"] = msg_count
-        tickets.append(ticket)
+        ticket["message_count"] = msg_counts.get(ticket["id"], 0)
     
-    return {"tickets": tickets, "total": len(tickets)}
+    return {
+        "tickets": select_fields(tickets, fields),
+        "total": len(tickets),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
 
 @api_router.put("/admin/support/ticket/{ticket_id}/status")
 async def update_ticket_status(ticket_id: str, status: str):
@@ -2916,39 +5756,36 @@ async def get_all_conversations(limit: int = 50):
     """Get all booking conversations (admin monitoring)"""
     # Get unique booking IDs with messages
     pipeline = [
-        {"$group": {"_id": "$booking_id", "last_message": {"$max": "$created_at"}}},
+        {"$group": {"_id": "$booking_id", "last_message": {"$max": "$created_at"}, "message_count": {"$sum": 1}}},
         {"$sort": {"last_message": -1}},
         {"$limit": limit}
     ]
     
-    booking_ids = await db.chat_messages.aggregate(pipeline).to_list(limit)
+    items = await db.chat_messages.aggregate(pipeline).to_list(limit)
+    loaders = RequestLoaders()
     
-    conversations = []
-    for item in booking_ids:
-        booking_id = item["_id"]
-        booking = await db.bookings.find_one({"_id": ObjectId(booking_id)})
+    async def conversation_row(item: dict) -> Optional[dict]:
+        booking = await loaders.bookings.load(item["_id"])
+        if not booking:
+            return None
         
-        if booking:
-            # Get customer and handler info
-            customer = await db.users.find_one({"_id": ObjectId(booking["customer_id"])})
-            handler = await db.users.find_one({"_id": ObjectId(booking.get("handler_id", "000000000000000000000000"))})
-            
-            # Get service info
-            service = await db.services.find_one({"_id": ObjectId(booking["service_id"])})
-            
-            # Get message count
-            msg_count = await db.chat_messages.count_documents({"booking_id": booking_id})
-            
-            conversations.append({
-                "booking_id": booking_id,
-                "customer_name": customer.get("name") if customer else "Unknown",
-                "handler_name": handler.get("name") if handler else "Unassigned",
-                "service_name": service.get("name") if service else "Unknown",
-                "message_count": msg_count,
-                "last_message": item["last_message"],
-                "booking_status": booking["status"]
-            })
+        customer, handler, service = await asyncio.gather(
+            loaders.users.load(booking.get("customer_id")),
+            loaders.users.load(booking.get("handler_id")),
+            loaders.services.load(booking.get("service_id"))
+        )
+        return {
+            "booking_id": item["_id"],
+            "customer_name": customer.get("name") if customer else "Unknown",
+            "handler_name": handler.get("name") if handler else "Unassigned",
+            "service_name": service.get("name") if service else "Unknown",
+            "message_count": item["message_count"],
+            "last_message": item["last_message"],
+            "booking_status": booking["status"]
+        }
     
+    rows = await asyncio.gather(*(conversation_row(item) for item in items))
+    conversations = [row for row in rows if row]
     return {"conversations": conversations, "total": len(conversations)}
 
 # Handler Profile for Customer
@@ -2971,10 +5808,7 @@ async def get_booking_handler_profile(booking_id: str):
     if not handler:
         raise HTTPException(status_code=404, detail="Handler not found")
     
-    # Get handler stats
-    total_jobs = await db.bookings.count_documents({"handler_id": handler_id, "status": "completed"})
-    reviews = await db.reviews.find({"handler_id": handler_id}).to_list(None)
-    avg_rating = sum(r.get("rating", 0) for r in reviews) / len(reviews) if reviews else 0
+    stats = await get_handler_stats(handler_id)
     
     handler_profile = {
         "id": str(handler["_id"]),
@@ -2985,9 +5819,9 @@ async def get_booking_handler_profile(booking_id: str):
         "skills": handler.get("skills", []),
         "hourly_rate": handler.get("hourly_rate", 0),
         "years_experience": handler.get("years_experience", 0),
-        "rating": round(avg_rating, 2),
-        "review_count": len(reviews),
-        "completed_jobs": total_jobs,
+        "rating": stats["rating"],
+        "review_count": stats["review_count"],
+        "completed_jobs": stats["completed_jobs"],
     }
     
     return {"handler": handler_profile}
@@ -3010,16 +5844,35 @@ async def create_promo_code(promo: PromoCodeModel):
     
     return {"message": "Promo code created successfully", "code": promo.code.upper()}
 
+ADMIN_PROMO_SORTS = {
+    "recent": [("created_at", -1), ("_id", -1)],
+    "code": [("code", 1), ("_id", 1)],
+}
+
 @api_router.get("/admin/promo-codes")
-async def get_all_promo_codes():
-    """Get all promo codes"""
-    promo_codes = []
-    async for promo in db.promo_codes.find().sort("created_at", -1):
-        promo["id"] = str(promo["_id"])
-        del promo["_id"]
-        promo_codes.append(promo)
+async def get_all_promo_codes(
+    active: Optional[bool] = None,
+    sort: str = "recent",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Get a page of promo codes; follow next_cursor for the rest"""
+    query = {}
+    if active is not None:
+        query["active"] = active
+    
+    docs, next_cursor, total_estimate = await admin_list_page(
+        db.promo_codes, query, ADMIN_PROMO_SORTS, sort, limit, cursor
+    )
     
-    return {"promo_codes": promo_codes, "total": len(promo_codes)}
+    promo_codes = [serialize_doc(promo) for promo in docs]
+    return {
+        "promo_codes": select_fields(promo_codes, fields),
+        "total": len(promo_codes),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
 
 @api_router.get("/promo-codes/{code}")
 async def validate_promo_code(code: str):
@@ -3073,17 +5926,6 @@ async def delete_promo_code(code: str):
     del review["_id"]
     return {"review": review}
 
-async def update_handler_rating(handler_id: str):
-    """Helper function to update handler's average rating"""
-    reviews = await db.reviews.find({"handler_id": handler_id}).to_list(None)
-    
-    if reviews:
-        avg_rating = sum(r.get("rating", 0) for r in reviews) / len(reviews)
-        await db.users.update_one(
-            {"_id": ObjectId(handler_id)},
-            {"$set": {"rating": round(avg_rating, 2), "review_count": len(reviews)}}
-        )
-
 
 # Root routes
 @api_router.get("/")
@@ -3131,6 +5973,7 @@ async def register_partner(partner: PartnerCreate):
     partner_dict["created_at"] = datetime.utcnow()
     
     result = await db.partners.insert_one(partner_dict)
+    await record_signup("partner", partner_dict["created_at"])
     
     # Notify admin of new partner registration (non-blocking)
     try:
@@ -3361,20 +6204,38 @@ async def admin_assign_handler_to_partner(handler_id: str, assignment: HandlerPa
         "partner_id": assignment.partner_id
     }
 
+ADMIN_PARTNER_SORTS = {
+    "recent": [("created_at", -1), ("_id", -1)],
+    "name": [("organization_name", 1), ("_id", 1)],
+}
+
 @api_router.get("/admin/partners")
-async def admin_get_partners(status: Optional[str] = None):
+async def admin_get_partners(
+    status: Optional[str] = None,
+    sort: str = "recent",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """Admin gets all partners"""
     query = {}
     if status:
         query["status"] = status
     
-    partners = await db.partners.find(query).sort("created_at", -1).to_list(100)
+    partners, next_cursor, total_estimate = await admin_list_page(
+        db.partners, query, ADMIN_PARTNER_SORTS, sort, limit, cursor
+    )
     
     partner_list = []
     for partner in partners:
-        partner_list.append(PartnerResponse(**serialize_doc(partner)))
+        partner_list.append(PartnerResponse(**serialize_doc(partner)).dict())
     
-    return {"partners": partner_list, "total": len(partner_list)}
+    return {
+        "partners": select_fields(partner_list, fields),
+        "total": len(partner_list),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
 
 # ==================== Stripe Connect Routes ====================
 
@@ -3510,18 +6371,35 @@ async def create_payout(request: StripePayoutRequest):
         # Convert amount to pence (Stripe uses smallest currency unit)
         amount_pence = int(request.amount * 100)
         
+        # Take the money out of the wallet before transferring it
+        try:
+            debit = await post_wallet_entry(
+                request.handler_id, -request.amount, "payout",
+                request.description or "Payout to bank account", booking_id=request.booking_id
+            )
+        except InsufficientBalance:
+            raise HTTPException(status_code=400, detail="Insufficient wallet balance")
+        
         # Create transfer to Connected Account
-        transfer = stripe.Transfer.create(
-            amount=amount_pence,
-            currency="gbp",
-            destination=stripe_account_id,
-            description=request.description or f"Payout to {handler.get('name')}",
-            metadata={
-                "handler_id": request.handler_id,
-                "handler_name": handler.get("name"),
-                "booking_id": request.booking_id or "manual_payout"
-            }
-        )
+        try:
+            transfer = stripe.Transfer.create(
+                amount=amount_pence,
+                currency="gbp",
+                destination=stripe_account_id,
+                description=request.description or f"Payout to {handler.get('name')}",
+                metadata={
+                    "handler_id": request.handler_id,
+                    "handler_name": handler.get("name"),
+                    "booking_id": request.booking_id or "manual_payout"
+                }
+            )
+        except Exception:
+            # Any failure here means no money moved, so give the debit back
+            await post_wallet_entry(
+                request.handler_id, request.amount, "payout_reversal",
+                f"Reversal of failed payout (entry {debit['seq']})", booking_id=request.booking_id
+            )
+            raise
         
         # Record payout in database
         payout_record = {
@@ -3533,10 +6411,12 @@ async def create_payout(request: StripePayoutRequest):
             "description": request.description,
             "booking_id": request.booking_id,
             "status": "completed",
+            "ledger_seq": debit["seq"],
             "created_at": datetime.utcnow()
         }
         
         await db.payouts.insert_one(payout_record)
+        await record_payout(payout_record)
         
         # Update handler wallet
         await db.users.update_one(
@@ -3659,32 +6539,51 @@ async def update_app_settings(request: AppSettingsUpdate):
 
 # ==================== Chat History Routes ====================
 
+ADMIN_CHAT_SORTS = {
+    "recent": [("created_at", -1), ("_id", -1)],
+}
+
 @api_router.get("/admin/chat-history")
-async def get_all_chat_history(booking_id: Optional[str] = None, limit: int = 100):
+async def get_all_chat_history(
+    booking_id: Optional[str] = None,
+    sort: str = "recent",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """Get all chat history across bookings"""
     query = {}
     if booking_id:
         if ObjectId.is_valid(booking_id):
             query["booking_id"] = booking_id
     
-    chats = await db.booking_chats.find(query).sort("created_at", -1).limit(limit).to_list(limit)
+    chats, next_cursor, total_estimate = await admin_list_page(
+        db.booking_chats, query, ADMIN_CHAT_SORTS, sort, limit, cursor
+    )
     
     # Enrich with booking and user details
+    loaders = RequestLoaders()
+    bookings, senders = await asyncio.gather(
+        loaders.bookings.load_many([chat.get("booking_id") for chat in chats]),
+        loaders.users.load_many([chat.get("sender_id") for chat in chats])
+    )
+    
     enriched_chats = []
-    for chat in chats:
-        booking = await db.bookings.find_one({"_id": ObjectId(chat["booking_id"])}) if ObjectId.is_valid(chat.get("booking_id", "")) else None
-        
-        sender = await db.users.find_one({"_id": ObjectId(chat["sender_id"])}) if ObjectId.is_valid(chat.get("sender_id", "")) else None
-        
+    for chat, booking, sender in zip(chats, bookings, senders):
         enriched_chat = serialize_doc(chat)
-        enriched_chat["booking_details"] = serialize_doc(booking) if booking else None
+        enriched_chat["booking_details"] = serialize_doc(dict(booking)) if booking else None
         enriched_chat["sender_details"] = {
             "name": sender.get("name") if sender else "Unknown",
             "user_type": sender.get("user_type") if sender else "Unknown"
         }
         enriched_chats.append(enriched_chat)
     
-    return {"chats": enriched_chats, "total": len(enriched_chats)}
+    return {
+        "chats": select_fields(enriched_chats, fields),
+        "total": len(enriched_chats),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
 
 @api_router.get("/admin/chat-history/booking/{booking_id}")
 async def get_booking_chat_history(booking_id: str):
@@ -3700,12 +6599,15 @@ async def get_booking_chat_history(booking_id: str):
         raise HTTPException(status_code=404, detail="Booking not found")
     
     # Get participants
-    customer = await db.users.find_one({"_id": ObjectId(booking["user_id"])})
-    handler = await db.users.find_one({"_id": ObjectId(booking.get("handler_id", ""))}) if booking.get("handler_id") else None
+    loaders = RequestLoaders()
+    customer, handler, senders = await asyncio.gather(
+        loaders.users.load(booking.get("user_id") or booking.get("customer_id")),
+        loaders.users.load(booking.get("handler_id")),
+        loaders.users.load_many([chat.get("sender_id") for chat in chats])
+    )
     
     enriched_chats = []
-    for chat in chats:
-        sender = await db.users.find_one({"_id": ObjectId(chat["sender_id"])})
+    for chat, sender in zip(chats, senders):
         enriched_chat = serialize_doc(chat)
         enriched_chat["sender_name"] = sender.get("name") if sender else "Unknown"
         enriched_chat["sender_type"] = sender.get("user_type") if sender else "Unknown"
@@ -3793,11 +6695,182 @@ async def send_admin_email(request: EmailSendRequest):
         "total_recipients": len(recipients)
     }
 
+ADMIN_EMAIL_LOG_SORTS = {
+    "recent": [("sent_at", -1), ("_id", -1)],
+}
+
 @api_router.get("/admin/email-logs")
-async def get_email_logs(limit: int = 50):
+async def get_email_logs(
+    recipient_type: Optional[str] = None,
+    sort: str = "recent",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """Get email sending logs"""
-    logs = await db.email_logs.find({}).sort("sent_at", -1).limit(limit).to_list(limit)
-    return {"logs": [serialize_doc(log) for log in logs], "total": len(logs)}
+    query = {}
+    if recipient_type:
+        query["recipient_type"] = recipient_type
+    
+    docs, next_cursor, total_estimate = await admin_list_page(
+        db.email_logs, query, ADMIN_EMAIL_LOG_SORTS, sort, limit, cursor
+    )
+    
+    logs = [serialize_doc(log) for log in docs]
+    return {
+        "logs": select_fields(logs, fields),
+        "total": len(logs),
+        "total_estimate": total_estimate,
+        "next_cursor": next_cursor,
+    }
+
+# ==================== Admin Exports ====================
+
+# Exportable datasets: the collection, the columns written (in order), the
+# timestamp start_date/end_date filter on, and the equality filters allowed
+EXPORT_DATASETS = {
+    "bookings": {
+        "collection": "bookings",
+        "fields": ["customer_id", "handler_id", "service_name", "service_category", "status", "payment_status",
+                   "scheduled_date", "scheduled_time", "revenue_amount", "created_at"],
+        "time_field": "created_at",
+        "filters": ["status", "handler_id"],
+    },
+    "users": {
+        "collection": "users",
+        "fields": ["name", "email", "phone", "user_type", "status", "rating", "created_at"],
+        "time_field": "created_at",
+        "filters": ["status", "user_type"],
+    },
+    "payouts": {
+        "collection": "payouts",
+        "fields": ["handler_id", "amount", "currency", "status", "booking_id", "stripe_transfer_id", "created_at"],
+        "time_field": "created_at",
+        "filters": ["status", "handler_id"],
+    },
+    "email_logs": {
+        "collection": "email_logs",
+        "fields": ["recipient_type", "subject", "sent_count", "failed_count", "total_recipients", "sent_at"],
+        "time_field": "sent_at",
+        "filters": [],
+    },
+}
+EXPORT_BATCH_SIZE = 500  # Documents per cursor batch, and rows per chunk written to the response
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+# Leading characters a spreadsheet would evaluate as a formula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def csv_cell(value):
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+async def export_chunks(cursor, fields: List[str], fmt: str, header: bool = True):
+    """Serialize documents from a cursor into CSV or NDJSON text, one chunk per batch"""
+    columns = ["id"] + fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer and header:
+        writer.writerow(columns)
+    
+    rows = 0
+    async for doc in cursor:
+        row = {"id": str(doc["_id"]), **{field: export_value(doc.get(field)) for field in fields}}
+        if writer:
+            writer.writerow([csv_cell(row[c]) for c in columns])
+        else:
+            buffer.write(json.dumps(row, default=str) + "\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@api_router.get("/admin/export/{dataset}")
+async def admin_export(
+    dataset: str,
+    format: str = "csv",
+    gzip: bool = False,
+    after: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    status: Optional[str] = None,
+    user_type: Optional[str] = None,
+    handler_id: Optional[str] = None
+):
+    """Stream a full admin dataset as CSV or NDJSON.
+
+    Rows are written in id order; an interrupted export resumes by passing the
+    id of the last row received as `after`.
+    """
+    spec = EXPORT_DATASETS.get(dataset)
+    if not spec:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset. Must be one of: {list(EXPORT_DATASETS)}")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Invalid format. Must be csv or ndjson")
+    
+    query = {}
+    filters = {"status": status, "user_type": user_type, "handler_id": handler_id}
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name not in spec["filters"]:
+            raise HTTPException(status_code=400, detail=f"{dataset} cannot be filtered by {name}")
+        query[name] = value
+    
+    try:
+        if start_date or end_date:
+            query[spec["time_field"]] = {}
+            if start_date:
+                query[spec["time_field"]]["$gte"] = parse_utc(start_date)
+            if end_date:
+                query[spec["time_field"]]["$lte"] = parse_utc(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+    
+    if after:
+        if not ObjectId.is_valid(after):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["_id"] = {"$gt": ObjectId(after)}
+    
+    cursor = db[spec["collection"]].find(
+        query, {field: 1 for field in spec["fields"]}
+    ).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    
+    # A resumed CSV continues the file the first request started, header included
+    body = export_chunks(cursor, spec["fields"], format, header=after is None)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"{dataset}.{format}"
+    if gzip:
+        body = gzip_chunks(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 # ======================
@@ -4077,6 +7150,7 @@ async def create_booking_with_payment(booking: BookingWithPayment):
         # Create booking document
         booking_doc = {
             "customer_id": booking.customer_id,
+            "handler_id": handler_id,
             "professional_id": handler_id,
             "service_ids": booking.service_ids,
             "service_name": ", ".join([s["name"] for s in services]),
@@ -4087,6 +7161,7 @@ async def create_booking_with_payment(booking: BookingWithPayment):
             "address": booking.address,
             "notes": booking.notes,
             "total_price": booking.total_price,
+            "revenue_amount": booking.total_price,
             "payment_method": booking.payment_method,
             "payment_status": "paid",
             "status": status,
@@ -4097,6 +7172,7 @@ async def create_booking_with_payment(booking: BookingWithPayment):
         }
         
         result = await db.bookings.insert_one(booking_doc)
+        await record_booking_change(None, booking_doc)
         booking_id = str(result.inserted_id)
         
         # Prepare receipt data
@@ -4217,6 +7293,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def ensure_indexes():
+    """Create the indexes backing matching lookups and read models"""
+    await db.availability_intervals.create_index([("day_key", 1), ("start", 1), ("end", 1), ("categories", 1)])
+    await db.availability_intervals.create_index([("handler_id", 1), ("day_key", 1)])
+    await db.bookings.create_index([("handler_id", 1), ("scheduled_date", 1), ("status", 1)])
+    await db.bookings.create_index([("status", 1), ("handler_id", 1), ("created_at", 1)])
+    # Covers revenue queries: status and date range, summing revenue_amount
+    await db.bookings.create_index([("status", 1), ("created_at", 1), ("revenue_amount", 1)])
+    await db.users.create_index([("user_type", 1), ("skills", 1), ("available", 1), ("rating", -1), ("_id", -1)])
+    await db.users.create_index([("user_type", 1), ("available", 1), ("rating", -1), ("_id", -1)])
+    await db.users.create_index([("geo", "2dsphere"), ("user_type", 1), ("skills", 1)])
+    await db.users.create_index([("search_keys", 1), ("user_type", 1)])
+    # Prefix search under the default recency sort
+    await db.users.create_index([("search_keys", 1), ("_id", -1)])
+    await db.users.create_index([("user_type", 1), ("last_activity_at", -1), ("_id", -1)])
+    await db.users.create_index([("last_activity_at", -1), ("_id", -1)])
+    # Admin table sorts (the ADMIN_*_SORTS allow-lists)
+    await db.bookings.create_index([("created_at", -1), ("_id", -1)])
+    await db.bookings.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+    await db.bookings.create_index([("scheduled_time", -1), ("_id", -1)])
+    await db.support_tickets.create_index([("status", 1), ("updated_at", -1), ("_id", -1)])
+    await db.support_tickets.create_index([("updated_at", -1), ("_id", -1)])
+    await db.support_tickets.create_index([("created_at", -1), ("_id", -1)])
+    await db.partners.create_index([("created_at", -1), ("_id", -1)])
+    await db.partners.create_index([("organization_name", 1), ("_id", 1)])
+    await db.promo_codes.create_index([("created_at", -1), ("_id", -1)])
+    await db.promo_codes.create_index([("code", 1), ("_id", 1)])
+    await db.email_logs.create_index([("sent_at", -1), ("_id", -1)])
+    await db.booking_chats.create_index([("booking_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.booking_chats.create_index([("created_at", -1), ("_id", -1)])
+    await db.earnings_buckets.create_index([("handler_id", 1), ("period", 1), ("bucket", -1)])
+    await db.reviews.create_index([("handler_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.daily_rollups.create_index([("dimension", 1), ("key", 1), ("day", 1)])
+    await db.activity_sketches.create_index([("kind", 1), ("day", 1)])
+    await db.wallet_transactions.create_index(
+        [("handler_id", 1), ("seq", -1)],
+        unique=True,
+        partialFilterExpression={"seq": {"$exists": True}}
+    )
+    await db.wallet_transactions.create_index([("handler_id", 1), ("created_at", 1)])
+    await db.wallet_snapshots.create_index([("handler_id", 1), ("seq", -1)], unique=True)
+    await db.presence.create_index("expires_at", expireAfterSeconds=0)
+    await db.presence.create_index([("geo", "2dsphere"), ("expires_at", 1)])
+
+@app.on_event("startup")
+async def startup_db_client():
+    await ensure_indexes()
+    if MATCHING_DISPATCHER_ENABLED:
+        matching_dispatcher.start()
+    location_ingestor.start()
+    presence_registry.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await matching_dispatcher.stop()
+    await location_ingestor.stop()
+    await presence_registry.stop()
     client.close()
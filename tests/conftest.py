@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# server.py lives in backend/ and reads its connection settings at import
+# time; the client connects lazily, so unit tests never touch a database
+# unless they swap server.db for one of their own.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "expertrait_test")
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """An in-memory database swapped in for server.db"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    server = pytest.importorskip("server")
+    database = mongomock_motor.AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "db", database)
+    return database
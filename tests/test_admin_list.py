@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import itertools
+import random
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+server = pytest.importorskip("server")
+
+ASC_DESC_SORTS = [
+    [("a", 1), ("_id", 1)],
+    [("a", -1), ("_id", -1)],
+    [("a", -1), ("b", 1), ("_id", -1)],
+    [("a", 1), ("b", -1), ("_id", 1)],
+]
+
+def mongo_order(docs, sort_keys):
+    """Python reference for MongoDB sort order: null (or missing) before any value"""
+    def compare(x, y):
+        for field, direction in sort_keys:
+            left, right = x.get(field), y.get(field)
+            if left == right:
+                continue
+            if left is None:
+                result = -1
+            elif right is None:
+                result = 1
+            else:
+                result = -1 if left < right else 1
+            return result * direction
+        return 0
+    return sorted(docs, key=functools.cmp_to_key(compare))
+
+def make_docs(rng, count):
+    docs = []
+    for _ in range(count):
+        doc = {"_id": ObjectId()}
+        a = rng.choice([None, None, 1, 2, 3])
+        b = rng.choice([None, "x", "y"])
+        if a is not None or rng.random() < 0.5:
+            doc["a"] = a
+        if b is not None:
+            doc["b"] = b
+        docs.append(doc)
+    return docs
+
+def test_cursor_values_round_trip():
+    moment = datetime(2026, 3, 8, 15, 37, 12, 5000)
+    oid = ObjectId()
+    for value in (moment, oid, None, 4.5, "code"):
+        assert server.restore_cursor_value(server.cursor_value(value)) == value
+    assert isinstance(server.restore_cursor_value(server.cursor_value(moment)), datetime)
+    assert isinstance(server.restore_cursor_value(server.cursor_value(oid)), ObjectId)
+
+@pytest.mark.parametrize("value", [{"$date": "not a date"}, {"$oid": "nope"}, {"$where": "1"}])
+def test_restore_cursor_value_rejects_garbage(value):
+    with pytest.raises(HTTPException) as error:
+        server.restore_cursor_value(value)
+    assert error.value.status_code == 400
+
+def test_cursor_survives_encoding():
+    docs = [{"_id": ObjectId(), "created_at": datetime(2026, 1, day)} for day in range(1, 4)]
+    sort_keys = server.ADMIN_PROMO_SORTS["recent"]
+    page, cursor = server.admin_list_cursor(docs, "recent", sort_keys, 2)
+    assert page == docs[:2]
+    values = server.decode_cursor(cursor)["values"]
+    assert [server.restore_cursor_value(value) for value in values] == [docs[1]["created_at"], docs[1]["_id"]]
+
+def test_no_cursor_without_more_rows():
+    docs = [{"_id": ObjectId()} for _ in range(3)]
+    assert server.admin_list_cursor(docs, "recent", [("_id", -1)], 3) == (docs, None)
+    page, cursor = server.admin_list_cursor(docs, "recent", [("_id", -1)], 2)
+    assert page == docs[:2] and cursor
+
+def test_cursor_from_another_sort_is_rejected():
+    sort_keys = server.ADMIN_PROMO_SORTS["recent"]
+    _, cursor = server.admin_list_cursor([{"_id": ObjectId()}] * 2, "code", server.ADMIN_PROMO_SORTS["code"], 1)
+    with pytest.raises(HTTPException):
+        server.admin_list_filter({}, "recent", sort_keys, cursor)
+
+@pytest.mark.parametrize("sort_keys", ASC_DESC_SORTS)
+def test_keyset_after_matches_sort_order(sort_keys):
+    mongomock = pytest.importorskip("mongomock")
+    rng = random.Random(7)
+    docs = make_docs(rng, 60)
+    collection = mongomock.MongoClient().db.rows
+    collection.insert_many(docs)
+    ordered = mongo_order(docs, sort_keys)
+    
+    for position, last in enumerate(ordered):
+        after = server.keyset_after(sort_keys, [last.get(field) for field, _ in sort_keys])
+        found = {doc["_id"] for doc in collection.find(after)}
+        assert found == {doc["_id"] for doc in ordered[position + 1:]}, (last, sort_keys)
+
+def test_pages_cover_every_row_once():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    collection = mongomock_motor.AsyncMongoMockClient().db.promo_codes
+    rng = random.Random(11)
+    docs = [
+        {"_id": ObjectId(), "code": f"C{i:03d}", "created_at": rng.choice([None, datetime(2026, 1, rng.randint(1, 5))])}
+        for i in range(23)
+    ]
+    
+    async def read_all(sort, limit):
+        pages, cursor = [], None
+        while True:
+            page, cursor, total = await server.admin_list_page(
+                collection, {}, server.ADMIN_PROMO_SORTS, sort, limit, cursor
+            )
+            pages.append(page)
+            if cursor is None:
+                return pages
+    
+    async def run():
+        await collection.insert_many(docs)
+        for sort, limit in itertools.product(server.ADMIN_PROMO_SORTS, (1, 5, 23, 50)):
+            pages = await read_all(sort, limit)
+            rows = [doc["_id"] for page in pages for doc in page]
+            assert sorted(rows) == sorted(doc["_id"] for doc in docs)
+            assert all(pages), "no empty trailing page"
+            expected = mongo_order(docs, server.ADMIN_PROMO_SORTS[sort])
+            assert rows == [doc["_id"] for doc in expected]
+    
+    asyncio.run(run())
+
+def test_promo_codes_always_page(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_LIST_MAX_LIMIT", 3)
+    
+    async def run():
+        await mock_db.promo_codes.insert_many([{"code": f"C{i}", "active": True} for i in range(7)])
+        codes, cursor = [], None
+        while True:
+            page = await server.get_all_promo_codes(limit=100, cursor=cursor, fields="code")
+            assert len(page["promo_codes"]) <= 3
+            codes += [promo["code"] for promo in page["promo_codes"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert sorted(codes) == [f"C{i}" for i in range(7)]
+    
+    asyncio.run(run())
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+server = pytest.importorskip("server")
+
+class CannedCollection:
+    """Collection stand-in returning fixed aggregate rows ($dateTrunc is not in mongomock)"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.pipelines = []
+    
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        rows = self.rows
+        
+        class Cursor:
+            async def to_list(self, length):
+                return rows[:length]
+        return Cursor()
+
+class CannedDatabase:
+    def __init__(self, collection):
+        self.daily_rollups = collection
+        self.collection = collection
+    
+    def __getitem__(self, name):
+        return self.collection
+
+@pytest.mark.parametrize("moment, granularity, tz, start, following", [
+    # 22:30 the evening before in New York; that day is 23 hours long
+    (datetime(2026, 3, 8, 3, 30), "day", "America/New_York", datetime(2026, 3, 7, 5), datetime(2026, 3, 8, 5)),
+    (datetime(2026, 3, 8, 12), "day", "America/New_York", datetime(2026, 3, 8, 5), datetime(2026, 3, 9, 4)),
+    (datetime(2026, 1, 7, 9, 15), "hour", "Asia/Kolkata", datetime(2026, 1, 7, 8, 30), datetime(2026, 1, 7, 9, 30)),
+    # Weeks start on Sunday, like $dateTrunc
+    (datetime(2026, 1, 7, 15), "week", "UTC", datetime(2026, 1, 4), datetime(2026, 1, 11)),
+    (datetime(2026, 1, 4), "week", "UTC", datetime(2026, 1, 4), datetime(2026, 1, 11)),
+    (datetime(2026, 12, 31, 23), "month", "UTC", datetime(2026, 12, 1), datetime(2027, 1, 1)),
+])
+def test_bucket_snapping(moment, granularity, tz, start, following):
+    assert server.timeseries_bucket_start(moment, granularity, tz) == start
+    assert server.timeseries_next_bucket(start, granularity, tz) == following
+
+@pytest.mark.parametrize("rollups", [True, False])
+def test_series_has_every_bucket(monkeypatch, rollups):
+    collection = CannedCollection([{"_id": datetime(2026, 1, 11), "value": 3}, {"_id": datetime(2026, 1, 25), "value": 1}])
+    monkeypatch.setattr(server, "db", CannedDatabase(collection))
+    
+    async def ready():
+        return rollups
+    monkeypatch.setattr(server, "rollups_ready", ready)
+    
+    result = asyncio.run(server.compute_admin_timeseries(
+        "bookings", "week", "UTC", datetime(2026, 1, 4), datetime(2026, 2, 1), None, None
+    ))
+    assert result["source"] == ("rollups" if rollups else "bookings")
+    assert result["series"] == [
+        {"bucket": datetime(2026, 1, 4), "value": 0},
+        {"bucket": datetime(2026, 1, 11), "value": 3},
+        {"bucket": datetime(2026, 1, 18), "value": 0},
+        {"bucket": datetime(2026, 1, 25), "value": 1},
+    ]
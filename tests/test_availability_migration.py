@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+server = pytest.importorskip("server")
+
+async def dated_slots(handler_id):
+    return sorted(
+        (doc["day_key"], doc["start"], doc["end"], doc["available"])
+        for doc in await server.load_availability_slots(handler_id, "dated")
+    )
+
+def test_migration_keeps_endpoint_days_and_skips_unparseable_ones(mock_db):
+    async def run():
+        handler_id = str(ObjectId())
+        # Written by the new endpoint before the migration ran
+        await server.replace_availability_slots(
+            handler_id, "dated", server.dated_slot_intervals([{"date": "2026-10-20", "time_slots": ["10:00-12:00"]}])
+        )
+        await mock_db.handler_availability.insert_one({"handler_id": handler_id, "availability_slots": [
+            {"date": "2026-10-20", "time_slots": ["08:00-09:00"]},
+            {"date": "2026-10-21", "available": False},
+            {"date": "2026-10-22", "time_slots": ["09:00", "13:00-14:30"]},
+            {"date": "2026-10-23", "time_slots": ["morning", "14:00-13:00"]},
+        ]})
+        
+        assert await server.migrate_legacy_availability() == 1
+        assert await dated_slots(handler_id) == [
+            ("2026-10-20", 600, 720, True),
+            ("2026-10-21", 0, 1440, False),
+            ("2026-10-22", 540, 600, True),
+            ("2026-10-22", 780, 870, True),
+        ]
+        # Already migrated documents are not read again
+        assert await server.migrate_legacy_availability() == 0
+    
+    asyncio.run(run())
+
+def test_unparseable_time_slots_are_rejected(mock_db):
+    async def run():
+        handler_id = await mock_db.users.insert_one({"user_type": "handler"})
+        day = (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%d")
+        request = server.HandlerAvailabilityUpdate(
+            handler_id=str(handler_id.inserted_id),
+            availability_slots=[{"date": day, "available": True, "time_slots": ["all day"]}],
+        )
+        with pytest.raises(HTTPException) as error:
+            await server.update_handler_availability(request)
+        assert error.value.status_code == 400
+        assert await mock_db.availability_intervals.count_documents({}) == 0
+    
+    asyncio.run(run())
@@ -0,0 +1,110 @@
+import asyncio
+import gc
+
+import pytest
+from bson import ObjectId
+
+server = pytest.importorskip("server")
+
+class FakeCollection:
+    """Just enough of a motor collection for BatchLoader: find() with $in"""
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.queries = []
+        self.error = None
+
+    def find(self, query, projection=None):
+        self.queries.append(query["_id"]["$in"])
+        if self.error:
+            raise self.error
+        return self.iterate(query["_id"]["$in"])
+
+    async def iterate(self, ids):
+        for doc_id in ids:
+            if doc_id in self.docs:
+                yield self.docs[doc_id]
+
+def make_docs(count):
+    return [{"_id": ObjectId(), "name": f"Row {i}"} for i in range(count)]
+
+def test_loads_in_one_tick_share_one_query():
+    docs = make_docs(3)
+    collection = FakeCollection(docs)
+    missing = str(ObjectId())
+
+    async def run():
+        loader = server.BatchLoader(collection)
+        ids = [str(docs[0]["_id"]), str(docs[1]["_id"]), missing, str(docs[0]["_id"]), str(docs[2]["_id"])]
+        rows = await loader.load_many(ids)
+        assert rows == [docs[0], docs[1], None, docs[0], docs[2]]
+        assert len(collection.queries) == 1
+        assert sorted(collection.queries[0]) == sorted([docs[0]["_id"], docs[1]["_id"], docs[2]["_id"], ObjectId(missing)])
+        
+        # Hits and misses are cached for the life of the loader
+        assert await loader.load(str(docs[1]["_id"])) == docs[1]
+        assert await loader.load(missing) is None
+        assert len(collection.queries) == 1
+    
+    asyncio.run(run())
+
+def test_invalid_ids_resolve_without_a_query():
+    collection = FakeCollection([])
+
+    async def run():
+        loader = server.BatchLoader(collection)
+        assert await loader.load_many([None, "", "not-an-id"]) == [None, None, None]
+        assert collection.queries == []
+    
+    asyncio.run(run())
+
+def test_dispatch_tasks_are_held_until_done():
+    docs = make_docs(1)
+
+    async def run():
+        loader = server.BatchLoader(FakeCollection(docs))
+        future = loader.load(str(docs[0]["_id"]))
+        await asyncio.sleep(0)
+        assert len(loader.tasks) == 1
+        assert await future == docs[0]
+        await asyncio.sleep(0)
+        assert loader.tasks == set()
+    
+    asyncio.run(run())
+
+def test_failures_reach_waiters_and_are_not_cached():
+    docs = make_docs(1)
+    collection = FakeCollection(docs)
+    collection.error = RuntimeError("connection reset")
+    doc_id = str(docs[0]["_id"])
+
+    async def run():
+        loader = server.BatchLoader(collection)
+        with pytest.raises(RuntimeError):
+            await loader.load(doc_id)
+        
+        collection.error = None
+        assert await loader.load(doc_id) == docs[0]
+        assert len(collection.queries) == 2
+    
+    asyncio.run(run())
+
+def test_unawaited_failures_are_not_reported():
+    docs = make_docs(1)
+    collection = FakeCollection(docs)
+    collection.error = RuntimeError("connection reset")
+    reported = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: reported.append(context))
+        loader = server.BatchLoader(collection)
+        loader.load(str(docs[0]["_id"]))
+        while not collection.queries or loader.tasks:
+            await asyncio.sleep(0)
+        # The raised error's traceback would keep the future alive
+        collection.error = None
+        del loader
+        gc.collect()
+    
+    asyncio.run(run())
+    assert reported == []
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+server = pytest.importorskip("server")
+
+DAY = datetime(2026, 3, 2, 10)
+
+class HookedDatabase:
+    """server.db stand-in that runs a hook the first time bookings are aggregated"""
+
+    def __init__(self, database, hook):
+        self._database = database
+        self._hook = hook
+
+    def __getattr__(self, name):
+        collection = getattr(self._database, name)
+        if name != "bookings":
+            return collection
+        outer = self
+        
+        class Bookings:
+            def __getattr__(self, attr):
+                return getattr(collection, attr)
+            
+            def aggregate(self, *args, **kwargs):
+                async def rows():
+                    if outer._hook:
+                        hook, outer._hook = outer._hook, None
+                        await hook()
+                    async for row in collection.aggregate(*args, **kwargs):
+                        yield row
+                return rows()
+        return Bookings()
+
+def rollup_id(dimension, key):
+    return f"{server.rollup_day(DAY)}|{dimension}|{key}"
+
+def test_rebuild_keeps_bookings_recorded_mid_run(mock_db, monkeypatch):
+    async def live_booking():
+        booking = {"handler_id": "h1", "status": "pending", "service_category": "Cleaning", "created_at": DAY}
+        await mock_db.bookings.insert_one(booking)
+        await server.record_booking_change(None, booking)
+    
+    monkeypatch.setattr(server, "db", HookedDatabase(mock_db, live_booking))
+
+    async def run():
+        await mock_db.bookings.insert_many([
+            {"handler_id": "h1", "status": "completed", "service_category": "Cleaning",
+             "revenue_amount": 40.0, "created_at": DAY},
+            # Created with payment: category and professional_id only
+            {"professional_id": "h2", "handler_id": None, "status": "pending", "category": "Plumbing", "created_at": DAY},
+        ])
+        await mock_db.daily_rollups.insert_many([
+            {"_id": rollup_id("all", "all"), "day": server.rollup_day(DAY), "dimension": "all", "key": "all",
+             "bookings": 9, "version": 5},
+            {"_id": "2020-01-01|all|all", "day": "2020-01-01", "dimension": "all", "key": "all", "bookings": 1, "version": 1},
+        ])
+        
+        await server.rebuild_daily_rollups()
+        rollups = {doc["_id"]: doc async for doc in mock_db.daily_rollups.find()}
+        assert "2020-01-01|all|all" not in rollups
+        
+        everything = rollups[rollup_id("all", "all")]
+        assert everything["bookings"] == 3
+        assert everything["status"] == {"completed": 1, "pending": 2}
+        assert everything["revenue"] == 40.0
+        assert rollups[rollup_id("category", "Plumbing")]["bookings"] == 1
+        assert rollups[rollup_id("handler", "h2")]["bookings"] == 1
+        assert rollups[rollup_id("handler", "h1")]["bookings"] == 2
+        assert await server.rollups_ready()
+    
+    asyncio.run(run())
+
+def test_rollup_days_match():
+    match = server.rollup_days_match(["2026-03-02"])
+    assert match == {"$or": [{"created_at": {"$gte": datetime(2026, 3, 2), "$lt": datetime(2026, 3, 3)}}]}
+    assert {"created_at": None} in server.rollup_days_match([server.rollup_day(None)])["$or"]
+    assert server.rollup_days_match(None) == {}
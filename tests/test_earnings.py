@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+server = pytest.importorskip("server")
+
+async def buckets(database):
+    return {
+        doc["_id"]: (doc["amount"], doc["jobs"])
+        async for doc in database.earnings_buckets.find({"jobs": {"$ne": 0}})
+    }
+
+def test_status_changes_move_earnings(mock_db):
+    async def run():
+        handler_id = str(ObjectId())
+        job_id = ObjectId()
+        await mock_db.bookings.insert_one({
+            "_id": job_id, "handler_id": handler_id, "status": "in_progress",
+            "service_price": 100.0, "revenue_amount": 80.0, "created_at": datetime(2026, 1, 5),
+        })
+        
+        await server.update_job_status(handler_id, str(job_id), "completed")
+        booking = await mock_db.bookings.find_one({"_id": job_id})
+        day = booking["actual_end"].strftime("%Y-%m-%d")
+        live = await buckets(mock_db)
+        assert live == {
+            server.earnings_bucket_id(handler_id, "day", day): (80.0, 1),
+            server.earnings_bucket_id(handler_id, "month", day[:7]): (80.0, 1),
+        }
+        
+        # A rebuild agrees with the live buckets
+        await server.rebuild_earnings_buckets()
+        assert await buckets(mock_db) == live
+        
+        # Completing again neither double counts nor moves the bucket
+        await server.admin_update_booking_status(str(job_id), "completed")
+        assert await buckets(mock_db) == live
+        
+        await server.admin_update_booking_status(str(job_id), "in_progress")
+        assert await buckets(mock_db) == {}
+        await server.rebuild_earnings_buckets()
+        assert await mock_db.earnings_buckets.count_documents({}) == 0
+    
+    asyncio.run(run())
+
+def test_rebuild_counts_bookings_created_with_payment(mock_db):
+    async def run():
+        await mock_db.bookings.insert_many([
+            {"professional_id": "h1", "handler_id": None, "status": "completed", "total_price": 50.0,
+             "created_at": datetime(2026, 2, 1), "check_out_time": datetime(2026, 2, 3)},
+            {"handler_id": "h1", "status": "cancelled", "service_price": 70.0, "created_at": datetime(2026, 2, 2)},
+        ])
+        await mock_db.earnings_buckets.insert_one(
+            {"_id": "h1:day:2026-01-01", "handler_id": "h1", "period": "day", "bucket": "2026-01-01", "amount": 5, "jobs": 1}
+        )
+        
+        assert await server.rebuild_earnings_buckets() == 2
+        assert await buckets(mock_db) == {"h1:day:2026-02-03": (50.0, 1), "h1:month:2026-02": (50.0, 1)}
+    
+    asyncio.run(run())
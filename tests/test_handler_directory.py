@@ -0,0 +1,92 @@
+import asyncio
+import random
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+server = pytest.importorskip("server")
+
+class GeoUsers:
+    """users stand-in whose $geoNear streams by a stored distance, ties in arbitrary order"""
+    
+    def __init__(self, docs, seed):
+        self.docs = docs
+        self.rng = random.Random(seed)
+        self.calls = 0
+    
+    def aggregate(self, pipeline):
+        mongomock = pytest.importorskip("mongomock")
+        self.calls += 1
+        near, stages = pipeline[0]["$geoNear"], pipeline[1:]
+        streamed = [
+            {**doc, "distance_meters": doc["d"]} for doc in self.docs
+            if near.get("minDistance", 0) <= doc["d"] <= near.get("maxDistance", float("inf"))
+        ]
+        self.rng.shuffle(streamed)
+        streamed.sort(key=lambda doc: doc["distance_meters"])
+        collection = mongomock.MongoClient().db.streamed
+        if streamed:
+            collection.insert_many(streamed)
+        rows = list(collection.aggregate(stages))
+        
+        class Cursor:
+            async def to_list(self, length):
+                return rows[:length]
+        return Cursor()
+
+class GeoDatabase:
+    def __init__(self, users):
+        self.users = users
+
+async def read_pages(limit):
+    rows, last = [], None
+    while True:
+        geo_near, after = {}, []
+        if last:
+            geo_near["minDistance"] = last["distance_meters"]
+            after = [
+                {"distance_meters": {"$gt": last["distance_meters"]}},
+                {"distance_meters": last["distance_meters"], "_id": {"$gt": last["_id"]}},
+            ]
+        page = await server.nearest_handlers(geo_near, after, [], limit)
+        rows += page
+        if len(page) < limit:
+            return rows
+        last = page[-1]
+
+def test_distance_pages_cover_ties_once(monkeypatch):
+    rng = random.Random(5)
+    docs = [{"_id": ObjectId(), "name": f"h{i}", "d": rng.choice([0.0, 150.0, 150.0, 900.5, 2000.0])} for i in range(40)]
+    expected = [doc["_id"] for doc in sorted(docs, key=lambda doc: (doc["d"], doc["_id"]))]
+    for limit in (1, 3, 7, 40, 50):
+        monkeypatch.setattr(server, "db", GeoDatabase(GeoUsers(docs, seed=limit)))
+        rows = asyncio.run(read_pages(limit))
+        assert [row["_id"] for row in rows] == expected, limit
+
+def test_ties_inside_the_page_need_one_query(monkeypatch):
+    docs = [{"_id": ObjectId(), "d": float(i // 2)} for i in range(10)]
+    users = GeoUsers(docs, seed=1)
+    monkeypatch.setattr(server, "db", GeoDatabase(users))
+    page = asyncio.run(server.nearest_handlers({}, [], [], 4))
+    assert [doc["_id"] for doc in page] == [doc["_id"] for doc in docs[:4]]
+    assert users.calls == 1
+
+@pytest.mark.parametrize("sort, values", [
+    ("distance", {"rating": 4.5}),
+    ("distance", {"distance": "near"}),
+    ("distance", {"distance": -1}),
+    ("rating", {"distance": 10.0}),
+    ("rating", {"rating": "5"}),
+])
+def test_cursor_from_another_sort_is_rejected(sort, values):
+    cursor = server.encode_cursor({**values, "id": str(ObjectId())})
+    with pytest.raises(HTTPException) as error:
+        server.directory_cursor(cursor, sort)
+    assert error.value.status_code == 400
+
+def test_cursor_needs_an_object_id():
+    with pytest.raises(HTTPException):
+        server.directory_cursor(server.encode_cursor({"distance": 1.0, "id": 7}), "distance")
+    last = server.directory_cursor(server.encode_cursor({"rating": None, "id": str(ObjectId())}), "rating")
+    assert last["rating"] is None
@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+server = pytest.importorskip("server")
+
+def test_review_pages_cover_every_review_once(mock_db):
+    async def run():
+        await mock_db.reviews.insert_many([
+            {"handler_id": "h1", "rating": 5, "customer_name": "A", "service_name": "S", "created_at": datetime(2026, 1, day)}
+            for day in (3, 1, 3, 2)
+        ] + [
+            # Written before reviews were timestamped
+            {"handler_id": "h1", "rating": 4, "customer_name": "B", "service_name": "S"},
+            {"handler_id": "h2", "rating": 1, "created_at": datetime(2026, 1, 1)},
+        ])
+        
+        pages, cursor = [], None
+        while True:
+            result = await server.get_handler_reviews("h1", limit=2, cursor=cursor)
+            pages.append(result["reviews"])
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+        
+        assert [len(page) for page in pages] == [2, 2, 1]
+        dates = [review["created_at"] for page in pages for review in page]
+        assert dates == [datetime(2026, 1, 3), datetime(2026, 1, 3), datetime(2026, 1, 2), datetime(2026, 1, 1), None]
+    
+    asyncio.run(run())
+
+@pytest.mark.parametrize("values", [
+    {"created_at": "yesterday", "id": str(ObjectId())},
+    {"id": str(ObjectId())},
+    {"sort": "recent", "values": [{"$date": "not a date"}, {"$oid": str(ObjectId())}]},
+    {"sort": "recent", "values": [None]},
+])
+def test_malformed_cursor_is_a_400(mock_db, values):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_handler_reviews("h1", cursor=server.encode_cursor(values)))
+    assert error.value.status_code == 400
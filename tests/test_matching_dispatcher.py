@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+server = pytest.importorskip("server")
+
+def make_dispatchers(*workers):
+    dispatchers = []
+    for worker in workers:
+        dispatcher = server.MatchingDispatcher(tick_seconds=5, batch_size=10)
+        dispatcher.worker_id = worker
+        dispatchers.append(dispatcher)
+    return dispatchers
+
+async def expire_lease(database):
+    await database.scheduler_leases.update_one(
+        {"_id": server.MatchingDispatcher.lease_name},
+        {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+def test_only_one_worker_holds_the_lease(mock_db):
+    first, second = make_dispatchers("worker-a", "worker-b")
+
+    async def run():
+        assert await first.acquire_lease()
+        assert not await second.acquire_lease()
+        # The holder renews its own lease
+        assert await first.acquire_lease()
+        lease = await mock_db.scheduler_leases.find_one({"_id": first.lease_name})
+        assert lease["owner"] == "worker-a"
+        assert lease["expires_at"] > datetime.utcnow() + timedelta(seconds=first.tick_seconds)
+    
+    asyncio.run(run())
+
+def test_expired_lease_is_taken_over(mock_db):
+    first, second = make_dispatchers("worker-a", "worker-b")
+
+    async def run():
+        assert await first.acquire_lease()
+        await expire_lease(mock_db)
+        assert await second.acquire_lease()
+        assert not await first.acquire_lease()
+    
+    asyncio.run(run())
+
+def test_still_leader_renews_once_a_tick_has_passed(mock_db):
+    first, second = make_dispatchers("worker-a", "worker-b")
+
+    async def run():
+        assert await first.acquire_lease()
+        await expire_lease(mock_db)
+        assert await second.acquire_lease()
+        
+        # Within a tick of the last renewal the lease is trusted without a round trip
+        assert await first.still_leader()
+        # After a tick the stale leader has to renew, and finds the lease taken
+        first.renewed_at -= first.tick_seconds
+        assert not await first.still_leader()
+        
+        second.renewed_at -= second.tick_seconds
+        assert await second.still_leader()
+    
+    asyncio.run(run())
+
+def test_stop_releases_only_its_own_lease(mock_db):
+    first, second = make_dispatchers("worker-a", "worker-b")
+
+    async def run():
+        assert await first.acquire_lease()
+        await second.stop()
+        assert await mock_db.scheduler_leases.count_documents({}) == 1
+        await first.stop()
+        assert await mock_db.scheduler_leases.count_documents({}) == 0
+        assert await second.acquire_lease()
+    
+    asyncio.run(run())
+
+def test_batch_stops_assigning_once_the_lease_is_lost(monkeypatch):
+    bookings = [{"_id": f"booking-{i}", "scheduled_date": "2000-01-01"} for i in range(3)]
+    assigned = []
+    checks = iter([True, False, True])
+
+    async def load_matching_candidates():
+        return [{"_id": "handler"}]
+
+    async def count_active_jobs(handler_ids):
+        return {}
+
+    async def rank_handlers_for_booking(booking, candidates, active_jobs):
+        return [{"handler_id": "handler", "score": 100, "active_jobs": 0}]
+
+    async def assign_matched_handler(booking, match):
+        assigned.append(booking["_id"])
+        return True
+
+    async def still_leader():
+        return next(checks)
+    
+    for name, fake in [
+        ("load_matching_candidates", load_matching_candidates),
+        ("count_active_jobs", count_active_jobs),
+        ("rank_handlers_for_booking", rank_handlers_for_booking),
+        ("assign_matched_handler", assign_matched_handler),
+    ]:
+        monkeypatch.setattr(server, name, fake)
+    
+    assignments = asyncio.run(server.match_pending_bookings(bookings, still_leader))
+    assert assigned == ["booking-0"]
+    assert [a["booking"]["_id"] for a in assignments] == ["booking-0"]
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+server = pytest.importorskip("server")
+
+REVIEWS = [
+    {"rating": 5},
+    {"rating": 4, "timeliness": 5},
+    {"rating": 3, "service_quality": None, "handlerism": 2},
+    {"rating": 2, "service_quality": None},
+    {"rating": 1, "service_quality": 1, "handlerism": 1, "timeliness": 1},
+]
+
+def test_rebuild_counts_sub_scores_like_the_live_update():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.reviews
+    collection.insert_many([{"_id": i, **review} for i, review in enumerate(REVIEWS)])
+    
+    rebuilt = {
+        row["_id"]: row["counted"]
+        for row in collection.aggregate([{"$project": {"counted": {"$cond": [server.REVIEW_HAS_SUB_SCORES_EXPR, 1, 0]}}}])
+    }
+    live = {
+        i: server.review_summary_update({**review, "created_at": datetime(2026, 1, 1)})["$inc"].get("sub_score_count", 0)
+        for i, review in enumerate(REVIEWS)
+    }
+    assert rebuilt == live == {0: 0, 1: 1, 2: 1, 3: 0, 4: 1}
+
+def test_live_review_uses_booking_category_and_bumps_versions(mock_db):
+    async def run():
+        # Bookings created with payment store the category under "category"
+        booking = {"category": "Plumbing", "service_category": None}
+        review = {
+            "handler_id": "h1", "rating": 4, "timeliness": 5, "created_at": datetime(2026, 1, 1),
+            "service_category": server.booking_category(booking),
+        }
+        await server.record_review_stats(review)
+        await server.record_review_stats({**review, "rating": 2})
+        
+        category = await mock_db.category_review_stats.find_one({"_id": "Plumbing"})
+        handler = await mock_db.handler_stats.find_one({"_id": "h1"})
+        for summary in (category, handler):
+            assert (summary["review_count"], summary["rating_sum"], summary["sub_score_count"]) == (2, 6, 2)
+            assert summary["version"] == 2
+    
+    asyncio.run(run())
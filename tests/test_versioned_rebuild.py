@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+server = pytest.importorskip("server")
+
+def simple_review_stages(group_key):
+    # mongomock has no $bottomN; the counts are what these tests look at
+    return [{"$group": {"_id": group_key, "review_count": {"$sum": 1}, "rating_sum": {"$sum": "$rating"}}}]
+
+def by_id_scope(doc_ids):
+    return {} if doc_ids is None else {"_id": {"$in": doc_ids}}
+
+def test_live_write_mid_rebuild_is_recomputed(mock_db):
+    source = {"a": 1, "b": 5}
+    calls = []
+
+    async def compute(scope):
+        calls.append(scope)
+        if len(calls) == 1:
+            # A live write lands between the version read and the replace
+            source["a"] += 1
+            await mock_db.counters.update_one({"_id": "a"}, {"$inc": {"count": 1, "version": 1}})
+        return {doc_id: {"count": count} for doc_id, count in source.items() if scope is None or doc_id in scope}
+
+    async def run():
+        await mock_db.counters.insert_many([
+            {"_id": "a", "count": 9, "version": 3},
+            {"_id": "stale", "count": 1, "version": 1},
+        ])
+        assert await server.versioned_rebuild(mock_db.counters, compute, by_id_scope, lambda ids: ids) == 2
+        docs = {doc["_id"]: doc async for doc in mock_db.counters.find()}
+        assert docs == {
+            "a": {"_id": "a", "count": 2, "version": 4},
+            "b": {"_id": "b", "count": 5},
+        }
+        assert calls == [None, ["a"]]
+        
+        # The live writers' next $inc still works on a rebuilt document
+        await mock_db.counters.update_one({"_id": "b"}, {"$inc": {"count": 1, "version": 1}})
+        assert (await mock_db.counters.find_one({"_id": "b"}))["version"] == 1
+    
+    asyncio.run(run())
+
+def test_busy_documents_keep_their_live_values(mock_db):
+    async def compute(scope):
+        await mock_db.counters.update_one({"_id": "a"}, {"$inc": {"count": 1, "version": 1}}, upsert=True)
+        return {"a": {"count": 100}}
+
+    async def run():
+        await mock_db.counters.insert_one({"_id": "a", "count": 10, "version": 1})
+        await server.versioned_rebuild(mock_db.counters, compute, by_id_scope, lambda ids: ids)
+        doc = await mock_db.counters.find_one({"_id": "a"})
+        assert (doc["count"], doc["version"]) == (10 + server.REBUILD_ATTEMPTS, 1 + server.REBUILD_ATTEMPTS)
+    
+    asyncio.run(run())
+
+def test_handler_stats_rebuild(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "review_summary_stages", simple_review_stages)
+
+    async def run():
+        await mock_db.bookings.insert_many([
+            {"handler_id": "h1", "status": "completed", "created_at": datetime(2026, 1, 1)},
+            # Created with payment before handler_id was stored
+            {"handler_id": None, "professional_id": "h1", "status": "pending", "created_at": datetime(2026, 1, 2)},
+            {"handler_id": "h2", "status": "pending", "created_at": datetime(2026, 1, 3)},
+        ])
+        await mock_db.reviews.insert_one({"handler_id": "h2", "rating": 4})
+        await mock_db.handler_stats.insert_many([
+            {"_id": "h1", "total_jobs": 7, "completed_jobs": 7, "version": 12},
+            {"_id": "gone", "total_jobs": 1, "version": 2},
+        ])
+        
+        assert await server.rebuild_handler_stats() == 2
+        stats = {doc["_id"]: doc async for doc in mock_db.handler_stats.find()}
+        assert set(stats) == {"h1", "h2"}
+        assert (stats["h1"]["total_jobs"], stats["h1"]["completed_jobs"], stats["h1"]["version"]) == (2, 1, 12)
+        assert (stats["h2"]["total_jobs"], stats["h2"]["review_count"], stats["h2"]["rating_sum"]) == (1, 1, 4)
+    
+    asyncio.run(run())
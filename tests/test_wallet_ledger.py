@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+server = pytest.importorskip("server")
+
+async def make_handler(database, balance=0.0):
+    handler_id = ObjectId()
+    await database.users.insert_one({"_id": handler_id, "user_type": "handler", "wallet_balance": balance})
+    return str(handler_id)
+
+async def ledger(database, handler_id):
+    return await database.wallet_transactions.find({"handler_id": handler_id}).sort("seq", 1).to_list(None)
+
+def test_entries_get_consecutive_seqs(mock_db):
+    async def run():
+        handler_id = await make_handler(mock_db)
+        await server.post_wallet_entry(handler_id, 50.0, "earning", "Job one")
+        await server.post_wallet_entry(handler_id, 25.0, "earning", "Job two")
+        entry = await server.post_wallet_entry(handler_id, -60.0, "payout", "Payout")
+        
+        assert entry["seq"] == 3 and entry["balance_after"] == 15.0
+        entries = await ledger(mock_db, handler_id)
+        assert [e["seq"] for e in entries] == [1, 2, 3]
+        assert [e["balance_after"] for e in entries] == [50.0, 75.0, 15.0]
+        user = await mock_db.users.find_one({"_id": ObjectId(handler_id)})
+        assert (user["wallet_balance"], user["wallet_seq"]) == (15.0, 3)
+    
+    asyncio.run(run())
+
+def test_concurrent_entries_never_share_a_seq(mock_db):
+    async def run():
+        handler_id = await make_handler(mock_db)
+        await asyncio.gather(*(
+            server.post_wallet_entry(handler_id, 10.0, "earning", f"Job {i}") for i in range(20)
+        ))
+        entries = await ledger(mock_db, handler_id)
+        assert [e["seq"] for e in entries] == list(range(1, 21))
+        assert entries[-1]["balance_after"] == 200.0
+    
+    asyncio.run(run())
+
+def test_overdraft_raises_and_writes_nothing(mock_db):
+    async def run():
+        handler_id = await make_handler(mock_db, balance=30.0)
+        with pytest.raises(server.InsufficientBalance):
+            await server.post_wallet_entry(handler_id, -30.01, "payout", "Too much")
+        
+        user = await mock_db.users.find_one({"_id": ObjectId(handler_id)})
+        assert user["wallet_balance"] == 30.0 and "wallet_seq" not in user
+        assert await ledger(mock_db, handler_id) == []
+        
+        # The whole balance can still be paid out
+        entry = await server.post_wallet_entry(handler_id, -30.0, "payout", "Everything")
+        assert (entry["seq"], entry["balance_after"]) == (1, 0.0)
+    
+    asyncio.run(run())
+
+def test_unknown_handler_returns_none(mock_db):
+    async def run():
+        assert await server.post_wallet_entry(str(ObjectId()), -5.0, "payout", "Nobody") is None
+        assert await server.post_wallet_entry(str(ObjectId()), 5.0, "earning", "Nobody") is None
+        assert await mock_db.wallet_transactions.count_documents({}) == 0
+    
+    asyncio.run(run())
+
+def test_snapshots_let_reconcile_replay_the_tail(mock_db, monkeypatch):
+    monkeypatch.setattr(server, "WALLET_SNAPSHOT_INTERVAL", 3)
+
+    async def run():
+        handler_id = await make_handler(mock_db)
+        for amount in (10.0, 20.0, 30.0, -15.0):
+            await server.post_wallet_entry(handler_id, amount, "adjustment", "Entry")
+        
+        snapshots = await mock_db.wallet_snapshots.find({"handler_id": handler_id}).to_list(None)
+        assert [(s["seq"], s["balance"]) for s in snapshots] == [(3, 60.0)]
+        assert await server.reconcile_wallet(handler_id, 45.0, 4) is None
+        assert await server.reconcile_wallet(handler_id, 50.0, 4) is not None
+    
+    asyncio.run(run())
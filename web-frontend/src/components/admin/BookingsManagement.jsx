@@ -1,16 +1,18 @@
 import React, { useState, useEffect } from 'react';
 import { Search, Calendar, User, MapPin } from 'lucide-react';
+import { useCursorPages } from '../../hooks/use-cursor-pages';
 
 export default function BookingsManagement() {
-  const [bookings, setBookings] = useState([]);
+  const {
+    items: bookings, hasMore, totalEstimate, loading, loadingMore, error, loadMore, reload: reloadBookings
+  } = useCursorPages('/api/admin/bookings', 'bookings');
   const [filteredBookings, setFilteredBookings] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
 
   useEffect(() => {
-    loadBookings();
-  }, []);
+    if (error) console.error('Error loading bookings:', error);
+  }, [error]);
 
   useEffect(() => {
     applyFilters();
@@ -18,13 +20,17 @@ export default function BookingsManagement() {
 
   const loadBookings = async () => {
     try {
-      const response = await fetch('/api/admin/bookings');
-      const data = await response.json();
-      setBookings(data.bookings || []);
+      await reloadBookings();
+    } catch (error) {
+      console.error('Error loading bookings:', error);
+    }
+  };
+
+  const loadMoreBookings = async () => {
+    try {
+      await loadMore();
     } catch (error) {
       console.error('Error loading bookings:', error);
-    } finally {
-      setLoading(false);
     }
   };
 
@@ -118,6 +124,7 @@ export default function BookingsManagement() {
         <div className="mt-4 pt-4 border-t">
           <p className="text-sm text-gray-600">
             {filteredBookings.length} booking{filteredBookings.length !== 1 ? 's' : ''} found
+            {hasMore && totalEstimate != null && ` (${bookings.length} of about ${totalEstimate} loaded)`}
           </p>
         </div>
       </div>
@@ -176,6 +183,17 @@ export default function BookingsManagement() {
             </tbody>
           </table>
         </div>
+        {hasMore && (
+          <div className="px-6 py-4 border-t text-center">
+            <button
+              onClick={loadMoreBookings}
+              disabled={loadingMore}
+              className="px-4 py-2 text-sm font-medium text-orange-600 hover:text-orange-700 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load more bookings'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -1,10 +1,12 @@
 import React, { useState, useEffect } from 'react';
 import { Search, Filter, Edit, Trash2, UserX, UserCheck, Eye, Calendar, Mail, Phone, MapPin } from 'lucide-react';
+import { useCursorPages } from '../../hooks/use-cursor-pages';
 
 export default function UsersManagement() {
-  const [users, setUsers] = useState([]);
+  const {
+    items: users, hasMore, totalEstimate, loading, loadingMore, error, loadMore, reload: reloadUsers
+  } = useCursorPages('/api/admin/users', 'users');
   const [filteredUsers, setFilteredUsers] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
   const [typeFilter, setTypeFilter] = useState('all');
@@ -12,8 +14,8 @@ export default function UsersManagement() {
   const [showModal, setShowModal] = useState(false);
 
   useEffect(() => {
-    loadUsers();
-  }, []);
+    if (error) console.error('Error loading users:', error);
+  }, [error]);
 
   useEffect(() => {
     applyFilters();
@@ -21,13 +23,17 @@ export default function UsersManagement() {
 
   const loadUsers = async () => {
     try {
-      const response = await fetch('/api/admin/users');
-      const data = await response.json();
-      setUsers(data.users || []);
+      await reloadUsers();
+    } catch (error) {
+      console.error('Error loading users:', error);
+    }
+  };
+
+  const loadMoreUsers = async () => {
+    try {
+      await loadMore();
     } catch (error) {
       console.error('Error loading users:', error);
-    } finally {
-      setLoading(false);
     }
   };
 
@@ -187,6 +193,7 @@ export default function UsersManagement() {
         <div className="mt-4 pt-4 border-t">
           <p className="text-sm text-gray-600">
             {filteredUsers.length} {filteredUsers.length === 1 ? 'user' : 'users'} found
+            {hasMore && totalEstimate != null && ` (${users.length} of about ${totalEstimate} loaded)`}
           </p>
         </div>
       </div>
@@ -270,6 +277,17 @@ export default function UsersManagement() {
             </tbody>
           </table>
         </div>
+        {hasMore && (
+          <div className="px-6 py-4 border-t text-center">
+            <button
+              onClick={loadMoreUsers}
+              disabled={loadingMore}
+              className="px-4 py-2 text-sm font-medium text-orange-600 hover:text-orange-700 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load more users'}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* User Details Modal */}
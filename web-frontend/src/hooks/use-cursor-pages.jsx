@@ -0,0 +1,54 @@
+import { useCallback, useEffect, useState } from 'react';
+
+// Pages through an admin list endpoint ({[key]: rows, next_cursor, total_estimate}),
+// appending each page the server hands a cursor for
+export function useCursorPages(url, key) {
+  const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalEstimate, setTotalEstimate] = useState(null);
+  const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [error, setError] = useState(null);
+
+  const fetchPage = useCallback(async (cursor) => {
+    const pageUrl = cursor
+      ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`
+      : url;
+    const response = await fetch(pageUrl);
+    if (!response.ok) {
+      throw new Error(`Failed to load ${key}: ${response.status}`);
+    }
+    return response.json();
+  }, [url, key]);
+
+  const reload = useCallback(async () => {
+    setLoading(true);
+    setError(null);
+    try {
+      const data = await fetchPage(null);
+      setItems(data[key] || []);
+      setNextCursor(data.next_cursor || null);
+      setTotalEstimate(data.total_estimate ?? null);
+    } finally {
+      setLoading(false);
+    }
+  }, [fetchPage, key]);
+
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(nextCursor);
+      setItems(previous => [...previous, ...(data[key] || [])]);
+      setNextCursor(data.next_cursor || null);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [fetchPage, key, nextCursor, loadingMore]);
+
+  useEffect(() => {
+    reload().catch(setError);
+  }, [reload]);
+
+  return { items, hasMore: !!nextCursor, totalEstimate, loading, loadingMore, error, loadMore, reload };
+}
@@ -4,42 +4,36 @@ import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { useToast } from "@/hooks/use-toast";
+import { useCursorPages } from "@/hooks/use-cursor-pages";
 import { Loader2, Users, Shield, Ban, Trash2 } from 'lucide-react';
 
 const API_URL = import.meta.env.VITE_API_URL || '';
 
 export default function AdminUsers() {
   const { toast } = useToast();
-  const [users, setUsers] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
+  const userTypeParam = filter === 'all' ? '' : `?user_type=${filter}`;
+  const {
+    items: users, hasMore, loading, loadingMore, error, loadMore, reload
+  } = useCursorPages(`${API_URL}/api/admin/users${userTypeParam}`, 'users');
 
   useEffect(() => {
-    loadUsers();
-  }, [filter]);
+    if (error) showLoadError();
+  }, [error]);
 
-  const loadUsers = async () => {
-    try {
-      setLoading(true);
-      const userTypeParam = filter === 'all' ? '' : `?user_type=${filter}`;
-      const response = await fetch(`${API_URL}/api/admin/users${userTypeParam}`);
-      
-      if (response.ok) {
-        const data = await response.json();
-        setUsers(data.users);
-      }
-    } catch (error) {
-      toast({
-        title: "Error",
-        description: "Failed to load users",
-        variant: "destructive",
-      });
-    } finally {
-      setLoading(false);
-    }
+  const showLoadError = () => {
+    toast({
+      title: "Error",
+      description: "Failed to load users",
+      variant: "destructive",
+    });
   };
 
+  const loadUsers = () => reload().catch(showLoadError);
+
+  const loadMoreUsers = () => loadMore().catch(showLoadError);
+
   const updateUserStatus = async (userId, status) => {
     try {
       const response = await fetch(
@@ -226,6 +220,14 @@ export default function AdminUsers() {
                       ))}
                     </tbody>
                   </table>
+                  {hasMore && (
+                    <div className="flex justify-center pt-4">
+                      <Button variant="outline" onClick={loadMoreUsers} disabled={loadingMore}>
+                        {loadingMore && <Loader2 className="mr-2 h-4 w-4 animate-spin" />}
+                        Load more
+                      </Button>
+                    </div>
+                  )}
                 </div>
               )}
             </div>